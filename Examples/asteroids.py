@@ -1,10 +1,8 @@
-import matplotlib.pyplot as plt
-from pynput import keyboard
-
-from qm import QuantumMachinesManager
 from qm.qua import *
 
 from sprites import *
+from OPXBOX_LIB.connection import LazyQM
+from OPXBOX_LIB.program_cache import cached_program
 
 # %%
 
@@ -69,139 +67,142 @@ input_probe_voltage = .5  # V
 
 # %%
 
-configuration = {
-    'version': 1,
-    'controllers': {
-        'con1': {
-            'type': 'opx1',
-            'analog_outputs': {
-                1: {'offset': +0.0},
-                2: {'offset': +0.0},
-                3: {'offset': +0.0},
-                4: {'offset': +0.0},
-            },
-            'digital_outputs': {
-                1: {},
-            },
-            'analog_inputs': {
-                1: {'offset': -0.0},
-                2: {'offset': -0.0},
+def build_configuration():
+    """
+    The QUA configuration of the game, with all sprite waveforms.
+    """
+    return {
+        'version': 1,
+        'controllers': {
+            'con1': {
+                'type': 'opx1',
+                'analog_outputs': {
+                    1: {'offset': +0.0},
+                    2: {'offset': +0.0},
+                    3: {'offset': +0.0},
+                    4: {'offset': +0.0},
+                },
+                'digital_outputs': {
+                    1: {},
+                },
+                'analog_inputs': {
+                    1: {'offset': -0.0},
+                    2: {'offset': -0.0},
+                }
             }
-        }
-    },
-    'elements': {
-        'screen': {
-            'mixInputs': {
-                'I': ('con1', 1),
-                'Q': ('con1', 3),
+        },
+        'elements': {
+            'screen': {
+                'mixInputs': {
+                    'I': ('con1', 1),
+                    'Q': ('con1', 3),
+                },
+                'intermediate_frequency': intermediate_frequency,
+                'digitalInputs': {
+                    'draw_marker': {
+                        'port': ('con1', 1),
+                        'delay': 0,
+                        'buffer': 0,
+                    },
+                },
+                'operations': {
+                    "ship": "ship",
+                    "ray": "ray",
+                    "asteroid": "asteroid",
+                    "border": "border",
+                },
             },
-            'intermediate_frequency': intermediate_frequency,
-            'digitalInputs': {
-                'draw_marker': {
-                    'port': ('con1', 1),
-                    'delay': 0,
-                    'buffer': 0,
+            'draw_marker_element': {
+                'singleInput': {
+                    'port': ('con1', 3),
+                },
+                'intermediate_frequency': intermediate_frequency,
+                'operations': {
+                    "marker_pulse": "marker_pulse",
                 },
             },
-            'operations': {
-                "ship": "ship",
-                "ray": "ray",
-                "asteroid": "asteroid",
-                "border": "border",
+            'user_input_element': {
+                'singleInput': {
+                    'port': ('con1', 4),
+                },
+                'outputs': {
+                    'a': ('con1', 1),
+                    'b': ('con1', 2),
+                },
+                'intermediate_frequency': intermediate_frequency,
+                'operations': {
+                    "measure_user_input": "measure_user_input",
+                },
+                'time_of_flight': 100,
+                'smearing': 0
             },
         },
-        'draw_marker_element': {
-            'singleInput': {
-                'port': ('con1', 3),
-            },
-            'intermediate_frequency': intermediate_frequency,
-            'operations': {
-                "marker_pulse": "marker_pulse",
+        'pulses': {
+            **{n: {
+                'operation': 'control',
+                'length': sprite_length,
+                'waveforms': {k: f"{n}_{l}" for k, l in zip(["I", "Q"], ["x", "y"])},
+            }
+                for n in ["ship", "asteroid", "ray", "border"]},
+            "measure_user_input": {
+                "operation": "measurement",
+                'length': user_input_pulse_length,
+                "integration_weights": {
+                    "constant": "cosine_weights",
+                },
+                'waveforms': {"single": "input_wf"},
             },
+            "marker_pulse": {
+                "operation": "control",
+                'length': sprite_length,
+                'waveforms': {"single": "marker_wf"},
+            }
         },
-        'user_input_element': {
-            'singleInput': {
-                'port': ('con1', 4),
+        'waveforms': {
+            **{
+                f"ship_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_ship_pulse(sprite_length) * field_size * 0.1)
             },
-            'outputs': {
-                'a': ('con1', 1),
-                'b': ('con1', 2),
+            **{
+                f"asteroid_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_bird_pulse(sprite_length) * R_asteroid*2)
             },
-            'intermediate_frequency': intermediate_frequency,
-            'operations': {
-                "measure_user_input": "measure_user_input",
+            **{
+                f"ray_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_ray_pulse(sprite_length) * field_size * 0.05)
             },
-            'time_of_flight': 100,
-            'smearing': 0
-        },
-    },
-    'pulses': {
-        **{n: {
-            'operation': 'control',
-            'length': sprite_length,
-            'waveforms': {k: f"{n}_{l}" for k, l in zip(["I", "Q"], ["x", "y"])},
-        }
-            for n in ["ship", "asteroid", "ray", "border"]},
-        "measure_user_input": {
-            "operation": "measurement",
-            'length': user_input_pulse_length,
-            "integration_weights": {
-                "constant": "cosine_weights",
+            **{
+                f"border_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_border_pulse(sprite_length) * field_size)
             },
-            'waveforms': {"single": "input_wf"},
-        },
-        "marker_pulse": {
-            "operation": "control",
-            'length': sprite_length,
-            'waveforms': {"single": "marker_wf"},
-        }
-    },
-    'waveforms': {
-        **{
-            f"ship_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_ship_pulse(sprite_length) * field_size * 0.1)
-        },
-        **{
-            f"asteroid_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_bird_pulse(sprite_length) * R_asteroid*2)
+            # 'marker_wf': {'type':'arbitrary', 'samples':[.1]*50+[0]*50},
+            'marker_wf': {"type": "constant", "sample": 0.2},
+            'input_wf': {"type": "constant", "sample": input_probe_voltage},
         },
-        **{
-            f"ray_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_ray_pulse(sprite_length) * field_size * 0.05)
-        },
-        **{
-            f"border_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_border_pulse(sprite_length) * field_size)
-        },
-        # 'marker_wf': {'type':'arbitrary', 'samples':[.1]*50+[0]*50},
-        'marker_wf': {"type": "constant", "sample": 0.2},
-        'input_wf': {"type": "constant", "sample": input_probe_voltage},
-    },
-    'digital_waveforms': {
-        'draw_trigger': {
-            'samples': [(1, 0)]
-        }
-    },
-    "integration_weights": {
-        "cosine_weights": {
-            "cosine": [(1.0, user_input_pulse_length)],
-            "sine": [(0.0, user_input_pulse_length)],
+        'digital_waveforms': {
+            'draw_trigger': {
+                'samples': [(1, 0)]
+            }
         },
-        "sine_weights": {
-            "cosine": [(0.0, user_input_pulse_length)],
-            "sine": [(1.0, user_input_pulse_length)],
+        "integration_weights": {
+            "cosine_weights": {
+                "cosine": [(1.0, user_input_pulse_length)],
+                "sine": [(0.0, user_input_pulse_length)],
+            },
+            "sine_weights": {
+                "cosine": [(0.0, user_input_pulse_length)],
+                "sine": [(1.0, user_input_pulse_length)],
+            },
         },
-    },
-}
+    }
 
-# %%
 
-qop_ip = '192.168.116.171'
-qmm = QuantumMachinesManager(host=qop_ip, port = 80)
+configuration = build_configuration()
 
 # %%
 
-qm = qmm.open_qm(configuration)
+qop_ip = '192.168.116.171'
+qm = LazyQM(configuration, host=qop_ip, port=80)
 
 
 # %%
@@ -293,7 +294,7 @@ def clip_velocity(v):
     return clip(v, max_speed, -max_speed)
 
 
-def get_inputs(move, act):
+def get_inputs(move, act, a_stream=None, b_stream=None):
     """
     The inputs
     IO1
@@ -323,208 +324,217 @@ rng = np.random.default_rng(seed=1234)
 
 space_key = 5
 
-with program() as game: 
-    ship_a = declare(fixed, 0)
-    ship_x = declare(fixed, 0)
-    ship_y = declare(fixed, 0)
-    ship_vx = declare(fixed, 0)
-    ship_vy = declare(fixed, 0)
-
-    rays_active = declare(bool, value=[False] + [False] * (N_rays - 1))
-    rays_age = declare(fixed, value=[max_ray_age] + [0] * (N_rays - 1))
-    rays_x = declare(fixed, value=[0] * N_rays)
-    rays_y = declare(fixed, value=[0] * N_rays)
-    rays_a = declare(fixed, value=[0] * N_rays)
-
-    asteroids_active = declare(bool, value=[True] * N_asteroids)
-    asteroids_x = declare(fixed, value=rng.uniform(-field_size, field_size, N_asteroids))
-    asteroids_y = declare(fixed, value=rng.uniform(-field_size, field_size, N_asteroids))
-    asteroids_a = declare(fixed, value=rng.uniform(-.5, .5, N_asteroids))
-
-    t = declare(fixed, 0)
-    t_prim = declare(fixed, 0)
-    t_last_ray_spawn = declare(fixed, -1.1)
-    dt = declare(fixed, 0)
-    i = declare(int, 0)
-    j = declare(int, 0)
-
-    move = declare(int)
-    act = declare(int)
-    ui_phi = declare(fixed, 0)
-    ui_forward = declare(fixed, 0)
-    ui_fire = declare(bool, False)
-
-    cont = declare(bool, True)
-    game_is_on = declare(bool, True)
-    crashed = declare(bool,False)
-
-    if debug:
-        a_stream = declare_stream()
-        b_stream = declare_stream()                                                      
-
-    # Game loop
-    # with while_(t < 500*time_step_size):
-    with while_(cont):
-        get_inputs(move, act)
-        with if_((act == space_key) & (game_is_on == False)):
-            assign(ship_x,0)
-            assign(ship_y,0)
-            assign(ship_a,0)
-            assign(ship_vx,0)
-            assign(ship_vy,0)
-    
-            assign(game_is_on, True)
-            assign(crashed, False)              
-            with for_(i, 0, i < N_rays, i + 1):
-                assign(rays_active[i],False)
-                assign(rays_age[i], max_ray_age)
-                assign(rays_x[i]  , 0)      
-                assign(rays_y[i]  , 0)
-                assign(rays_a[i]  , 0) 
-            
-            with for_(i, 0, i < N_asteroids, i + 1):
-                assign(asteroids_active[i],True)
-                assign(asteroids_x[i],rng.uniform(-field_size, field_size))
-                assign(asteroids_y[i],rng.uniform(-field_size, field_size))
-        #assign(asteroids_active[0], True)
-
-                
-        with while_(game_is_on):
-            
-            assign(dt, t - t_prim)
-            assign(t_prim, t)
-
-            # process user inputs
-            assign(ui_phi, 0)  # The angle update that the user inputted
-            assign(ui_forward, 0)  # The forward acceleration that is inputted
-            assign(ui_fire, False)  # The forward acceleration that is inputted
-            assign(move, 0)  # The user input
-            assign(act, 0)  # The user input
-
-            '''
-            The inputs
-            w - forward
-            s - backward
-            a - left
-            d - right
-            
-            space - fire
-            escape - end game
-            '''
-            get_inputs(move, act)
-            with if_(move == 1):
-                assign(ui_forward, 1)
-            with elif_(move == 2):
-                assign(ui_forward,-1)
-            with elif_(move == 3):
-                assign(ui_phi, -1)
-            with elif_(move == 4):
-                assign(ui_phi, 1)
-
-            with if_(act == space_key):
-                assign(ui_fire, True)
-            with elif_(act == 10):
-                assign(cont, False)
-
-
-            # move ship
-            # update the rotation
-            assign(ship_a, ship_a + ui_phi * ship_rotation_speed * dt)
-            clip_angle(ship_a)
-
-            # spawn rays
-            with if_(ui_fire):
-                with if_(ray_spawn_delay < t - t_last_ray_spawn):
-                    assign(i, Math.argmin(rays_age))
-                    assign(rays_active[i], True)
+def build_game():
+    """
+    The asteroids game.
+    """
+    with program() as game:
+        ship_a = declare(fixed, 0)
+        ship_x = declare(fixed, 0)
+        ship_y = declare(fixed, 0)
+        ship_vx = declare(fixed, 0)
+        ship_vy = declare(fixed, 0)
+
+        rays_active = declare(bool, value=[False] + [False] * (N_rays - 1))
+        rays_age = declare(fixed, value=[max_ray_age] + [0] * (N_rays - 1))
+        rays_x = declare(fixed, value=[0] * N_rays)
+        rays_y = declare(fixed, value=[0] * N_rays)
+        rays_a = declare(fixed, value=[0] * N_rays)
+
+        asteroids_active = declare(bool, value=[True] * N_asteroids)
+        asteroids_x = declare(fixed, value=rng.uniform(-field_size, field_size, N_asteroids))
+        asteroids_y = declare(fixed, value=rng.uniform(-field_size, field_size, N_asteroids))
+        asteroids_a = declare(fixed, value=rng.uniform(-.5, .5, N_asteroids))
+
+        t = declare(fixed, 0)
+        t_prim = declare(fixed, 0)
+        t_last_ray_spawn = declare(fixed, -1.1)
+        dt = declare(fixed, 0)
+        i = declare(int, 0)
+        j = declare(int, 0)
+
+        move = declare(int)
+        act = declare(int)
+        ui_phi = declare(fixed, 0)
+        ui_forward = declare(fixed, 0)
+        ui_fire = declare(bool, False)
+
+        cont = declare(bool, True)
+        game_is_on = declare(bool, True)
+        crashed = declare(bool,False)
+
+        a_stream, b_stream = None, None
+        if debug:
+            a_stream = declare_stream()
+            b_stream = declare_stream()
+
+        # Game loop
+        # with while_(t < 500*time_step_size):
+        with while_(cont):
+            get_inputs(move, act, a_stream, b_stream)
+            with if_((act == space_key) & (game_is_on == False)):
+                assign(ship_x,0)
+                assign(ship_y,0)
+                assign(ship_a,0)
+                assign(ship_vx,0)
+                assign(ship_vy,0)
+
+                assign(game_is_on, True)
+                assign(crashed, False)
+                with for_(i, 0, i < N_rays, i + 1):
+                    assign(rays_active[i],False)
                     assign(rays_age[i], max_ray_age)
-                    assign(rays_x[i], ship_x)
-                    assign(rays_y[i], ship_y)
-                    assign(rays_a[i], ship_a)
-                    assign(t_last_ray_spawn, t)
-                    
-
-            # # update the velocity and position
-            assign(ship_x, ship_x + ship_vx * dt)
-            assign(ship_y, ship_y + ship_vy * dt)
-            assign(ship_vx, ship_vx + Math.cos2pi(ship_a) * ui_forward * ship_acceleration * dt)
-            assign(ship_vy, ship_vy + Math.sin2pi(ship_a) * ui_forward * ship_acceleration * dt)
-            clip_velocity(ship_vy)
-            clip_velocity(ship_vx)
-
-            # process hits
-            with for_(i, 0, i < N_rays, i + 1):
-                with for_(j, 0, j < N_asteroids, j + 1):
-                    with if_(rays_active[i] & asteroids_active[j]):
-                        # with if_(ray_hit(rays_x[i], rays_y[i], asteroids_x[j], asteroids_y[j])):
-                        with if_((get_distance(rays_x[i], rays_y[i], asteroids_x[j], asteroids_y[j]) < R_asteroid)):
+                    assign(rays_x[i]  , 0)
+                    assign(rays_y[i]  , 0)
+                    assign(rays_a[i]  , 0)
+
+                with for_(i, 0, i < N_asteroids, i + 1):
+                    assign(asteroids_active[i],True)
+                    assign(asteroids_x[i],rng.uniform(-field_size, field_size))
+                    assign(asteroids_y[i],rng.uniform(-field_size, field_size))
+            #assign(asteroids_active[0], True)
+
+
+            with while_(game_is_on):
+
+                assign(dt, t - t_prim)
+                assign(t_prim, t)
+
+                # process user inputs
+                assign(ui_phi, 0)  # The angle update that the user inputted
+                assign(ui_forward, 0)  # The forward acceleration that is inputted
+                assign(ui_fire, False)  # The forward acceleration that is inputted
+                assign(move, 0)  # The user input
+                assign(act, 0)  # The user input
+
+                '''
+                The inputs
+                w - forward
+                s - backward
+                a - left
+                d - right
+
+                space - fire
+                escape - end game
+                '''
+                get_inputs(move, act, a_stream, b_stream)
+                with if_(move == 1):
+                    assign(ui_forward, 1)
+                with elif_(move == 2):
+                    assign(ui_forward,-1)
+                with elif_(move == 3):
+                    assign(ui_phi, -1)
+                with elif_(move == 4):
+                    assign(ui_phi, 1)
+
+                with if_(act == space_key):
+                    assign(ui_fire, True)
+                with elif_(act == 10):
+                    assign(cont, False)
+
+
+                # move ship
+                # update the rotation
+                assign(ship_a, ship_a + ui_phi * ship_rotation_speed * dt)
+                clip_angle(ship_a)
+
+                # spawn rays
+                with if_(ui_fire):
+                    with if_(ray_spawn_delay < t - t_last_ray_spawn):
+                        assign(i, Math.argmin(rays_age))
+                        assign(rays_active[i], True)
+                        assign(rays_age[i], max_ray_age)
+                        assign(rays_x[i], ship_x)
+                        assign(rays_y[i], ship_y)
+                        assign(rays_a[i], ship_a)
+                        assign(t_last_ray_spawn, t)
+
+
+                # # update the velocity and position
+                assign(ship_x, ship_x + ship_vx * dt)
+                assign(ship_y, ship_y + ship_vy * dt)
+                assign(ship_vx, ship_vx + Math.cos2pi(ship_a) * ui_forward * ship_acceleration * dt)
+                assign(ship_vy, ship_vy + Math.sin2pi(ship_a) * ui_forward * ship_acceleration * dt)
+                clip_velocity(ship_vy)
+                clip_velocity(ship_vx)
+
+                # process hits
+                with for_(i, 0, i < N_rays, i + 1):
+                    with for_(j, 0, j < N_asteroids, j + 1):
+                        with if_(rays_active[i] & asteroids_active[j]):
+                            # with if_(ray_hit(rays_x[i], rays_y[i], asteroids_x[j], asteroids_y[j])):
+                            with if_((get_distance(rays_x[i], rays_y[i], asteroids_x[j], asteroids_y[j]) < R_asteroid)):
+                                assign(rays_active[i], False)
+                                assign(rays_age[i], -1)
+                                assign(asteroids_active[j], False)
+
+                # process crashes
+                # with for_(j, 0, j < N_asteroids, j + 1):
+                #     with if_(asteroids_active[j]):
+                #         # with if_(ray_hit(rays_x[i], rays_y[i], asteroids_x[j], asteroids_y[j])):
+                #         with if_((get_distance(ship_x, ship_y, asteroids_x[j], asteroids_y[j]) < R_asteroid)):
+                #             assign(crashed, True)
+                #             assign(game_is_on, False)
+                #             assign(asteroids_active[j], True)
+
+
+                # move rays
+                with for_(i, 0, i < N_rays, i + 1):
+                    with if_(rays_active[i]):
+                        # check age
+                        with if_(rays_age[i] > 0):  # the ray is still alive
+                            assign(rays_age[i], rays_age[i] - dt)
+                            # update position
+                            assign(rays_x[i], rays_x[i] + Math.cos2pi(rays_a[i]) * v_ray * dt)
+                            assign(rays_y[i], rays_y[i] + Math.sin2pi(rays_a[i]) * v_ray * dt)
+                        with else_():
                             assign(rays_active[i], False)
-                            assign(rays_age[i], -1)
-                            assign(asteroids_active[j], False)
-
-            # process crashes
-            # with for_(j, 0, j < N_asteroids, j + 1):
-            #     with if_(asteroids_active[j]):
-            #         # with if_(ray_hit(rays_x[i], rays_y[i], asteroids_x[j], asteroids_y[j])):
-            #         with if_((get_distance(ship_x, ship_y, asteroids_x[j], asteroids_y[j]) < R_asteroid)):
-            #             assign(crashed, True)
-            #             assign(game_is_on, False)
-            #             assign(asteroids_active[j], True)
-                
-                
-            # move rays
-            with for_(i, 0, i < N_rays, i + 1):
-                with if_(rays_active[i]):
-                    # check age
-                    with if_(rays_age[i] > 0):  # the ray is still alive
-                        assign(rays_age[i], rays_age[i] - dt)
-                        # update position
-                        assign(rays_x[i], rays_x[i] + Math.cos2pi(rays_a[i]) * v_ray * dt)
-                        assign(rays_y[i], rays_y[i] + Math.sin2pi(rays_a[i]) * v_ray * dt)
-                    with else_():
-                        assign(rays_active[i], False)
-
-            # move asteroids
-            with for_(j, 0, j < N_asteroids, j + 1):
-                with if_(asteroids_active[j]):
-                    assign(asteroids_x[j], asteroids_x[j] + Math.cos2pi(asteroids_a[j]) * v_asteroid * dt)
-                    assign(asteroids_y[j], asteroids_y[j] + Math.sin2pi(asteroids_a[j]) * v_asteroid * dt)
-
-            # process border collisions
-            process_border_collisions(ship_x, ship_y)
-            with for_(i, 0, i < N_rays, i + 1):
-                with if_(rays_active[i]):
-                    process_border_collisions(rays_x[i], rays_y[i])
-            with for_(i, 0, i < N_asteroids, i + 1):
-                with if_(asteroids_active[i]):
-                    process_border_collisions(asteroids_x[i], asteroids_y[i])
-
-            # draw graphics
-            play("marker_pulse", "draw_marker_element")
-            with if_(crashed):
-                draw_asteroid(ship_x, ship_y, ship_a)
-            with else_():
-                draw_ship(ship_x, ship_y, ship_a)
-            with for_(i, 0, i < N_rays, i + 1):
-                with if_(rays_active[i]):
-                    draw_ray(rays_x[i], rays_y[i], rays_a[i])
-            with for_(i, 0, i < N_asteroids, i + 1):
-                with if_(asteroids_active[i]):
-                    draw_asteroid(asteroids_x[i], asteroids_y[i], asteroids_a[i])
-            draw_border()
-
-            # wait until everything is drawn
-            align()
-
-            wait(int(wait_time))
- 
-            # update time
-            assign(t, t + time_step_size)
 
-        if debug:
-            with stream_processing():
-                a_stream.save_all('move')
-                b_stream.save_all('act')
+                # move asteroids
+                with for_(j, 0, j < N_asteroids, j + 1):
+                    with if_(asteroids_active[j]):
+                        assign(asteroids_x[j], asteroids_x[j] + Math.cos2pi(asteroids_a[j]) * v_asteroid * dt)
+                        assign(asteroids_y[j], asteroids_y[j] + Math.sin2pi(asteroids_a[j]) * v_asteroid * dt)
+
+                # process border collisions
+                process_border_collisions(ship_x, ship_y)
+                with for_(i, 0, i < N_rays, i + 1):
+                    with if_(rays_active[i]):
+                        process_border_collisions(rays_x[i], rays_y[i])
+                with for_(i, 0, i < N_asteroids, i + 1):
+                    with if_(asteroids_active[i]):
+                        process_border_collisions(asteroids_x[i], asteroids_y[i])
+
+                # draw graphics
+                play("marker_pulse", "draw_marker_element")
+                with if_(crashed):
+                    draw_asteroid(ship_x, ship_y, ship_a)
+                with else_():
+                    draw_ship(ship_x, ship_y, ship_a)
+                with for_(i, 0, i < N_rays, i + 1):
+                    with if_(rays_active[i]):
+                        draw_ray(rays_x[i], rays_y[i], rays_a[i])
+                with for_(i, 0, i < N_asteroids, i + 1):
+                    with if_(asteroids_active[i]):
+                        draw_asteroid(asteroids_x[i], asteroids_y[i], asteroids_a[i])
+                draw_border()
+
+                # wait until everything is drawn
+                align()
+
+                wait(int(wait_time))
+
+                # update time
+                assign(t, t + time_step_size)
+
+            if debug:
+                with stream_processing():
+                    a_stream.save_all('move')
+                    b_stream.save_all('act')
+    return game
+
+
+game = cached_program(build_game, configuration)
                 
 
         
@@ -541,6 +551,8 @@ def send_over_io(io_num, value, set_value):
 
 
 if __name__ == '__main__':
+    from pynput import keyboard
+
     job = qm.execute(game)
     res = job.result_handles
 
@@ -575,6 +587,8 @@ if __name__ == '__main__':
                 pass
 
     if debug:
+        import matplotlib.pyplot as plt
+
         res.wait_for_all_values()
         move = res.move.fetch_all()
         act = res.act.fetch_all()
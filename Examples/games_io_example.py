@@ -2,6 +2,7 @@ from time import sleep
 from pynput import keyboard
 from qm import *
 from qm.qua import *
+from OPXBOX_LIB.connection import LazyQM
 
 config = {
     "version": 1,
@@ -92,10 +93,7 @@ with program() as io_example:
     with stream_processing():
         pressed_keys.save_all('pressed_keys')
 
-qmm = QuantumMachinesManager('172.16.33.100', cluster_name='Cluster_81')
-qm = qmm.open_qm(config)
-job = qm.execute(io_example)
-res = job.result_handles
+qm = LazyQM(config, host='172.16.33.100', cluster_name='Cluster_81')
 
 
 def send_over_io(io_num, value, set_value):
@@ -107,33 +105,37 @@ def send_over_io(io_num, value, set_value):
         qm.set_io2_value(value)
 
 
-with keyboard.Events() as events:
-    for event in events:
-        # nothing: 0
-        # w: 1
-        # s: 2
-        # a: 3
-        # d: 4
-        # space: 5
-        # left crtl: 6
-        # escape: 99
-        if event.key == keyboard.Key.esc:
-            send_over_io(1, 99, type(event) is events.Press)
-            break
-        elif event.key == keyboard.Key.space:
-            send_over_io(1, 5, type(event) is events.Press)
-        elif event.key == keyboard.Key.ctrl_l:
-            send_over_io(1, 6, type(event) is events.Press)
-        elif event.key == keyboard.KeyCode.from_char('w'):
-            send_over_io(1, 1, type(event) is events.Press)
-        elif event.key == keyboard.KeyCode.from_char('s'):
-            send_over_io(1, 2, type(event) is events.Press)
-        elif event.key == keyboard.KeyCode.from_char('a'):
-            send_over_io(1, 3, type(event) is events.Press)
-        elif event.key == keyboard.KeyCode.from_char('d'):
-            send_over_io(1, 4, type(event) is events.Press)
-        else:
-            pass
+if __name__ == '__main__':
+    job = qm.execute(io_example)
+    res = job.result_handles
 
-a = res.pressed_keys.fetch_all()
-print(a)
+    with keyboard.Events() as events:
+        for event in events:
+            # nothing: 0
+            # w: 1
+            # s: 2
+            # a: 3
+            # d: 4
+            # space: 5
+            # left crtl: 6
+            # escape: 99
+            if event.key == keyboard.Key.esc:
+                send_over_io(1, 99, type(event) is events.Press)
+                break
+            elif event.key == keyboard.Key.space:
+                send_over_io(1, 5, type(event) is events.Press)
+            elif event.key == keyboard.Key.ctrl_l:
+                send_over_io(1, 6, type(event) is events.Press)
+            elif event.key == keyboard.KeyCode.from_char('w'):
+                send_over_io(1, 1, type(event) is events.Press)
+            elif event.key == keyboard.KeyCode.from_char('s'):
+                send_over_io(1, 2, type(event) is events.Press)
+            elif event.key == keyboard.KeyCode.from_char('a'):
+                send_over_io(1, 3, type(event) is events.Press)
+            elif event.key == keyboard.KeyCode.from_char('d'):
+                send_over_io(1, 4, type(event) is events.Press)
+            else:
+                pass
+
+    a = res.pressed_keys.fetch_all()
+    print(a)
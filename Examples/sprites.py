@@ -1,6 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import pytest
 
 def resample_trace(x, y, points):
 	assert len(x) == len(y)
@@ -14,20 +12,6 @@ def calc_distances(x, y):
 	y = np.asarray(y)
 	return np.sqrt(np.square(y[:-1]-y[1:])+np.square(x[:-1]-x[1:]))
 
-@pytest.mark.parametrize("x, y, exp", [
-	([0, 0], [0, 0], 0), 
-	([0, 0], [1, 1], 0), 
-	([0, 1], [0, 0], 1), 
-	([0, 0], [1, 0], 1), 
-	([0, 0], [0, 1], 1), 
-	([0, 1], [0, 1], np.sqrt(2)), 
-	([1, 0], [1, 0], np.sqrt(2)), 
-])
-def test_distances(x, y, exp):
-	res = calc_distances(x, y)
-	assert res.shape == (1, )
-	assert res[0] == pytest.approx(exp)
-
 def sample_with_speed(x, y, speed):
 	# speed is to be given in sample/volt
 	assert len(x) == len(y)
@@ -203,6 +187,8 @@ def get_word_pulse(points, letters):
 
 
 def draw_example(pulse):
+	import matplotlib.pyplot as plt
+
 	plt.plot(*pulse)
 	plt.show()
 
@@ -1,9 +1,6 @@
-import matplotlib.pyplot as plt
-from pynput import keyboard
-
-from qm import QuantumMachinesManager
 from qm.qua import *
 
+from connection import LazyQM
 from sprites import *
 
 sprite_length = 100
@@ -14,126 +11,129 @@ field_size = 0.3  # V
 
 input_probe_voltage = 0.2  # V
 
-configuration = {
-    'version': 1,
-    'controllers': {
-        'con1': {
-            'type': 'opx1',
-            'analog_outputs': {
-                1: {'offset': +0.0},
-                2: {'offset': +0.0},
-                3: {'offset': +0.0},
-                4: {'offset': +0.0},
-            },
-            'digital_outputs': {
-                1: {},
-            },
-            'analog_inputs': {
-                1: {'offset': -0.0},
-                2: {'offset': -0.0},
+def build_configuration():
+    """
+    The QUA configuration of the game, with all sprite waveforms.
+    """
+    return {
+        'version': 1,
+        'controllers': {
+            'con1': {
+                'type': 'opx1',
+                'analog_outputs': {
+                    1: {'offset': +0.0},
+                    2: {'offset': +0.0},
+                    3: {'offset': +0.0},
+                    4: {'offset': +0.0},
+                },
+                'digital_outputs': {
+                    1: {},
+                },
+                'analog_inputs': {
+                    1: {'offset': -0.0},
+                    2: {'offset': -0.0},
+                }
             }
-        }
-    },
-    'elements': {
-        'screen': {
-            'mixInputs': {
-                'I': ('con1', 1),
-                'Q': ('con1', 3),
-            },
-            'intermediate_frequency': 0,
-            'digitalInputs': {
-                'draw_marker': {
-                    'port': ('con1', 1),
-                    'delay': 0,
-                    'buffer': 0,
+        },
+        'elements': {
+            'screen': {
+                'mixInputs': {
+                    'I': ('con1', 1),
+                    'Q': ('con1', 3),
+                },
+                'intermediate_frequency': 0,
+                'digitalInputs': {
+                    'draw_marker': {
+                        'port': ('con1', 1),
+                        'delay': 0,
+                        'buffer': 0,
+                    },
+                },
+                'operations': {
+                    "bird": "bird",
+                    "pillar": "pillar",
+                    "border": "border",
                 },
             },
-            'operations': {
-                "bird": "bird",
-                "pillar": "pillar",
-                "border": "border",
-            },
-        },
-        'draw_marker_element': {
-            'singleInput': {
-                'port': ('con1', 3),
+            'draw_marker_element': {
+                'singleInput': {
+                    'port': ('con1', 3),
+                },
+                'intermediate_frequency': 0,
+                'operations': {
+                    "marker_pulse": "marker_pulse",
+                },
             },
-            'intermediate_frequency': 0,
-            'operations': {
-                "marker_pulse": "marker_pulse",
+            'user_input_element': {
+                'singleInput': {
+                    'port': ('con1', 4),
+                },
+                'outputs': {
+                    'a': ('con1', 1),
+                    'b': ('con1', 2),
+                },
+                'intermediate_frequency': 0,
+                'operations': {
+                    "measure_user_input": "measure_user_input",
+                },
+                'time_of_flight': 100,
+                'smearing': 0
             },
         },
-        'user_input_element': {
-            'singleInput': {
-                'port': ('con1', 4),
-            },
-            'outputs': {
-                'a': ('con1', 1),
-                'b': ('con1', 2),
-            },
-            'intermediate_frequency': 0,
-            'operations': {
-                "measure_user_input": "measure_user_input",
+        'pulses': {
+            **{n: {
+                'operation': 'control',
+                'length': sprite_length,
+                'waveforms': {k: f"{n}_{l}" for k, l in zip(["I", "Q"], ["x", "y"])},
+            }
+                for n in ["bird", "pillar", "border"]},
+            "measure_user_input": {
+                "operation": "measurement",
+                'length': user_input_pulse_length,
+                "integration_weights": {
+                    "constant": "cosine_weights",
+                },
+                'waveforms': {"single": "input_wf"},
             },
-            'time_of_flight': 100,
-            'smearing': 0
+            "marker_pulse": {
+                "operation": "control",
+                'length': sprite_length,
+                'waveforms': {"single": "marker_wf"},
+            }
         },
-    },
-    'pulses': {
-        **{n: {
-            'operation': 'control',
-            'length': sprite_length,
-            'waveforms': {k: f"{n}_{l}" for k, l in zip(["I", "Q"], ["x", "y"])},
-        }
-            for n in ["bird", "pillar", "border"]},
-        "measure_user_input": {
-            "operation": "measurement",
-            'length': user_input_pulse_length,
-            "integration_weights": {
-                "constant": "cosine_weights",
+        'waveforms': {
+            **{
+                f"border_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_border_pulse(sprite_length) * field_size)
             },
-            'waveforms': {"single": "input_wf"},
-        },
-        "marker_pulse": {
-            "operation": "control",
-            'length': sprite_length,
-            'waveforms': {"single": "marker_wf"},
-        }
-    },
-    'waveforms': {
-        **{
-            f"border_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_border_pulse(sprite_length) * field_size)
+            # 'marker_wf': {'type':'arbitrary', 'samples':[.1]*50+[0]*50},
+            'marker_wf': {"type": "constant", "sample": 0.2},
+            'input_wf': {"type": "constant", "sample": input_probe_voltage},
         },
-        # 'marker_wf': {'type':'arbitrary', 'samples':[.1]*50+[0]*50},
-        'marker_wf': {"type": "constant", "sample": 0.2},
-        'input_wf': {"type": "constant", "sample": input_probe_voltage},
-    },
-    'digital_waveforms': {
-        'draw_trigger': {
-            'samples': [(1, 0)]
-        }
-    },
-    "integration_weights": {
-        "cosine_weights": {
-            "cosine": [(1.0, user_input_pulse_length)],
-            "sine": [(0.0, user_input_pulse_length)],
+        'digital_waveforms': {
+            'draw_trigger': {
+                'samples': [(1, 0)]
+            }
         },
-        "sine_weights": {
-            "cosine": [(0.0, user_input_pulse_length)],
-            "sine": [(1.0, user_input_pulse_length)],
+        "integration_weights": {
+            "cosine_weights": {
+                "cosine": [(1.0, user_input_pulse_length)],
+                "sine": [(0.0, user_input_pulse_length)],
+            },
+            "sine_weights": {
+                "cosine": [(0.0, user_input_pulse_length)],
+                "sine": [(1.0, user_input_pulse_length)],
+            },
         },
-    },
-}
+    }
 
-# %%
 
-qop_ip = '192.168.116.171'
-qmm = QuantumMachinesManager(host=qop_ip, port=80)
+configuration = build_configuration()
 
 # %%
 
-qm = qmm.open_qm(configuration)
+qop_ip = '192.168.116.171'
+qm = LazyQM(configuration, host=qop_ip, port=80)
 
 
 # %%
@@ -228,6 +228,8 @@ def send_over_io(io_num, value, set_value):
 
 
 if __name__ == '__main__':
+    from pynput import keyboard
+
 
     with keyboard.Events() as events:
         for event in events:
@@ -259,6 +261,8 @@ if __name__ == '__main__':
                 pass
 
     if debug:
+        import matplotlib.pyplot as plt
+
         res.wait_for_all_values()
         move = res.move.fetch_all()
         act = res.act.fetch_all()
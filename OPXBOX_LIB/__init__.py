@@ -0,0 +1,6 @@
+"""
+Shared helpers for the OPXBOX games.
+
+The games import the modules in here directly, e.g.
+``from OPXBOX_LIB.telemetry import LivePlotter``.
+"""
@@ -0,0 +1,220 @@
+"""
+Benchmarks of the code that builds the games, with a history of the results.
+
+Every benchmark times one call, its setup (e.g. importing the game) is not
+timed. The time of a call is the best of `repeat` runs, each of which calls it
+as often as fits into about 0.2 s:
+
+- resample_trace: the sprite resampling of the games, for several lengths
+- get_word_pulse: the GAME OVER sprite of pong and flappy
+- configuration: `build_configuration()` of every game
+- program: building the QUA program of every game (without the program cache)
+- scope_render: rendering 10 frames of a game's sprites with the scope emulator
+
+Each run is appended to a history file (one json record per line, with the
+git commit it ran on), so the times of a benchmark can be followed over the
+commits and a run can be compared to the last one on the same machine:
+
+    python -m OPXBOX_LIB.benchmarks
+    python -m OPXBOX_LIB.benchmarks resample_trace program --compare
+    python -m OPXBOX_LIB.benchmarks --show program/pong
+
+With --compare the script exits with 1 if a time got slower than in the last
+run by more than --tolerance, like startup_benchmark.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from OPXBOX_LIB.launcher import GAMES, ROOT
+from OPXBOX_LIB.startup_benchmark import compare
+
+HISTORY = os.path.join(ROOT, 'benchmark_history.jsonl')
+# the games with a screen element, for the scope emulator
+SCREEN_GAMES = ['flappy', 'pong', 'asteroids']
+
+BENCHMARKS = {}
+
+
+def benchmark(*params):
+    """
+    Register a benchmark. The function takes a parameter and returns the
+    function to time.
+    """
+    def register(function):
+        BENCHMARKS[function.__name__] = (function, list(params))
+        return function
+    return register
+
+
+def _game(game):
+    from OPXBOX_LIB.launcher import load_game_module
+
+    return load_game_module(GAMES[game][0])
+
+
+@benchmark(100, 1000, 16500, 100000)
+def resample_trace(points):
+    import numpy as np
+
+    module = _game('pong')
+    x, y = np.cos(np.linspace(0, 2 * np.pi, 50)), np.sin(np.linspace(0, 2 * np.pi, 50))
+    return lambda: module.resample_trace(x, y, points)
+
+
+@benchmark('pong', 'flappy')
+def get_word_pulse(game):
+    m = _game(game)
+    length = m.SPRITE_LENGTH if hasattr(m, 'SPRITE_LENGTH') else 100
+    return lambda: m.get_word_pulse(length, [m.g(), m.a(), m.m(), m.e1(), m.space(), m.o(), m.v(), m.e2(), m.r()])
+
+
+def _one_game_per_script():
+    scripts = {}
+    for game, (path, _) in GAMES.items():
+        scripts.setdefault(path, game)
+    return sorted(scripts.values())
+
+
+@benchmark(*_one_game_per_script())
+def configuration(game):
+    return _game(game).build_configuration
+
+
+@benchmark(*sorted(GAMES))
+def program(game):
+    return getattr(_game(game), 'build_' + GAMES[game][1])
+
+
+@benchmark(*SCREEN_GAMES)
+def scope_render(game):
+    from OPXBOX_LIB.scope import ScopeEmulator, sprite_events
+
+    configuration = _game(game).configuration
+    events = list(sprite_events(configuration, frames=10))
+
+    def render():
+        scope = ScopeEmulator(configuration, resolution=200)
+        return sum(1 for _ in scope.render(events))
+    return render
+
+
+def time_call(function, repeat=3, target=0.2):
+    """
+    The best time (s) of one call of `function`.
+    """
+    t0 = time.perf_counter()
+    function()
+    first = time.perf_counter() - t0
+    number = max(1, int(target / max(first, 1e-9)))
+    best = first
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return best
+
+
+def run(names=None, repeat=3):
+    """
+    The times of the benchmarks (all, or those in `names`), as
+    {benchmark: {parameter: seconds}}.
+    """
+    results = {}
+    for name in names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            raise ValueError(f"There is no benchmark '{name}', pick one of {', '.join(BENCHMARKS)}.")
+        function, params = BENCHMARKS[name]
+        results[name] = {str(p): time_call(function(p), repeat) for p in params}
+    return results
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record(results):
+    """
+    A history record of the results: where and on which commit they were measured.
+    """
+    import numpy
+
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'machine': platform.node(),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'results': results,
+    }
+
+
+def load_history(path=HISTORY):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(entry, path=HISTORY):
+    with open(path, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def last_run(history, machine=None):
+    """
+    The results of the last run on `machine` (default: this one), or {}.
+    """
+    machine = machine or platform.node()
+    runs = [entry['results'] for entry in history if entry['machine'] == machine]
+    return runs[-1] if runs else {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark building the sprites, configurations and programs.')
+    parser.add_argument('benchmarks', nargs='*', default=[], help=f'default: all of {", ".join(BENCHMARKS)}')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--history', default=HISTORY, help='the json lines file the runs are appended to')
+    parser.add_argument('--no-save', action='store_true', help="don't append this run to the history")
+    parser.add_argument('--compare', action='store_true', help='compare to the last run on this machine')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--show', metavar='BENCHMARK/PARAMETER', help='print the history of one benchmark')
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    if args.show:
+        name, _, param = args.show.partition('/')
+        for entry in history:
+            seconds = entry['results'].get(name, {}).get(param)
+            if seconds is not None:
+                print(f"{entry['date']}  {entry['commit'] or '-':>9}{'*' if entry['dirty'] else ' '} "
+                      f"{entry['machine']:<16}{seconds * 1e3:>12.4f} ms")
+        return 0
+
+    results = run(args.benchmarks, args.repeat)
+    for name, times in results.items():
+        for param, seconds in times.items():
+            print(f'{name + "/" + param:<40}{seconds * 1e3:>12.4f} ms')
+    status = 0
+    if args.compare:
+        slower = compare(results, last_run(history), args.tolerance, slack=1e-6)
+        for name, param, now, before in slower:
+            print(f'{name}/{param} got slower: {before * 1e3:.4f} ms -> {now * 1e3:.4f} ms')
+        status = 1 if slower else 0
+    if not args.no_save:
+        append_history(record(results), args.history)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Calibration of the analog controller.
+
+Instead of reading the printed levels of controller_debug and typing them
+into the game, the calibration measures the controller while each button is
+held, builds a histogram of the levels of every button and fits the
+thresholds with the largest margin between neighbouring buttons. The result
+is written as the profile that `ControllerDecoder.from_profile` loads:
+
+    python -m OPXBOX_LIB.calibration
+    python -m OPXBOX_LIB.calibration --seconds 3 --output my_controller.json
+
+The measurement uses the configuration of the controller game
+(flappy_bird/flappy_new_w_controller.py) and its full-length measurement, so
+the levels are in the units the games decode. Recorded samples can be fitted
+again without the OPX:
+
+    python -m OPXBOX_LIB.calibration --save-samples samples.npz
+    python -m OPXBOX_LIB.calibration --from-samples samples.npz
+"""
+import argparse
+import time
+
+import numpy as np
+
+from OPXBOX_LIB.controller import DEFAULT_PROFILE, ControllerDecoder
+
+BUTTONS = ['A', 'B', 'Down', 'Up', 'Right', 'Left']
+IDLE = 'Nothing'
+
+
+class LevelHistogram:
+    """
+    A histogram of measured levels that is filled chunk by chunk.
+    """
+
+    def __init__(self, low=-8.0, high=8.0, bins=16000):
+        self.low = low
+        self.width = (high - low) / bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    @property
+    def centers(self):
+        return self.low + (np.arange(len(self.counts)) + 0.5) * self.width
+
+    def add(self, values):
+        """
+        Count the values, the ones outside of the histogram go to its first or last bin.
+        """
+        idx = np.floor((np.asarray(values, dtype=float).ravel() - self.low) / self.width).astype(np.int64)
+        self.counts += np.bincount(np.clip(idx, 0, len(self.counts) - 1), minlength=len(self.counts))
+
+    def quantile(self, q):
+        """
+        The levels below which the fractions `q` of the values lie (to the
+        resolution of the bins).
+        """
+        if not self.total:
+            raise ValueError('The histogram is empty.')
+        cumulative = np.cumsum(self.counts)
+        idx = np.searchsorted(cumulative, np.asarray(q) * self.total, side='left')
+        return self.centers[np.minimum(idx, len(self.counts) - 1)]
+
+    def range(self, outliers=1e-3):
+        """
+        The range of the levels without the `outliers` fraction on each side.
+        """
+        low, high = self.quantile([outliers, 1 - outliers])
+        return float(low), float(high)
+
+
+def fit_thresholds(ranges):
+    """
+    The thresholds with the largest margin between the level ranges of
+    neighbouring buttons, i.e. the middle of each gap.
+
+    Returns the names sorted by level, the thresholds and the margins (half of
+    each gap). Raises ValueError if two ranges overlap.
+    """
+    names = sorted(ranges, key=lambda name: ranges[name][0])
+    low = np.array([ranges[n][0] for n in names])
+    high = np.array([ranges[n][1] for n in names])
+    gaps = low[1:] - high[:-1]
+    if (gaps <= 0).any():
+        k = int(np.argmin(gaps))
+        raise ValueError(f"The levels of {names[k]} and {names[k + 1]} overlap, they can't be told apart.")
+    return names, (high[:-1] + low[1:]) / 2, gaps / 2
+
+
+def build_decoder(histograms, buttons=BUTTONS, outliers=1e-3):
+    """
+    The decoder of the histograms of each button (and of "Nothing"), and the
+    level range of each.
+    """
+    ranges = {name: h.range(outliers) for name, h in histograms.items()}
+    names, thresholds, _ = fit_thresholds(ranges)
+    labels = [buttons.index(n) if n != IDLE else -1 for n in names]
+    return ControllerDecoder(thresholds.tolist(), labels, buttons), ranges
+
+
+def build_calibration_program(element='user_input_element', pulse='measure_user_input', output='out2'):
+    """
+    Measures the controller in a loop and streams the raw levels to "I".
+    """
+    from qm.qua import declare, declare_stream, demod, fixed, infinite_loop_, measure, program, save, \
+        stream_processing
+
+    with program() as calibration:
+        I = declare(fixed)
+        I_stream = declare_stream()
+        with infinite_loop_():
+            measure(pulse, element, demod.full('cos', I, output))
+            save(I, I_stream)
+        with stream_processing():
+            I_stream.save_all('I')
+    return calibration
+
+
+def record(handle, seconds, histogram, chunk=10000):
+    """
+    Fill `histogram` with the values streamed to `handle` for `seconds`.
+    """
+    from OPXBOX_LIB.telemetry import StreamHistory
+
+    stream = StreamHistory(handle, chunk)
+    stream.poll()  # skip the values of the previous button
+    t_end = time.perf_counter() + seconds
+    while time.perf_counter() < t_end:
+        new = stream.poll()
+        if new:
+            histogram.add(stream.values[-min(new, chunk):])
+        time.sleep(0.02)
+
+
+def calibrate(qm, names, seconds=2.0):
+    """
+    Ask for every button in turn and record its levels. Returns the histograms.
+    """
+    job = qm.execute(build_calibration_program())
+    handle = job.result_handles.get('I')
+    handle.wait_for_values(1)
+    histograms = {}
+    try:
+        for name in names:
+            input(f'Hold {name} (release all buttons for {IDLE}) and press enter ')
+            histograms[name] = LevelHistogram()
+            record(handle, seconds, histograms[name])
+            low, high = histograms[name].range()
+            print(f'{name}: {low:.3f} - {high:.3f} ({histograms[name].total} samples)')
+    finally:
+        job.halt()
+    return histograms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Calibrate the analog controller.')
+    parser.add_argument('--output', default=DEFAULT_PROFILE, help='profile to write')
+    parser.add_argument('--seconds', type=float, default=2.0, help='recording time per button')
+    parser.add_argument('--outliers', type=float, default=1e-3, help='fraction ignored at each end of a range')
+    parser.add_argument('--save-samples', help='also store the histograms in this npz file')
+    parser.add_argument('--from-samples', help='fit the histograms of this npz file instead of measuring')
+    args = parser.parse_args(argv)
+
+    names = BUTTONS + [IDLE]
+    if args.from_samples:
+        data = np.load(args.from_samples)
+        histograms = {}
+        for name in names:
+            histograms[name] = LevelHistogram()
+            histograms[name].counts = data[name]
+    else:
+        from OPXBOX_LIB.launcher import load_game_module
+
+        game = load_game_module('flappy_bird/flappy_new_w_controller.py')
+        histograms = calibrate(game.qm, names, args.seconds)
+    if args.save_samples:
+        np.savez(args.save_samples, **{name: h.counts for name, h in histograms.items()})
+
+    decoder, ranges = build_decoder(histograms, outliers=args.outliers)
+    _, _, margins = fit_thresholds(ranges)
+    print('thresholds: ' + ', '.join(f'{t:.3f}' for t in decoder.thresholds))
+    print(f'smallest margin: {margins.min():.3f}')
+    decoder.to_profile(args.output, levels={name: list(r) for name, r in ranges.items()})
+    print(f'wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
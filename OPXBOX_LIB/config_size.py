@@ -0,0 +1,181 @@
+"""
+How much waveform memory the configuration of a game takes, and how long it
+takes to upload.
+
+Every sprite of a game is a pair of arbitrary waveforms of its pulse length
+(16500 samples in flappy), which are sent to the OPX with the configuration
+when the game opens its quantum machine. This lists the samples of every
+waveform and of every element (the waveforms its operations play), finds
+waveforms with the same samples under different names, and estimates the
+serialized size of the configuration and its upload time:
+
+    size = config_size(module.configuration)
+    print(size.report())
+
+The waveforms are measured as the protobuf messages they are sent as (8 bytes
+per sample), the rest of the configuration as json. The upload time assumes
+`UPLOAD_RATE`, pass a measured --upload-rate for your network. With a budget
+the script exits with 1 if a game exceeds it, e.g. in CI:
+
+    python -m OPXBOX_LIB.config_size
+    python -m OPXBOX_LIB.config_size flappy picture --max-samples 300000 --max-upload 1
+"""
+import argparse
+import json
+import sys
+
+import numpy as np
+
+UPLOAD_RATE = 5e6  # bytes/s, a rough rate of the configuration upload to the OPX
+
+
+def waveform_samples(waveform):
+    """
+    The samples of a waveform of the configuration (one for a constant).
+    """
+    if waveform['type'] == 'constant':
+        return np.array([waveform['sample']], dtype=float)
+    return np.asarray(waveform['samples'], dtype=float)
+
+
+def waveform_bytes(waveform):
+    """
+    The serialized size of a waveform, as the protobuf message of the configuration.
+    """
+    from qm.grpc.qm.pb.inc_qua_config_pb2 import QuaConfig
+
+    if waveform['type'] == 'constant':
+        return QuaConfig.ConstantWaveformDec(sample=waveform['sample']).ByteSize()
+    return QuaConfig.ArbitraryWaveformDec(samples=waveform_samples(waveform).tolist()).ByteSize()
+
+
+def _json(value):
+    return value.tolist() if isinstance(value, np.ndarray) else str(value)
+
+
+class ConfigSize:
+    """
+    The waveform memory of a configuration. After `run`, `waveforms` maps a
+    waveform to its samples (0 for a constant), `elements` an element to the
+    waveforms it plays and `duplicates` holds the groups of waveforms with the
+    same samples.
+    """
+
+    def __init__(self, configuration, upload_rate=UPLOAD_RATE):
+        self.configuration = configuration
+        self.upload_rate = upload_rate
+        self.waveforms = {}
+        self.elements = {}
+        self.duplicates = []
+        self.waveform_bytes = 0
+        self.other_bytes = 0
+
+    def run(self):
+        configuration = self.configuration
+        groups = {}
+        for name, waveform in configuration.get('waveforms', {}).items():
+            samples = waveform_samples(waveform)
+            self.waveforms[name] = 0 if waveform['type'] == 'constant' else len(samples)
+            self.waveform_bytes += waveform_bytes(waveform)
+            groups.setdefault((waveform['type'], samples.tobytes()), []).append(name)
+        self.duplicates = [names for names in groups.values() if len(names) > 1]
+        for element, settings in configuration.get('elements', {}).items():
+            used = []
+            for pulse in settings.get('operations', {}).values():
+                for waveform in configuration['pulses'][pulse].get('waveforms', {}).values():
+                    if waveform not in used:
+                        used.append(waveform)
+            self.elements[element] = used
+        rest = {key: value for key, value in configuration.items() if key != 'waveforms'}
+        self.other_bytes = len(json.dumps(rest, default=_json))
+        return self
+
+    @property
+    def samples(self):
+        return sum(self.waveforms.values())
+
+    def element_samples(self, element):
+        return sum(self.waveforms[w] for w in self.elements[element])
+
+    @property
+    def duplicate_samples(self):
+        """
+        The samples that merging the duplicate waveforms would save.
+        """
+        return sum(self.waveforms[names[0]] * (len(names) - 1) for names in self.duplicates)
+
+    @property
+    def serialized_bytes(self):
+        return self.waveform_bytes + self.other_bytes
+
+    @property
+    def upload_time(self):
+        return self.serialized_bytes / self.upload_rate
+
+    def over_budget(self, max_samples=None, max_bytes=None, max_upload=None):
+        """
+        A message for every budget (samples, bytes, upload seconds) that is exceeded.
+        """
+        checks = [
+            ('samples', self.samples, max_samples, '{:.0f}'),
+            ('serialized size', self.serialized_bytes / 1e3, max_bytes and max_bytes / 1e3, '{:.1f} kB'),
+            ('upload time', self.upload_time, max_upload, '{:.2f} s'),
+        ]
+        return [f'{name} {form.format(value)} > {form.format(budget)}'
+                for name, value, budget, form in checks if budget is not None and value > budget]
+
+    def report(self):
+        lines = [f'{len(self.waveforms)} waveforms, {self.samples} samples, '
+                 f'{self.serialized_bytes / 1e3:.1f} kB serialized, '
+                 f'~{self.upload_time:.2f} s upload at {self.upload_rate / 1e6:g} MB/s',
+                 'by element:']
+        for element in sorted(self.elements, key=lambda e: -self.element_samples(e)):
+            lines.append(f'  {element:<28}{len(self.elements[element]):>4} waveforms'
+                         f'{self.element_samples(element):>10} samples')
+        lines.append('by waveform:')
+        for name, samples in sorted(self.waveforms.items(), key=lambda w: -w[1]):
+            lines.append(f'  {name:<28}{samples if samples else "constant":>10}')
+        for names in self.duplicates:
+            lines.append(f'duplicate: {", ".join(names)} ({self.waveforms[names[0]]} samples each)')
+        if self.duplicates:
+            lines.append(f'merging the duplicates saves {self.duplicate_samples} samples')
+        return '\n'.join(lines)
+
+
+def config_size(configuration, upload_rate=UPLOAD_RATE):
+    """
+    The waveform samples and serialized size of a configuration.
+    """
+    return ConfigSize(configuration, upload_rate).run()
+
+
+def main(argv=None):
+    from OPXBOX_LIB.launcher import GAMES, load_game_module
+
+    scripts = {}
+    for game, (path, _) in GAMES.items():
+        scripts.setdefault(path, game)
+    parser = argparse.ArgumentParser(description='Report the waveform samples and upload size of game configurations.')
+    parser.add_argument('games', nargs='*', default=[], help='default: one game per script')
+    parser.add_argument('--upload-rate', type=float, default=UPLOAD_RATE, help='bytes/s')
+    parser.add_argument('--max-samples', type=int, help='budget of waveform samples per configuration')
+    parser.add_argument('--max-kb', type=float, help='budget of the serialized size (kB)')
+    parser.add_argument('--max-upload', type=float, help='budget of the upload time (s)')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for game in args.games or sorted(scripts.values()):
+        if game not in GAMES:
+            raise ValueError(f"There is no game '{game}', pick one of {', '.join(sorted(GAMES))}.")
+        size = config_size(load_game_module(GAMES[game][0]).configuration, args.upload_rate)
+        print(f'== {game}')
+        print(size.report())
+        over = size.over_budget(args.max_samples, args.max_kb and args.max_kb * 1e3, args.max_upload)
+        for message in over:
+            print(f'OVER BUDGET: {message}')
+        failed += bool(over)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
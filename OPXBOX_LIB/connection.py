@@ -0,0 +1,186 @@
+"""
+Lazy connection to the OPX.
+
+The games used to create the QuantumMachinesManager and open the quantum
+machine at import time, which blocks on the network and the config upload.
+`LazyQM` defers both until the quantum machine is used for the first time:
+
+    qm = LazyQM(configuration, host='172.16.33.107', port=9510)
+    ...
+    job = qm.execute(game)  # connects and opens the qm here
+
+The host given by the game is only a fallback. It is overwritten by the
+environment variables OPXBOX_HOST, OPXBOX_PORT and OPXBOX_CLUSTER, or by a json
+file with the keys "host", "port" and "cluster_name" (~/.opxbox.json, or the
+path in OPXBOX_CONFIG).
+
+Managers are cached per connection and open quantum machines per connection and
+configuration hash, so opening the same configuration twice is free.
+
+`set_manager_factory` replaces the QuantumMachinesManager, e.g. by the
+FakeQuantumMachinesManager of fake_qm.py to run the games without an OPX.
+Setting OPXBOX_FAKE=1 does the same without changing any code.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CONFIG_FILE = os.path.join(os.path.expanduser('~'), '.opxbox.json')
+
+_managers = {}
+_open_qms = {}
+_manager_factory = None
+
+
+def _update_hash(h, obj):
+    if isinstance(obj, dict):
+        h.update(b'{')
+        for k in sorted(obj, key=str):
+            h.update(repr(k).encode())
+            _update_hash(h, obj[k])
+        h.update(b'}')
+    elif isinstance(obj, (list, tuple, np.ndarray)):
+        try:
+            arr = np.asarray(obj)
+        except ValueError:  # ragged
+            arr = np.empty(0, dtype=object)
+        if arr.dtype.kind in 'biuf':
+            # waveforms are long lists of numbers, hash them as one block
+            h.update(b'[')
+            h.update(np.ascontiguousarray(arr, dtype=float).tobytes())
+            h.update(repr(arr.shape).encode())
+        else:
+            h.update(b'(')
+            for e in obj:
+                _update_hash(h, e)
+            h.update(b')')
+    else:
+        h.update(repr(obj).encode())
+
+
+def config_hash(configuration):
+    """
+    A hash of a QUA configuration dict that does not depend on the order of the
+    keys or on whether waveforms are lists or numpy arrays.
+    """
+    h = hashlib.sha1()
+    _update_hash(h, configuration)
+    return h.hexdigest()
+
+
+def connection_settings(host=None, port=None, cluster_name=None):
+    """
+    The settings used to connect to the OPX.
+
+    The arguments are fallbacks, the config file overwrites them and the
+    environment variables overwrite the config file.
+    """
+    settings = {'host': host, 'port': port, 'cluster_name': cluster_name}
+    path = os.environ.get('OPXBOX_CONFIG', CONFIG_FILE)
+    if os.path.isfile(path):
+        with open(path) as f:
+            settings.update({k: v for k, v in json.load(f).items() if k in settings})
+    for key, env in [('host', 'OPXBOX_HOST'), ('port', 'OPXBOX_PORT'), ('cluster_name', 'OPXBOX_CLUSTER')]:
+        if os.environ.get(env):
+            settings[key] = os.environ[env]
+    if settings['port'] is not None:
+        settings['port'] = int(settings['port'])
+    return settings
+
+
+def set_manager_factory(factory):
+    """
+    Create the managers with `factory(**settings)` instead of the
+    QuantumMachinesManager (None restores it). The managers and quantum
+    machines opened so far are forgotten. Returns the previous factory.
+    """
+    global _manager_factory
+    previous, _manager_factory = _manager_factory, factory
+    _managers.clear()
+    _open_qms.clear()
+    return previous
+
+
+def _use_fake():
+    return os.environ.get('OPXBOX_FAKE', '') not in ('', '0')
+
+
+def _get_manager_factory():
+    if _manager_factory is not None:
+        return _manager_factory
+    if _use_fake():
+        from OPXBOX_LIB.fake_qm import FakeQuantumMachinesManager
+
+        return FakeQuantumMachinesManager
+    from qm import QuantumMachinesManager
+
+    return QuantumMachinesManager
+
+
+def get_qmm(host=None, port=None, cluster_name=None):
+    """
+    The (cached) QuantumMachinesManager for these connection settings.
+    """
+    settings = connection_settings(host, port, cluster_name)
+    key = (_manager_factory, _use_fake(), tuple(sorted(settings.items())))
+    if key not in _managers:
+        _managers[key] = _get_manager_factory()(**{k: v for k, v in settings.items() if v is not None})
+    return _managers[key]
+
+
+def get_qm(configuration, host=None, port=None, cluster_name=None):
+    """
+    Open the configuration on the OPX, or return the already opened quantum
+    machine for it.
+    """
+    settings = connection_settings(host, port, cluster_name)
+    key = (_manager_factory, _use_fake(), tuple(sorted(settings.items())), config_hash(configuration))
+    if key not in _open_qms:
+        _open_qms[key] = get_qmm(**settings).open_qm(configuration)
+    return _open_qms[key]
+
+
+def close_all():
+    """
+    Close all quantum machines opened through this module.
+    """
+    for qm in _open_qms.values():
+        qm.close()
+    _open_qms.clear()
+
+
+class LazyQM:
+    """
+    Stands in for the QuantumMachine of a configuration and only connects when
+    one of its attributes (execute, set_io1_value, ...) is used. Every game
+    creates its `qm` like this, so importing a game (in the launcher, the tests
+    or the benchmarks) never connects; the host the game passes can be
+    overwritten with OPXBOX_HOST (see above). For the same reason the games
+    import the slow modules they only need to play or plot (pynput,
+    matplotlib, cv2) where they use them, mostly under `__main__`.
+
+    The games import OPXBOX_LIB from the repository root, run them from there
+    with it on the path, e.g. `PYTHONPATH=. python pong/pong.py`, or through
+    `python -m OPXBOX_LIB.launcher pong`.
+    """
+
+    def __init__(self, configuration, host=None, port=None, cluster_name=None):
+        self._configuration = configuration
+        self._connection = {'host': host, 'port': port, 'cluster_name': cluster_name}
+        self._qm = None
+
+    @property
+    def is_open(self):
+        return self._qm is not None
+
+    def open(self):
+        if self._qm is None:
+            self._qm = get_qm(self._configuration, **self._connection)
+        return self._qm
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.open(), name)
@@ -0,0 +1,345 @@
+"""
+Reading the analog controller.
+
+The controller is a resistor ladder read with one measurement: each button
+pulls the demodulated level I to a different value (see Examples/README.md).
+Instead of a chain of `elif_` range tests, the `ControllerDecoder` loads a
+table of thresholds into a QUA array and finds the region of I with a binary
+search, so decoding costs the same few comparisons for every button.
+
+The table comes from a calibration profile (json):
+
+    {
+        "buttons": ["A", "B", "Down", "Up", "Right", "Left"],
+        "thresholds": [-3.2, -3.0, ...],
+        "labels": [-1, 0, -1, ...]
+    }
+
+`thresholds` are sorted and split the range of I into len(thresholds) + 1
+regions. `labels[k]` is the index of the button pressed in region k, -1 means
+that no button is pressed. The optional "levels" entry holds the recorded level
+range of every button and of "Nothing", the `DriftTracker` follows the latter.
+"""
+import json
+import os
+
+import numpy as np
+
+DEFAULT_PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'controller_profile.json')
+
+# fixed point variables can't hold more, used to pad the threshold table
+MAX_FIXED = 7.99
+
+
+class ControllerDecoder:
+    """
+    Decodes the measured controller level into the index of the pressed button.
+
+    Usage in a program:
+        decoder = ControllerDecoder.from_profile()
+        with program() as prog:
+            decoder.declare()
+            ...
+            measure(..., demod.full("cos", I, "out2"))
+            decoder.decode(I)  # decoder.button now holds the index, or -1
+    """
+
+    def __init__(self, thresholds, labels, buttons):
+        thresholds = [float(t) for t in thresholds]
+        if sorted(thresholds) != thresholds:
+            raise ValueError('The thresholds have to be sorted.')
+        if len(labels) != len(thresholds) + 1:
+            raise ValueError('There has to be one label more than thresholds.')
+        self.thresholds = thresholds
+        self.labels = [int(label) for label in labels]
+        self.buttons = list(buttons)
+        self.button = None
+        # the profile the table was loaded from, and the levels recorded in it
+        self.path = None
+        self.levels = {}
+
+    @classmethod
+    def from_profile(cls, path=DEFAULT_PROFILE):
+        with open(path) as f:
+            profile = json.load(f)
+        decoder = cls(profile['thresholds'], profile['labels'], profile['buttons'])
+        decoder.path = path
+        decoder.levels = profile.get('levels', {})
+        return decoder
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        """
+        Build the table from the level range of each button, e.g.
+        {'A': (-3.2, -3.0), 'B': (-1.5, -1.2)}. Levels outside of all ranges
+        decode to no button.
+        """
+        buttons = list(ranges)
+        thresholds = []
+        labels = [-1]
+        for name, (low, high) in sorted(ranges.items(), key=lambda item: item[1][0]):
+            if thresholds and low < thresholds[-1]:
+                raise ValueError(f'The range of {name} overlaps with another one.')
+            thresholds += [low, high]
+            labels += [buttons.index(name), -1]
+        return cls(thresholds, labels, buttons)
+
+    def to_profile(self, path, **extra):
+        """
+        Write the table to a profile file. `extra` entries (e.g. the measured
+        levels) are stored along with it.
+        """
+        with open(path, 'w') as f:
+            json.dump({'buttons': self.buttons, 'thresholds': self.thresholds, 'labels': self.labels, **extra},
+                      f, indent=2)
+
+    @property
+    def steps(self):
+        """
+        The number of comparisons of the binary search.
+        """
+        return int(np.ceil(np.log2(len(self.thresholds) + 1)))
+
+    def classify(self, levels):
+        """
+        The button index of each level, computed on the host (like `decode`).
+        """
+        region = np.searchsorted(self.thresholds, levels, side='left')
+        return np.asarray(self.labels)[region]
+
+    def declare(self):
+        """
+        Declare the table and the variables of the search, call inside the program.
+        """
+        from qm.qua import declare, fixed
+
+        # one extra threshold, so the search never indexes past the table
+        self._thresholds = declare(fixed, value=self.thresholds + [MAX_FIXED])
+        self._labels = declare(int, value=self.labels)
+        self._low = declare(int)
+        self._high = declare(int)
+        self._mid = declare(int)
+        self.button = declare(int, value=-1)
+        return self.button
+
+    def decode(self, I):
+        """
+        Assign the index of the pressed button (or -1) to `self.button`.
+        """
+        from qm.qua import assign, else_, if_
+
+        assign(self._low, 0)
+        assign(self._high, len(self.thresholds))
+        # the python loop unrolls into a fixed number of steps
+        for _ in range(self.steps):
+            assign(self._mid, (self._low + self._high) >> 1)
+            with if_(I > self._thresholds[self._mid]):
+                assign(self._low, self._mid + 1)
+            with else_():
+                assign(self._high, self._mid)
+        assign(self.button, self._labels[self._low])
+        return self.button
+
+    def set_flags(self, act):
+        """
+        Set act[button] to 1 for the last decoded button, the other entries of
+        `act` are not touched.
+        """
+        from qm.qua import assign, if_
+
+        with if_(self.button >= 0):
+            assign(act[self.button], 1)
+
+    def decode_flags(self, I, act):
+        """
+        Decode and set act[button] to 1, the other entries of `act` are not touched.
+        """
+        self.decode(I)
+        self.set_flags(act)
+
+
+class ShortWindowReader:
+    """
+    Reads the controller level with a few short measurements instead of one
+    long one.
+
+    The demodulated level grows with the length of the measurement, so every
+    window is scaled by `full_window / window` to the units of the profile.
+    After each window the running mean is decoded, and the read stops as soon
+    as the mean is further than `margin / sqrt(n)` from both thresholds of its
+    region (n windows measured so far), or after `max_windows` windows.
+
+    Usage in a program:
+        reader = ShortWindowReader(decoder, window=10000, full_window=500000)
+        with program() as prog:
+            reader.declare()  # also declares the decoder
+            ...
+            reader.read(I, "measure_user_input_short", "user_input_element")
+            decoder.set_flags(act)
+    """
+
+    def __init__(self, decoder, window, full_window, max_windows=4, margin=0.03):
+        if full_window % window:
+            raise ValueError('The full window has to be a multiple of the window.')
+        if max_windows < 1:
+            raise ValueError('At least one window has to be measured.')
+        self.decoder = decoder
+        self.window = window
+        self.full_window = full_window
+        self.scale = full_window // window
+        self.max_windows = max_windows
+        self.margin = margin
+
+    @property
+    def margins(self):
+        """
+        The distance to the thresholds needed to stop after 1, 2, ... windows.
+        """
+        return [self.margin / np.sqrt(n + 1) for n in range(self.max_windows)]
+
+    def emulate(self, windows):
+        """
+        Run the read on the host, for the scaled levels of each window
+        (shape (reads, max_windows)). Returns the decoded buttons and the
+        number of windows each read used.
+        """
+        windows = np.atleast_2d(windows)
+        n = np.arange(1, windows.shape[1] + 1)
+        means = np.cumsum(windows, axis=1) / n
+        bounds = np.concatenate([[-np.inf], self.decoder.thresholds, [np.inf]])
+        region = np.searchsorted(self.decoder.thresholds, means, side='left')
+        distance = np.minimum(means - bounds[region], bounds[region + 1] - means)
+        done = distance > np.asarray(self.margins)
+        done[:, -1] = True
+        used = np.argmax(done, axis=1)
+        reads = np.arange(len(windows))
+        return np.asarray(self.decoder.labels)[region[reads, used]], used + 1
+
+    def declare(self):
+        """
+        Declare the tables and variables of the read (and of the decoder), call
+        inside the program.
+        """
+        from qm.qua import declare, fixed
+
+        self.decoder.declare()
+        self._bounds = declare(fixed, value=[-MAX_FIXED] + self.decoder.thresholds + [MAX_FIXED])
+        self._margins = declare(fixed, value=self.margins)
+        self._inverse = declare(fixed, value=[1 / (n + 1) for n in range(self.max_windows)])
+        self._window = declare(fixed)
+        self._n = declare(int)
+        self._done = declare(bool)
+
+    def read(self, I, pulse, element, output='out2', offset=None):
+        """
+        Measure until the level is unambiguous, assign the mean level to `I`
+        and its button to `decoder.button`. `offset` (e.g. `DriftTracker.offset`)
+        is subtracted from every window.
+        """
+        from qm.qua import Cast, assign, demod, measure, while_
+
+        low = self.decoder._low
+        assign(self._n, 0)
+        assign(I, 0)
+        assign(self._done, False)
+        with while_(self._done == False):
+            measure(pulse, element, demod.full('cos', self._window, output))
+            level = Cast.mul_fixed_by_int(self._window, self.scale)
+            if offset is not None:
+                level = level - offset
+            # running mean, stays in the fixed point range unlike a sum
+            assign(I, I + (level - I) * self._inverse[self._n])
+            self.decoder.decode(I)
+            assign(self._done, ((I - self._bounds[low] > self._margins[self._n]) &
+                                (self._bounds[low + 1] - I > self._margins[self._n])) |
+                   (self._n >= self.max_windows - 1))
+            assign(self._n, self._n + 1)
+        return self.decoder.button
+
+
+class DriftTracker:
+    """
+    Follows the slow drift of the controller levels on the FPGA.
+
+    In every frame where no button is pressed (the level decodes to the region
+    of the "Nothing" level), the offset between the measured level and the
+    recorded idle level is updated with an exponential moving average:
+
+        offset += alpha * (I - offset - idle_level)
+
+    The offset is subtracted from the measured level before decoding, which
+    shifts all thresholds of the profile by the drift. It is limited to
+    +-max_offset, so a misread press can't pull it away.
+
+    Usage in a program:
+        tracker = DriftTracker(decoder)
+        with program() as prog:
+            decoder.declare()
+            tracker.declare()
+            ...
+            measure(..., demod.full("cos", I, "out2"))
+            tracker.compensate(I)
+            decoder.decode(I)
+            tracker.update(I)
+    """
+
+    def __init__(self, decoder, idle_level=None, alpha=0.02, max_offset=0.05):
+        if idle_level is None:
+            if 'Nothing' not in decoder.levels:
+                raise ValueError('The profile has no "Nothing" level, pass the idle level.')
+            idle_level = float(np.mean(decoder.levels['Nothing']))
+        self.idle_region = int(np.searchsorted(decoder.thresholds, idle_level, side='left'))
+        if decoder.labels[self.idle_region] != -1:
+            raise ValueError(f'The idle level {idle_level} decodes to a button.')
+        self.decoder = decoder
+        self.idle_level = idle_level
+        self.alpha = alpha
+        self.max_offset = max_offset
+        self.offset = None
+
+    def emulate(self, levels, offset=0.0):
+        """
+        Run the tracker on the host for a trace of measured levels (one per
+        frame). Returns the decoded buttons and the offset in every frame.
+        """
+        labels = np.asarray(self.decoder.labels)
+        buttons = np.empty(len(levels), dtype=int)
+        offsets = np.empty(len(levels))
+        for k, level in enumerate(levels):
+            level -= offset
+            region = np.searchsorted(self.decoder.thresholds, level, side='left')
+            buttons[k] = labels[region]
+            if region == self.idle_region:
+                offset = np.clip(offset + self.alpha * (level - self.idle_level), -self.max_offset, self.max_offset)
+            offsets[k] = offset
+        return buttons, offsets
+
+    def declare(self):
+        """
+        Declare the offset, call inside the program.
+        """
+        from qm.qua import declare, fixed
+
+        self.offset = declare(fixed, value=0.0)
+        return self.offset
+
+    def compensate(self, I):
+        """
+        Subtract the offset from the measured level.
+        """
+        from qm.qua import assign
+
+        assign(I, I - self.offset)
+
+    def update(self, I):
+        """
+        Update the offset with the compensated level `I`, after it was decoded.
+        """
+        from qm.qua import assign, if_
+
+        with if_(self.decoder._low == self.idle_region):
+            assign(self.offset, self.offset + self.alpha * (I - self.idle_level))
+            with if_(self.offset > self.max_offset):
+                assign(self.offset, self.max_offset)
+            with if_(self.offset < -self.max_offset):
+                assign(self.offset, -self.max_offset)
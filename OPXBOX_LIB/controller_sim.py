@@ -0,0 +1,139 @@
+"""
+Simulation of the controller reads on the host.
+
+Estimates how often a short-window read (see `ShortWindowReader`) decodes the
+wrong button, for several window lengths. The levels of the buttons are the
+middle of the ranges recorded in the profile, and the measurement noise is
+white: `noise` is the standard deviation of the level measured over the full
+window, so a window that is k times shorter has sqrt(k) times more noise.
+
+    python -m OPXBOX_LIB.controller_sim
+    python -m OPXBOX_LIB.controller_sim --noise 0.02 --windows 2000 5000 10000
+
+With --drift it instead simulates a long session in which all levels drift by
+the given amount, and compares the error rate of the fixed thresholds with the
+one of the `DriftTracker`:
+
+    python -m OPXBOX_LIB.controller_sim --drift 0.05
+
+The random generator is seeded (--seed), so the results are reproducible.
+"""
+import argparse
+import json
+
+import numpy as np
+
+from OPXBOX_LIB.controller import DEFAULT_PROFILE, ControllerDecoder, DriftTracker, ShortWindowReader
+
+FULL_WINDOW = 500000  # ns, the measurement the profile was recorded with
+WINDOWS = [1000, 2000, 5000, 10000, 20000, 50000]
+
+
+def profile_levels(path=DEFAULT_PROFILE):
+    """
+    The middle of the recorded level range of every button (and of "Nothing").
+    """
+    with open(path) as f:
+        return {name: float(np.mean(bounds)) for name, bounds in json.load(f)['levels'].items()}
+
+
+def window_levels(levels, window, full_window, max_windows, noise, rng):
+    """
+    The scaled level of every window of `len(levels)` reads, with white noise.
+    """
+    sigma = noise * np.sqrt(full_window / window)
+    levels = np.asarray(levels, dtype=float)
+    return levels[:, None] + rng.normal(0, sigma, (len(levels), max_windows))
+
+
+def simulate(decoder, window, levels=None, full_window=FULL_WINDOW, max_windows=4, margin=0.03, noise=0.002,
+             reads=10000, seed=0):
+    """
+    Simulate `reads` reads of every button. Returns the error rate, the mean
+    number of windows and the mean measurement time per read (in us).
+    """
+    levels = levels or profile_levels()
+    reader = ShortWindowReader(decoder, window, full_window, max_windows, margin)
+    rng = np.random.default_rng(seed)
+    names = list(levels)
+    expected = np.repeat([decoder.buttons.index(n) if n in decoder.buttons else -1 for n in names], reads)
+    true_levels = np.repeat([levels[n] for n in names], reads)
+    buttons, used = reader.emulate(window_levels(true_levels, window, full_window, max_windows, noise, rng))
+    return {
+        'window': window,
+        'error_rate': float(np.mean(buttons != expected)),
+        'windows': float(np.mean(used)),
+        'time_us': float(np.mean(used)) * window / 1e3,
+    }
+
+
+def drifting_trace(decoder, frames, drift, levels=None, noise=0.002, press_probability=0.3, hold=20, seed=0):
+    """
+    A session of `frames` measured levels, in which the levels drift linearly
+    by `drift`. Buttons are held for `hold` frames at a time, with `noise` on
+    every frame. Returns the levels and the button pressed in every frame.
+    """
+    levels = levels or profile_levels()
+    rng = np.random.default_rng(seed)
+    names = [n for n in levels if n != 'Nothing']
+    blocks = -(-frames // hold)
+    pressed = rng.random(blocks) < press_probability
+    choice = np.where(pressed, rng.integers(len(names), size=blocks), -1)
+    buttons = np.repeat([decoder.buttons.index(names[c]) if c >= 0 else -1 for c in choice], hold)[:frames]
+    true_levels = np.repeat([levels[names[c]] if c >= 0 else levels['Nothing'] for c in choice], hold)[:frames]
+    return true_levels + np.linspace(0, drift, frames) + rng.normal(0, noise, frames), buttons
+
+
+def simulate_drift(decoder, drift, frames=20000, tracker=None, **trace):
+    """
+    The error rate of the fixed thresholds and of the drift tracker, over the
+    whole session and over its last 10 %.
+    """
+    tracker = tracker or DriftTracker(decoder)
+    levels, expected = drifting_trace(decoder, frames, drift, **trace)
+    tracked, offsets = tracker.emulate(levels)
+    fixed = decoder.classify(levels)
+    tail = slice(int(frames * 0.9), None)
+    return {
+        'drift': drift,
+        'fixed': float(np.mean(fixed != expected)),
+        'fixed_end': float(np.mean(fixed[tail] != expected[tail])),
+        'tracked': float(np.mean(tracked != expected)),
+        'tracked_end': float(np.mean(tracked[tail] != expected[tail])),
+        'offset_end': float(offsets[-1]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate the error rate of short controller reads.')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE)
+    parser.add_argument('--windows', type=int, nargs='+', default=WINDOWS, help='window lengths in ns')
+    parser.add_argument('--max-windows', type=int, default=4)
+    parser.add_argument('--margin', type=float, default=0.03)
+    # a guess of the white noise of the measured level, measure it on the controller for a real estimate
+    parser.add_argument('--noise', type=float, default=0.002, help='std of the level over the full window')
+    parser.add_argument('--reads', type=int, default=10000, help='reads per button')
+    parser.add_argument('--seed', type=int, default=0)
+    # Examples/README.md reports levels drifting by about 0.002 V on the positive side
+    parser.add_argument('--drift', type=float, nargs='+', help='simulate a session with these drifts (V)')
+    parser.add_argument('--frames', type=int, default=20000, help='frames of the drifting session')
+    args = parser.parse_args(argv)
+
+    decoder = ControllerDecoder.from_profile(args.profile)
+    levels = profile_levels(args.profile)
+    if args.drift:
+        print(f"{'drift [V]':>10}{'fixed':>10}{'(end)':>10}{'tracked':>10}{'(end)':>10}{'offset':>10}")
+        for drift in args.drift:
+            r = simulate_drift(decoder, drift, args.frames, levels=levels, noise=args.noise, seed=args.seed)
+            print(f"{drift:>10.3f}{r['fixed']:>10.2e}{r['fixed_end']:>10.2e}"
+                  f"{r['tracked']:>10.2e}{r['tracked_end']:>10.2e}{r['offset_end']:>10.3f}")
+        return
+    print(f"{'window [ns]':>12}{'error rate':>12}{'windows':>10}{'time [us]':>11}")
+    for window in args.windows:
+        r = simulate(decoder, window, levels, max_windows=args.max_windows, margin=args.margin,
+                     noise=args.noise, reads=args.reads, seed=args.seed)
+        print(f"{r['window']:>12}{r['error_rate']:>12.2e}{r['windows']:>10.2f}{r['time_us']:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
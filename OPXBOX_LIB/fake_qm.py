@@ -0,0 +1,263 @@
+"""
+A local stand-in for the QuantumMachinesManager.
+
+It accepts any configuration, records the IO values that are written and the
+programs that are executed, and serves result streams from given data, so the
+host side of the games (input forwarding, telemetry, startup) runs without an
+OPX. Select it through the connection layer:
+
+    connection.set_manager_factory(FakeQuantumMachinesManager)
+
+or by setting OPXBOX_FAKE=1, then every LazyQM / get_qm opens a fake quantum
+machine. The results of a stream are given per name, as an array (a finite
+stream) or as a function that returns the first n values (an endless one):
+
+    qmm = FakeQuantumMachinesManager(results={'I': np.random.rand(1000)}, rate=1e4)
+    connection.set_manager_factory(lambda **settings: qmm)
+
+With `rate` (values per second) the values arrive over time after `execute`,
+like the values of a running game, otherwise they are all there at once.
+"""
+import time
+
+import numpy as np
+
+
+def stream_names(program):
+    """
+    The names of the results a QUA program saves (in its stream processing or
+    with `save(var, 'name')`).
+    """
+    return [m.values[1].string_value for m in program.qua_program.resultAnalysis.model]
+
+
+class FakeResultHandle:
+    """
+    One result stream of a fake job, with the methods of a qm result handle.
+    """
+
+    def __init__(self, job, name, values, rate=None):
+        self.job = job
+        self.name = name
+        self._values = values
+        self.rate = rate
+
+    def _length(self):
+        return np.inf if callable(self._values) else len(self._values)
+
+    def count_so_far(self):
+        if self.rate is None:
+            count = self._length()
+            if np.isinf(count):
+                raise ValueError(f"The endless stream '{self.name}' needs a rate.")
+        else:
+            count = min(self._length(), int(self.job.elapsed() * self.rate))
+        return int(count)
+
+    def _data(self, count):
+        if callable(self._values):
+            return np.asarray(self._values(count), dtype=float)[:count]
+        return np.asarray(self._values, dtype=float)[:count]
+
+    def fetch(self, item, flat_struct=False):
+        data = self._data(self.count_so_far())[item]
+        if flat_struct:
+            return data
+        structured = np.zeros(np.shape(data), dtype=[('value', float)])
+        structured['value'] = data
+        return structured
+
+    def fetch_all(self, flat_struct=False):
+        return self.fetch(slice(None), flat_struct)
+
+    def is_processing(self):
+        return self.job.is_running()
+
+    def is_complete(self):
+        return self.count_so_far() >= self._length()
+
+    def wait_for_values(self, count=1, timeout=None):
+        t_end = None if timeout is None else time.perf_counter() + timeout
+        while self.count_so_far() < count:
+            if not self.job.is_running():
+                raise ValueError(f"The job ended with {self.count_so_far()} values in '{self.name}'.")
+            if t_end is not None and time.perf_counter() > t_end:
+                raise TimeoutError(f"'{self.name}' has {self.count_so_far()} of {count} values.")
+            time.sleep(0.001)
+
+    def wait_for_all_values(self, timeout=None):
+        self.job.wait_until_done(timeout)
+        return True
+
+
+class FakeResultHandles:
+    """
+    The result handles of a fake job, by name (`res.get('I')` or `res.I`).
+    """
+
+    def __init__(self, handles, job):
+        self._handles = handles
+        self._job = job
+
+    def get(self, name):
+        return self._handles.get(name)
+
+    def keys(self):
+        return list(self._handles)
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._handles:
+            raise AttributeError(name)
+        return self._handles[name]
+
+    def is_processing(self):
+        return self._job.is_running()
+
+    def wait_for_all_values(self, timeout=None):
+        self._job.wait_until_done(timeout)
+        return True
+
+
+class FakeJob:
+    """
+    An executed program. It runs until it is halted, or until all of its
+    (finite) result streams are complete.
+    """
+
+    def __init__(self, machine, program):
+        self.machine = machine
+        self.program = program
+        self.started = time.perf_counter()
+        self.halted = None
+        names = stream_names(program)
+        results = machine.manager.results
+        self.result_handles = FakeResultHandles(
+            {n: FakeResultHandle(self, n, results.get(n, np.zeros(0)), machine.manager.rate) for n in names}, self)
+
+    def elapsed(self):
+        return (self.halted or time.perf_counter()) - self.started
+
+    def is_running(self):
+        if self.halted is not None:
+            return False
+        handles = [self.result_handles.get(n) for n in self.result_handles.keys()]
+        return not handles or not all(h.is_complete() for h in handles)
+
+    def wait_until_done(self, timeout=None):
+        t_end = None if timeout is None else time.perf_counter() + timeout
+        while self.is_running():
+            if t_end is not None and time.perf_counter() > t_end:
+                raise TimeoutError('The job is still running.')
+            time.sleep(0.001)
+
+    def halt(self):
+        if self.halted is None:
+            self.halted = time.perf_counter()
+        return True
+
+
+class _PendingJob:
+    def __init__(self, job):
+        self.job = job
+
+    def wait_for_execution(self, timeout=None):
+        return self.job
+
+
+class _Queue:
+    def __init__(self, machine):
+        self.machine = machine
+
+    def add_compiled(self, program_id):
+        return _PendingJob(self.machine.execute(self.machine.compiled[program_id]))
+
+    def add(self, program):
+        return _PendingJob(self.machine.execute(program))
+
+
+class FakeQuantumMachine:
+    """
+    An open fake quantum machine. `io_writes` holds (time, 'io1'/'io2', value)
+    of every IO write, `executed` the jobs of all executed programs.
+    """
+
+    def __init__(self, manager, configuration):
+        self.manager = manager
+        self.configuration = configuration
+        self.io_values = {'io1': 0, 'io2': 0}
+        self.io_writes = []
+        self.executed = []
+        self.compiled = {}
+        self.queue = _Queue(self)
+        self.closed = False
+
+    def get_config(self):
+        return self.configuration
+
+    def _set_io(self, io, value):
+        self.io_values[io] = value
+        self.io_writes.append((time.perf_counter(), io, value))
+
+    def set_io1_value(self, value):
+        self._set_io('io1', value)
+
+    def set_io2_value(self, value):
+        self._set_io('io2', value)
+
+    def set_io_values(self, io1_value=None, io2_value=None):
+        if io1_value is not None:
+            self._set_io('io1', io1_value)
+        if io2_value is not None:
+            self._set_io('io2', io2_value)
+
+    def _get_io(self, io):
+        value = self.io_values[io]
+        return {'int_value': int(value), 'fixed_value': float(value), 'boolean_value': bool(value)}
+
+    def get_io1_value(self):
+        return self._get_io('io1')
+
+    def get_io2_value(self):
+        return self._get_io('io2')
+
+    def compile(self, program):
+        program_id = f'program-{len(self.compiled)}'
+        self.compiled[program_id] = program
+        return program_id
+
+    def execute(self, program, *args, **kwargs):
+        # like the OPX, a quantum machine runs one program at a time
+        if self.executed:
+            self.executed[-1].halt()
+        self.executed.append(FakeJob(self, program))
+        return self.executed[-1]
+
+    def close(self):
+        if self.executed:
+            self.executed[-1].halt()
+        self.closed = True
+        return True
+
+
+class FakeQuantumMachinesManager:
+    """
+    Takes the arguments of the QuantumMachinesManager (and ignores them).
+    `results` maps stream names to their values, `rate` sets how fast the
+    values arrive (values per second, None: all at once).
+    """
+
+    def __init__(self, host=None, port=None, cluster_name=None, results=None, rate=None, **kwargs):
+        self.settings = {'host': host, 'port': port, 'cluster_name': cluster_name, **kwargs}
+        self.results = dict(results or {})
+        self.rate = rate
+        self.machines = []
+
+    def open_qm(self, configuration, *args, **kwargs):
+        self.machines.append(FakeQuantumMachine(self, configuration))
+        return self.machines[-1]
+
+    def close_all_qms(self):
+        for machine in self.machines:
+            machine.close()
+
+    close_all_quantum_machines = close_all_qms
@@ -0,0 +1,385 @@
+"""
+Static estimate of the time a game takes to draw one frame.
+
+The frame loop of a game (the while_/infinite_loop_ that plays the most
+pulses) is walked along every control-flow path through it. Every element
+has its own timeline, as on the OPX:
+
+- play and measure add the length of their pulse to the timeline of their
+  element, a measure also its time of flight, and the program waits for its
+  result before it goes on,
+- wait adds its duration (in clock cycles of 4 ns) to its elements, or to all
+  of them,
+- align makes its elements (or all of them) wait for the slowest one,
+- the classical statements (assign, if_, loop iterations) take a few clock
+  cycles each, pulses can't start before the statements ahead of them ran.
+
+A frame takes as long as its slowest timeline. for_ loops with constant
+bounds run their number of iterations, the paths that reach the same times
+are merged, so the paths are counted without being listed one by one. The
+cycles of the classical statements are rough numbers, the durations of the
+pulses and waits are exact.
+
+    estimate = estimate_frame_time(game, configuration, budget=1e9 / 30)
+    print(estimate.report())
+
+    python -m OPXBOX_LIB.frame_time flappy pong --fps 30
+"""
+import argparse
+import math
+
+from OPXBOX_LIB.range_analysis import oneof, parse_loc, where
+
+CLOCK = 4  # ns per clock cycle
+# rough clock cycles of the classical statements
+CYCLES = {
+    'assign': 1,         # plus one per operation of the expression
+    'function': 4,       # a Math/Random function in an expression
+    'if': 2,             # evaluating a condition and branching
+    'iteration': 2,      # one turn of a loop (its condition and jump)
+    'command': 1,        # issuing a play, wait, align, ...
+}
+MAX_PATHS = 2000  # distinct timings kept per statement, the fastest and the slowest ones
+
+
+def _operations(expression):
+    """
+    The number of operations and of function calls in an expression.
+    """
+    kind, e = oneof(expression, 'expression_oneof')
+    if kind == 'binaryOperation':
+        left, right = _operations(e.left), _operations(e.right)
+        return left[0] + right[0] + 1, left[1] + right[1]
+    if kind == 'libFunction':
+        counts = [_operations(a.scalar) for a in e.arguments if a.WhichOneof('argument_oneof') == 'scalar']
+        return sum(c[0] for c in counts), sum(c[1] for c in counts) + 1
+    if kind == 'arrayCell':
+        return _operations(e.index)
+    return 0, 0
+
+
+def _locs(message):
+    for field, value in message.ListFields():
+        if field.name == 'loc':
+            yield value
+        elif field.message_type is not None:
+            for item in (value if field.is_repeated else [value]):
+                yield from _locs(item)
+
+
+def _lines(block):
+    """
+    The source lines of the statements in a block, in the file of its first statement.
+    """
+    locs = [parse_loc(loc)[:2] for loc in _locs(block)]
+    locs = [(file, line) for file, line in locs if line is not None]
+    return sorted({line for file, line in locs if file == locs[0][0]}) if locs else []
+
+
+def _first_line(message):
+    return next((line for line in (parse_loc(loc)[1] for loc in _locs(message)) if line is not None), None)
+
+
+def _where(message):
+    # 'file.py:line' of the first statement in a message
+    for loc in _locs(message):
+        file, line, _ = parse_loc(loc)
+        if line is not None:
+            return where(file, line)
+    return '?'
+
+
+def _constant(expression):
+    kind, e = oneof(expression, 'expression_oneof')
+    return float(e.value) if kind == 'literal' and e.value not in ('True', 'False') else None
+
+
+class _Path:
+    """
+    The timelines of the paths that reached the same times: the time of every
+    element and of the classical statements, the number of such paths, one of
+    their branch choices and where its time went.
+    """
+    __slots__ = ('times', 'now', 'count', 'choices', 'parts')
+
+    def __init__(self, times, now, count=1, choices=(), parts=None):
+        self.times = times
+        self.now = now
+        self.count = count
+        self.choices = choices
+        self.parts = parts or {}
+
+    def key(self):
+        return self.now, tuple(sorted(self.times.items()))
+
+    def end(self):
+        return max([self.now, *self.times.values()])
+
+    def copy(self, choice=None):
+        choices = self.choices if choice is None else self.choices + (choice,)
+        return _Path(dict(self.times), self.now, self.count, choices, dict(self.parts))
+
+    def add(self, part, ns):
+        self.parts[part] = self.parts.get(part, 0) + ns
+
+
+def _merge(paths):
+    merged = {}
+    for path in paths:
+        key = path.key()
+        if key in merged:
+            merged[key].count += path.count
+        else:
+            merged[key] = path
+    paths = sorted(merged.values(), key=_Path.end)
+    if len(paths) > MAX_PATHS:
+        paths = paths[:MAX_PATHS // 2] + paths[-MAX_PATHS // 2:]
+    return paths
+
+
+class FrameTime:
+    """
+    The paths through the frame loop of a program, see the module docstring.
+    After `run`, `paths` holds the timings of the paths at the end of a frame.
+    """
+
+    def __init__(self, program, configuration, budget=None, loop_line=None):
+        self.script = program.qua_program.script
+        self.configuration = configuration
+        self.elements = sorted(configuration['elements'])
+        self.budget = budget
+        self.loop_line = loop_line
+        self.unknown = {}
+        self.paths = []
+        self.loop = None
+
+    # durations
+
+    def pulse_length(self, element, operation):
+        pulses = self.configuration['pulses']
+        return pulses[self.configuration['elements'][element]['operations'][operation]]['length']
+
+    def _classical(self, paths, cycles):
+        for path in paths:
+            path.now += cycles * CLOCK
+            path.add('classical', cycles * CLOCK)
+        return paths
+
+    def _duration(self, statement):
+        value = _constant(statement.time)
+        if value is None:
+            # a duration held in a variable
+            self.unknown[_where(statement)] = 'a wait with a variable duration counts as 0'
+            return 0
+        return int(value) * CLOCK
+
+    # statements
+
+    def _play(self, paths, element, length, part, blocking=False):
+        for path in paths:
+            start = max(path.times[element], path.now)
+            path.times[element] = start + length
+            path.add(part, length)
+            if blocking:
+                path.now = path.times[element]
+        return paths
+
+    def _wait(self, paths, elements, ns):
+        for path in paths:
+            for element in elements:
+                path.times[element] = max(path.times[element], path.now) + ns
+            path.add('wait', ns)
+        return paths
+
+    def _align(self, paths, elements):
+        for path in paths:
+            end = max([path.now] + [path.times[e] for e in elements])
+            for element in elements:
+                path.times[element] = end
+            path.now = end
+        return paths
+
+    def _if(self, paths, s):
+        branches = [(s.condition, s.body, s.loc)] + [(e.condition, e.body, e.loc) for e in s.elseifs]
+        result = []
+        rest = paths
+        for condition, body, loc in branches:
+            line = parse_loc(loc)[1]
+            rest = self._classical(rest, CYCLES['if'] + sum(_operations(condition)))
+            result += self.block(body, [p.copy((line, True)) for p in rest])
+            rest = [p.copy((line, False)) for p in rest]
+        return _merge(result + self.block(getattr(s, 'else'), rest))
+
+    def _trip_count(self, s):
+        # for_(i, a, i < b, i + c) with constant a, b and c
+        init, update = list(s.init.statements), list(s.update.statements)
+        if len(init) != 1 or len(update) != 1 or init[0].WhichOneof('statement_oneof') != 'assign':
+            return None
+        start = _constant(init[0].assign.expression)
+        kind, condition = oneof(s.condition, 'expression_oneof')
+        kind_update, step = oneof(update[0].assign.expression, 'expression_oneof')
+        if start is None or kind != 'binaryOperation' or kind_update != 'binaryOperation':
+            return None
+        stop, increment = _constant(condition.right), _constant(step.right)
+        op = condition.DESCRIPTOR.fields_by_name['op'].enum_type.values_by_number[condition.op].name
+        if stop is None or not increment or op not in ('LT', 'LET', 'GT', 'GET'):
+            return None
+        if step.DESCRIPTOR.fields_by_name['op'].enum_type.values_by_number[step.op].name == 'SUB':
+            increment = -increment
+        span = (stop - start) / increment + (op in ('LET', 'GET'))
+        return max(0, math.ceil(span))
+
+    def _for(self, paths, s):
+        paths = self.block(s.init, paths)
+        count = self._trip_count(s)
+        if count is None:
+            self.unknown[_where(s)] = 'a loop without constant bounds counts one iteration'
+            count = 1
+        for _ in range(count):
+            paths = self._classical(paths, CYCLES['iteration'])
+            paths = self.block(s.update, self.block(s.body, paths))
+        return self._classical(paths, CYCLES['iteration'])
+
+    def statement(self, statement, paths):
+        kind, s = oneof(statement, 'statement_oneof')
+        if kind == 'assign':
+            operations, functions = _operations(s.expression)
+            return self._classical(paths, CYCLES['assign'] + operations + CYCLES['function'] * functions)
+        if kind == 'play':
+            paths = self._classical(paths, CYCLES['command'])
+            paths = self._play(paths, s.qe.name, self.pulse_length(s.qe.name, s.namedPulse.name), 'pulses')
+            if s.HasField('duration'):
+                self.unknown[_where(s)] = 'a play with a duration counts the length of its pulse'
+            return paths
+        if kind == 'measure':
+            element = self.configuration['elements'][s.qe.name]
+            length = self.pulse_length(s.qe.name, s.pulse.name)
+            length += element.get('time_of_flight', 0) + element.get('smearing', 0)
+            return self._play(self._classical(paths, CYCLES['command']), s.qe.name, length, 'measure', blocking=True)
+        if kind == 'wait':
+            elements = [qe.name for qe in s.qe] or self.elements
+            return self._wait(self._classical(paths, CYCLES['command']), elements, self._duration(s))
+        if kind == 'align':
+            return self._align(self._classical(paths, CYCLES['command']), [qe.name for qe in s.qe] or self.elements)
+        if kind == 'if':
+            return self._if(paths, s)
+        if kind == 'for':
+            return self._for(paths, s)
+        if kind in ('strictTiming', 'forEach'):
+            if kind == 'forEach':
+                self.unknown[_where(s)] = 'a for_each_ counts one iteration'
+            return self.block(s.body, paths)
+        return self._classical(paths, CYCLES['command'])
+
+    def block(self, block, paths):
+        for statement in block.statements:
+            paths = _merge(self.statement(statement, paths))
+        return paths
+
+    # the frame loop
+
+    def _loops(self, block, depth=0):
+        for statement in block.statements:
+            kind, s = oneof(statement, 'statement_oneof')
+            if kind == 'if':
+                for body in [s.body, getattr(s, 'else')] + [e.body for e in s.elseifs]:
+                    yield from self._loops(body, depth)
+            elif kind == 'for':
+                # while_ and infinite_loop_ are for loops without init and update
+                if not s.init.statements and not s.update.statements:
+                    yield s, depth
+                yield from self._loops(s.body, depth + 1)
+            elif kind in ('strictTiming', 'forEach'):
+                yield from self._loops(s.body, depth + 1)
+
+    def frame_loop(self):
+        """
+        The loop that draws a frame: the while_/infinite_loop_ that plays the
+        most pulses, the innermost one of equals (or the innermost one around
+        `loop_line`).
+        """
+        loops = [(s, depth, str(s.body).count('play {') + str(s.body).count('measure {'))
+                 for s, depth in self._loops(self.script.body)]
+        loops = [loop for loop in loops if loop[2]]
+        if self.loop_line is not None:
+            loops = [loop for loop in loops if self.loop_line in _lines(loop[0].body)]
+        if not loops:
+            raise ValueError('The program has no frame loop (a while_ or infinite_loop_ that plays pulses).')
+        return max(loops, key=lambda loop: (loop[2] if self.loop_line is None else 0, loop[1]))[0]
+
+    def run(self):
+        self.loop = self.frame_loop()
+        start = [_Path({e: 0 for e in self.elements}, 0)]
+        paths = self._classical(start, CYCLES['iteration'])
+        self.paths = self.block(self.loop.body, paths)
+        return self
+
+    # results
+
+    @property
+    def best(self):
+        return min(p.end() for p in self.paths)
+
+    @property
+    def worst(self):
+        return max(p.end() for p in self.paths)
+
+    def over_budget(self):
+        """
+        The paths that take longer than the budget, slowest first.
+        """
+        if self.budget is None:
+            return []
+        return sorted([p for p in self.paths if p.end() > self.budget], key=_Path.end, reverse=True)
+
+    def report(self):
+        paths = sum(p.count for p in self.paths)
+        lines = [f'frame loop from line {_first_line(self.loop.body)}, {paths:.4g} paths',
+                 f'  best  {self.best / 1e6:9.3f} ms  {1e9 / self.best:8.1f} fps',
+                 f'  worst {self.worst / 1e6:9.3f} ms  {1e9 / self.worst:8.1f} fps']
+        slowest = max(self.paths, key=_Path.end)
+        parts = ', '.join(f'{part} {ns / 1e6:.3f} ms' for part, ns in sorted(slowest.parts.items()))
+        lines.append(f'  the worst path spends: {parts}')
+        if self.budget is not None:
+            over = self.over_budget()
+            lines.append(f'  {sum(p.count for p in over):.4g} of {paths:.4g} paths exceed the budget of '
+                         f'{self.budget / 1e6:.3f} ms')
+            if over:
+                taken = {}
+                for line, truth in over[0].choices:
+                    taken.setdefault(line, []).append(truth)
+                choices = ', '.join(f'line {line}: {sum(t)} of {len(t)} true' for line, t in sorted(taken.items()))
+                lines.append(f'    the slowest takes {over[0].end() / 1e6:.3f} ms ({choices or "no branches"})')
+        for where, note in sorted(self.unknown.items()):
+            lines.append(f'  {where}: {note}')
+        return '\n'.join(lines)
+
+
+def estimate_frame_time(program, configuration, budget=None, loop_line=None):
+    """
+    The frame time estimate of a game program. `budget` is the time a frame
+    may take (ns), `loop_line` the source line of the frame loop, if it is not
+    the innermost loop that plays pulses.
+    """
+    return FrameTime(program, configuration, budget, loop_line).run()
+
+
+def main(argv=None):
+    from OPXBOX_LIB.launcher import GAMES, load_game_module
+
+    parser = argparse.ArgumentParser(description='Estimate the frame time of games from their QUA programs.')
+    parser.add_argument('games', nargs='+', choices=sorted(GAMES))
+    parser.add_argument('--fps', type=float, default=30, help='the frame rate the frames have to reach')
+    parser.add_argument('--loop-line', type=int, help='the source line of the frame loop')
+    args = parser.parse_args(argv)
+
+    for game in args.games:
+        path, program_name = GAMES[game]
+        module = load_game_module(path)
+        estimate = estimate_frame_time(getattr(module, program_name), module.configuration,
+                                       budget=1e9 / args.fps, loop_line=args.loop_line)
+        print(f'{game}: {estimate.report()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Golden images of what the games draw, for regression tests.
+
+Every sprite of a game and a few key frames (scenes built with the game's own
+draw functions, see `SCENES`) are rendered with the offline scope emulator and
+compared to stored images in tests/golden/<game>/. The comparison is
+perceptual: both images are blurred a little, like the glow of the phosphor,
+and only the pixels whose brightness then differs clearly count as changed. A
+sprite that moved by a fraction of a pixel or got a few samples more passes, a
+sprite that got distorted, moved or scaled does not.
+
+After an intended change of the drawings, look at the diff images and update
+the golden images:
+
+    python -m OPXBOX_LIB.golden --diff diffs/
+    python -m OPXBOX_LIB.golden --update flappy
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from OPXBOX_LIB.launcher import GAMES, ROOT, load_game_module
+from OPXBOX_LIB.scope import ScopeEmulator, emulate_qua, pulse_samples
+
+GOLDEN_DIR = os.path.normpath(os.path.join(ROOT, 'tests', 'golden'))
+RESOLUTION = 128
+SIGMA = 1.0       # px, the blur before comparing
+THRESHOLD = 0.25  # the brightness difference (of 1) from which a blurred pixel counts as changed
+TOLERANCE = 0.05  # the fraction of the lit pixels that may change
+
+
+def _flappy_playing(m):
+    m.play('blank', 'screen')
+    for x in np.linspace(-m.FIELD_SIZE, m.FIELD_SIZE, 5):
+        m.draw_pillar(x, -m.FIELD_SIZE, 3)
+        m.draw_reverse_pillar(x, m.FIELD_SIZE * 1.5, 3)
+    m.draw_bird(0.0, 0.05, 0.1)
+
+
+def _pong_playing(m):
+    m.draw_player2(m.field_size * 0.8, 0.1, 0)
+    m.draw_ray(0.05, -0.05, 0)
+    m.draw_player1(-m.field_size * 0.8, -0.1, 0)
+    m.draw_border()
+
+
+def _pong_game_over(m):
+    m.draw_ray(0, 0, 0)
+    m.draw_game_over(-0.15, 0)
+    m.draw_border()
+
+
+def _asteroids_playing(m):
+    m.draw_ship(0.0, 0.0, 0.1)
+    for k in range(3):
+        m.draw_ray(0.05 * (k + 1), 0.02 * k, 0.1)
+    for x, y, a in [(-0.2, 0.15, 0.0), (0.15, -0.2, 0.3), (0.2, 0.2, 0.7)]:
+        m.draw_asteroid(x, y, a)
+    m.draw_border()
+
+
+def _mario_playing(m):
+    for x, y in [(-0.2, -0.25), (0.1, -0.1)]:
+        m.draw_floor(x, y)
+    m.draw_character(0.0, 0.0)
+
+
+def _picture_face(m):
+    m.draw_face(0.0, 0.0)
+
+
+# the key frames of the games: name -> function that draws it with the game's draw functions
+SCENES = {
+    'flappy': {'playing': _flappy_playing, 'game_over': lambda m: m.draw_game_over(-0.15, 0)},
+    'pong': {'playing': _pong_playing, 'game_over': _pong_game_over},
+    'asteroids': {'playing': _asteroids_playing},
+    'mario': {'playing': _mario_playing},
+    'picture': {'face': _picture_face},
+}
+
+
+def sprite_span(samples):
+    """
+    The half width (V) of the image of a sprite: a power of 2 times 10 mV
+    around its extent, so small changes of its size keep the scale.
+    """
+    extent = 1.1 * max(float(np.abs(samples).max()), 1e-3)
+    return 0.01 * 2.0 ** np.ceil(np.log2(extent / 0.01))
+
+
+def render_sprite(configuration, operation, element='screen'):
+    samples, _ = pulse_samples(configuration, element, operation)
+    scope = ScopeEmulator(configuration, element, RESOLUTION, sprite_span(samples), persistence=0)
+    scope.play(operation)
+    return scope.frame()
+
+
+def render_scene(module, scene, span=0.5):
+    scope = ScopeEmulator(module.configuration, 'screen', RESOLUTION, span, persistence=0)
+    with emulate_qua(module, scope):
+        scene(module)
+    return scope.frame()
+
+
+def images(game):
+    """
+    The images of a game: 'sprite_<operation>' for every sprite and
+    'scene_<name>' for every key frame.
+    """
+    module = load_game_module(GAMES[game][0])
+    configuration = module.configuration
+    result = {}
+    for operation in configuration['elements']['screen']['operations']:
+        samples, mask = pulse_samples(configuration, 'screen', operation)
+        if mask.any() and np.abs(samples).max() > 0:
+            result[f'sprite_{operation}'] = render_sprite(configuration, operation)
+    for name, scene in SCENES.get(game, {}).items():
+        result[f'scene_{name}'] = render_scene(module, scene)
+    return result
+
+
+def blur(image, sigma=SIGMA):
+    """
+    The image (as floats of 0..1) blurred with a gaussian of `sigma` px.
+    """
+    radius = int(np.ceil(3 * sigma))
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    kernel /= kernel.sum()
+    image = np.asarray(image, dtype=float) / 255
+    image = np.apply_along_axis(np.convolve, 0, image, kernel, mode='same')
+    return np.apply_along_axis(np.convolve, 1, image, kernel, mode='same')
+
+
+def difference(image, golden, sigma=SIGMA, threshold=THRESHOLD):
+    """
+    The fraction of the lit pixels of both images that differ clearly after
+    blurring, and the mask of those pixels.
+    """
+    a, b = blur(image, sigma), blur(golden, sigma)
+    changed = np.abs(a - b) > threshold
+    lit = (a > threshold) | (b > threshold)
+    return changed.sum() / max(lit.sum(), 1), changed
+
+
+def matches(image, golden, tolerance=TOLERANCE):
+    return image.shape == golden.shape and difference(image, golden)[0] <= tolerance
+
+
+def golden_path(game, name, directory=GOLDEN_DIR):
+    return os.path.join(directory, game, f'{name}.png')
+
+
+def read_golden(game, name, directory=GOLDEN_DIR):
+    import cv2
+
+    image = cv2.imread(golden_path(game, name, directory), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise FileNotFoundError(f"There is no golden image '{golden_path(game, name, directory)}'.")
+    return image
+
+
+def write_golden(game, name, image, directory=GOLDEN_DIR):
+    import cv2
+
+    os.makedirs(os.path.join(directory, game), exist_ok=True)
+    cv2.imwrite(golden_path(game, name, directory), image)
+
+
+def diff_image(image, golden):
+    """
+    A BGR image of the golden (blue), the new image (green) and the changed pixels (red).
+    """
+    _, changed = difference(image, golden)
+    return np.stack([golden, image, np.where(changed, 255, 0).astype(np.uint8)], axis=-1)
+
+
+def main(argv=None):
+    import cv2
+
+    parser = argparse.ArgumentParser(description='Compare the drawings of the games to their golden images.')
+    parser.add_argument('games', nargs='*', default=[], help=f'default: {", ".join(SCENES)}')
+    parser.add_argument('--update', action='store_true', help='write the current images as the golden ones')
+    parser.add_argument('--diff', help='directory for the diff images of the images that changed')
+    args = parser.parse_args(argv)
+
+    changed = 0
+    for game in args.games or list(SCENES):
+        for name, image in images(game).items():
+            if args.update:
+                write_golden(game, name, image)
+                continue
+            try:
+                golden = read_golden(game, name)
+            except FileNotFoundError as e:
+                print(e)
+                changed += 1
+                continue
+            if not matches(image, golden):
+                changed += 1
+                print(f'{game}/{name}: {difference(image, golden)[0]:.1%} of the lit pixels changed')
+                if args.diff:
+                    os.makedirs(args.diff, exist_ok=True)
+                    cv2.imwrite(os.path.join(args.diff, f'{game}_{name}.png'), diff_image(image, golden))
+    if args.update:
+        print(f'golden images -> {GOLDEN_DIR}')
+    else:
+        print(f'{changed} images changed')
+    return 1 if changed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Batch conversion of images to waveforms.
+
+Converts every image of a directory to a drawing (see vector_image.py) in a
+pool of processes, without opening any window or connecting to the OPX:
+
+    python -m OPXBOX_LIB.image_converter gallery/
+    python -m OPXBOX_LIB.image_converter gallery/ --samples 8000 --workers 4
+
+The waveforms are stored in a cache keyed by a hash of the image file, the
+conversion parameters and the pipeline source, so a game loads a prepared
+picture instantly with
+
+    trace, marker = cached_drawing('gallery/cat.png', 16500)
+
+and only converts it when the image or the parameters changed. The cache lives
+in ~/.cache/opxbox/waveforms (or OPXBOX_CACHE_DIR/waveforms).
+"""
+import argparse
+import hashlib
+import inspect
+import os
+import sys
+import time
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.environ.get('OPXBOX_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'opxbox')),
+                         'waveforms')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+_PIPELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vector_image.py')
+
+
+def _hash_file(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _with_defaults(params):
+    from OPXBOX_LIB.vector_image import image_to_drawing
+
+    # the same drawing gets the same key, whether a default was passed or not
+    bound = inspect.signature(image_to_drawing).bind(None, None, **params)
+    bound.apply_defaults()
+    return {k: v for k, v in bound.arguments.items() if k not in ('img', 'budget')}
+
+
+def drawing_key(path, samples, **params):
+    """
+    The cache key of the drawing of the image at `path`.
+    """
+    params = _with_defaults(params)
+    h = hashlib.sha1()
+    for part in [_hash_file(path), repr(samples), repr(sorted(params.items())), _hash_file(_PIPELINE)]:
+        h.update(part.encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def save_drawing(path, trace, marker):
+    """
+    Write a drawing to `path` (npz), through a temporary file so other
+    processes never load half of it.
+    """
+    tmp = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(tmp, trace=trace, marker=np.asarray(marker, dtype=np.int64).reshape(-1, 2))
+    os.replace(tmp, path)
+
+
+def load_drawing(path):
+    """
+    The trace and the digital marker samples stored by `save_drawing`.
+    """
+    with np.load(path) as data:
+        return data['trace'], [(int(v), int(n)) for v, n in data['marker']]
+
+
+def convert(path, samples, cache_dir=CACHE_DIR, **params):
+    """
+    Convert one image, unless it is already in the cache. Returns the path of
+    the cached drawing and whether it was converted.
+    """
+    target = os.path.join(cache_dir, drawing_key(path, samples, **params) + '.npz')
+    if os.path.isfile(target):
+        return target, False
+    import cv2
+
+    from OPXBOX_LIB.vector_image import image_to_drawing
+
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise FileNotFoundError(f"Could not read '{path}'.")
+    trace, marker, _ = image_to_drawing(img, samples, **params)
+    os.makedirs(cache_dir, exist_ok=True)
+    save_drawing(target, trace, marker)
+    return target, True
+
+
+def cached_drawing(path, samples, cache_dir=CACHE_DIR, **params):
+    """
+    The trace and marker of the image at `path`, converted only on a cache miss.
+    """
+    target, _ = convert(path, samples, cache_dir, **params)
+    return load_drawing(target)
+
+
+def find_images(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def _convert_job(args):
+    path, samples, cache_dir, params = args
+    t0 = time.perf_counter()
+    try:
+        target, converted = convert(path, samples, cache_dir, **params)
+    except (FileNotFoundError, ValueError) as e:
+        return path, None, False, time.perf_counter() - t0, str(e)
+    return path, target, converted, time.perf_counter() - t0, None
+
+
+def convert_all(paths, samples, cache_dir=CACHE_DIR, workers=None, **params):
+    """
+    Convert the images in a process pool (or in this process with workers=1).
+    Returns (image, cached file, converted, seconds, error) per image.
+    """
+    jobs = [(path, samples, cache_dir, params) for path in paths]
+    if workers == 1:
+        return [_convert_job(job) for job in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_convert_job, jobs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a directory of images to waveforms.')
+    parser.add_argument('directory')
+    parser.add_argument('--samples', type=int, default=16500, help='samples per drawing')
+    parser.add_argument('--size', type=float, default=0.1, help='the drawing spans +-size (V)')
+    parser.add_argument('--canny', type=int, nargs=2, default=[100, 200], help='Canny thresholds')
+    parser.add_argument('--min-length', type=int, default=20, help='shortest contour kept (px)')
+    parser.add_argument('--epsilon', type=float, default=0.001, help='simplification, relative to a contour length')
+    parser.add_argument('--max-contours', type=int)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--workers', type=int, help='processes, default: one per cpu')
+    args = parser.parse_args(argv)
+
+    paths = find_images(args.directory)
+    if not paths:
+        print(f'no images in {args.directory}')
+        return 1
+    t0 = time.perf_counter()
+    results = convert_all(paths, args.samples, args.cache_dir, args.workers, size=args.size,
+                          canny=tuple(args.canny), min_length=args.min_length, epsilon=args.epsilon,
+                          max_contours=args.max_contours)
+    failed = 0
+    for path, target, converted, seconds, error in results:
+        if error:
+            failed += 1
+            print(f'{os.path.basename(path)}: failed, {error}')
+        else:
+            status = f'converted in {seconds:.2f} s' if converted else 'cached'
+            print(f'{os.path.basename(path)}: {status} -> {target}')
+    print(f'{len(results)} images in {time.perf_counter() - t0:.2f} s')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
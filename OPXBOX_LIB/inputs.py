@@ -0,0 +1,127 @@
+"""
+Conditioning of the button inputs on the FPGA.
+
+The games used to react to the raw input of every frame: holding a key
+re-triggers the action in each frame, and noise near a controller threshold
+produces single-frame presses. `InputConditioner` keeps a state per button
+and turns the raw input of any source into
+
+- `state[k]`: the debounced state (1 while held),
+- `pressed[k]` / `released[k]`: True only in the frame the state changed,
+- `hold[k]`: the number of frames the button has been held.
+
+A change of the raw input only counts after it was seen in `debounce`
+consecutive frames. The raw input comes from the keyboard codes sent over IO1
+and IO2, or from the flags of the analog controller:
+
+    inputs = InputConditioner(['flap'])
+    with program() as prog:
+        inputs.declare()
+        ...
+        assign(act, IO2)
+        inputs.from_codes(act, [5])         # or inputs.from_flags(act) for the controller
+        inputs.update()
+        with if_(inputs.pressed[0]):
+            ...
+"""
+import numpy as np
+
+
+class InputConditioner:
+    """
+    Debounced state, press and release edges and hold time of a few buttons.
+    """
+
+    def __init__(self, buttons, debounce=2):
+        if debounce < 1:
+            raise ValueError('The debounce has to be at least one frame.')
+        self.buttons = list(buttons)
+        self.debounce = debounce
+        self.state = None
+        self.pressed = None
+        self.released = None
+        self.hold = None
+
+    def emulate(self, raw):
+        """
+        Run the conditioning on the host for the raw input of every frame
+        (shape (frames, buttons)). Returns a dict with the state, pressed,
+        released and hold arrays of every frame.
+        """
+        raw = np.asarray(raw, dtype=int).reshape(len(raw), len(self.buttons))
+        out = {key: np.zeros(raw.shape, dtype=int) for key in ['state', 'pressed', 'released', 'hold']}
+        state = np.zeros(len(self.buttons), dtype=int)
+        counter = np.zeros(len(self.buttons), dtype=int)
+        hold = np.zeros(len(self.buttons), dtype=int)
+        for k, frame in enumerate(raw):
+            counter = np.where(frame == state, 0, counter + 1)
+            change = counter >= self.debounce
+            out['pressed'][k] = change & (frame == 1)
+            out['released'][k] = change & (frame == 0)
+            state = np.where(change, frame, state)
+            counter[change] = 0
+            hold = np.where(state == 1, hold + 1, 0)
+            out['state'][k] = state
+            out['hold'][k] = hold
+        return out
+
+    def declare(self):
+        """
+        Declare the state of the buttons, call inside the program.
+        """
+        from qm.qua import declare
+
+        n = len(self.buttons)
+        self._raw = declare(int, value=[0] * n)
+        self._counter = declare(int, value=[0] * n)
+        self._i = declare(int)
+        self.state = declare(int, value=[0] * n)
+        self.pressed = declare(bool, value=[False] * n)
+        self.released = declare(bool, value=[False] * n)
+        self.hold = declare(int, value=[0] * n)
+
+    def from_codes(self, value, codes, first=0):
+        """
+        Raw input from a keyboard IO value: button first + k is held when
+        `value` equals codes[k].
+        """
+        from qm.qua import Cast, assign
+
+        for k, code in enumerate(codes):
+            assign(self._raw[first + k], Cast.to_int(value == code))
+
+    def from_flags(self, flags, first=0, count=None):
+        """
+        Raw input from an array of 0/1 flags (e.g. the act array of the
+        controller decoder): button first + k is held when flags[k] is 1.
+        """
+        from qm.qua import assign
+
+        for k in range(count if count is not None else len(self.buttons) - first):
+            assign(self._raw[first + k], flags[k])
+
+    def update(self):
+        """
+        Update the state, edges and hold time with the raw input of this frame.
+        """
+        from qm.qua import assign, else_, for_, if_
+
+        i = self._i
+        with for_(i, 0, i < len(self.buttons), i + 1):
+            assign(self.pressed[i], False)
+            assign(self.released[i], False)
+            with if_(self._raw[i] == self.state[i]):
+                assign(self._counter[i], 0)
+            with else_():
+                assign(self._counter[i], self._counter[i] + 1)
+                with if_(self._counter[i] >= self.debounce):
+                    assign(self.state[i], self._raw[i])
+                    assign(self._counter[i], 0)
+                    with if_(self._raw[i] == 1):
+                        assign(self.pressed[i], True)
+                    with else_():
+                        assign(self.released[i], True)
+            with if_(self.state[i] == 1):
+                assign(self.hold[i], self.hold[i] + 1)
+            with else_():
+                assign(self.hold[i], 0)
@@ -0,0 +1,276 @@
+"""
+Switch between games without uploading a new configuration.
+
+The launcher loads the requested games, merges their configurations into one,
+opens the quantum machine once and compiles every game's program up front.
+Switching a game then only halts the running job and starts the next
+precompiled program:
+
+    python -m OPXBOX_LIB.launcher flappy mario picture
+
+Type the name of a game to switch to it, and `q` to quit. Games that run on
+a different controller (pong and asteroids use an opx1, the others the
+opx1000) can't be merged and have to be launched separately.
+
+Games often use the same names for different things, e.g. pong and asteroids
+both have a waveform `ray_x`. Such waveforms, pulses and operations get the
+name of their game in front (`pong_ray_x`), in the configuration and in the
+programs that play them.
+
+The games' own `qm` is replaced by the shared one, so their `send_over_io`
+keeps working while they are loaded through the launcher.
+"""
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+
+from OPXBOX_LIB.connection import config_hash, get_qm
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# game name -> (script relative to the repository root, name of its program)
+GAMES = {
+    'flappy': ('flappy_bird/flappy_new.py', 'game_keyboard'),
+    'flappy_controller': ('flappy_bird/flappy_new_w_controller.py', 'game_controller'),
+    'controller_debug': ('flappy_bird/flappy_new_w_controller.py', 'controller_debug'),
+    'mario': ('Mario/mario.py', 'mario_like'),
+    'picture': ('picture/picture.py', 'face_program'),
+    'animation': ('picture/animation.py', 'player'),
+    'pong': ('pong/pong.py', 'game'),
+    'asteroids': ('Examples/asteroids.py', 'game'),
+}
+
+# the games import their sprites with `from sprites import *` from their own folder
+_SPRITE_MODULES = ['sprites', 'sprites_new']
+
+
+def load_game_module(path):
+    """
+    Import a game script by its path (relative to the repository root).
+
+    Each script is only imported once. Its folder is put in front of sys.path
+    while importing, so it finds its own sprites module.
+    """
+    path = os.path.normpath(os.path.join(ROOT, path))
+    name = 'opxbox_game_' + os.path.splitext(os.path.relpath(path, ROOT))[0].replace(os.sep, '_')
+    if name in sys.modules:
+        return sys.modules[name]
+    folder = os.path.dirname(path)
+    for m in _SPRITE_MODULES:
+        sys.modules.pop(m, None)
+    sys.path.insert(0, folder)
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(name, None)
+        raise
+    finally:
+        sys.path.remove(folder)
+    return module
+
+
+def _same(a, b):
+    if isinstance(a, (list, tuple, np.ndarray, dict)) or isinstance(b, (list, tuple, np.ndarray, dict)):
+        return config_hash({'v': a}) == config_hash({'v': b})
+    return a == b
+
+
+def _copy_dicts(value):
+    # the dicts of a configuration are copied, the (long) sample lists are shared
+    return {k: _copy_dicts(v) for k, v in value.items()} if isinstance(value, dict) else value
+
+
+def _pulse_references(pulse, section):
+    # the keys of a pulse under which it refers to an entry of `section`
+    if section == 'digital_waveforms':
+        return pulse, ['digital_marker'] if 'digital_marker' in pulse else []
+    mapping = pulse.get(section, {})
+    return mapping, list(mapping)
+
+
+def _clashing(configurations, get):
+    # the names defined differently in several configurations
+    defined = {}
+    for configuration in configurations.values():
+        for name, value in get(configuration).items():
+            defined.setdefault(name, []).append(value)
+    return {name for name, values in defined.items() if any(not _same(values[0], v) for v in values[1:])}
+
+
+def resolve_clashes(configurations):
+    """
+    Rename the waveforms, pulses and operations that several configurations
+    ({game: configuration}) define differently, by putting the game's name in
+    front. Returns the renamed copies of the configurations and, per game, the
+    renamed operations as {(element, operation): new operation}.
+    """
+    configurations = {game: _copy_dicts(c) for game, c in configurations.items()}
+    # the referenced entries first, so their renames show up in the pulses that use them
+    for section in ['waveforms', 'digital_waveforms', 'integration_weights', 'pulses']:
+        for name in _clashing(configurations, lambda c: c.get(section, {})):
+            for game, configuration in configurations.items():
+                if name not in configuration.get(section, {}):
+                    continue
+                new = f'{game}_{name}'
+                configuration[section][new] = configuration[section].pop(name)
+                if section == 'pulses':
+                    users = [e.get('operations', {}) for e in configuration.get('elements', {}).values()]
+                    users = [(operations, list(operations)) for operations in users]
+                else:
+                    users = [_pulse_references(pulse, section) for pulse in configuration.get('pulses', {}).values()]
+                for mapping, keys in users:
+                    for key in keys:
+                        if mapping[key] == name:
+                            mapping[key] = new
+    renames = {game: {} for game in configurations}
+    elements = {e for c in configurations.values() for e in c.get('elements', {})}
+    for element in elements:
+        operations = lambda c: c.get('elements', {}).get(element, {}).get('operations', {})
+        for name in _clashing(configurations, operations):
+            for game, configuration in configurations.items():
+                if name in operations(configuration):
+                    new = f'{game}_{name}'
+                    operations(configuration)[new] = operations(configuration).pop(name)
+                    renames[game][(element, name)] = new
+    return configurations, renames
+
+
+def _rename_operations(message, renames):
+    for field, value in message.ListFields():
+        if field.message_type is None:
+            continue
+        for item in (value if field.is_repeated else [value]):
+            _rename_operations(item, renames)
+    fields = message.DESCRIPTOR.fields_by_name
+    if 'qe' in fields:
+        for name in ['namedPulse', 'pulse']:
+            if name in fields and message.HasField(name):
+                pulse = getattr(message, name)
+                pulse.name = renames.get((message.qe.name, pulse.name), pulse.name)
+
+
+def rename_operations(prog, renames):
+    """
+    A copy of a QUA program that plays and measures the renamed operations
+    ({(element, operation): new operation}).
+    """
+    if not renames:
+        return prog
+    from qm import Program
+
+    renamed = Program.from_protobuf(prog.qua_program.SerializeToString())
+    _rename_operations(renamed.qua_program, renames)
+    return renamed
+
+
+def merge_configurations(configurations, path=''):
+    """
+    Merge QUA configuration dicts into one.
+
+    Dicts are merged key by key (e.g. the operations of an element shared by
+    several games), everything else has to be equal in all configurations.
+    """
+    merged = {}
+    for configuration in configurations:
+        for key, value in configuration.items():
+            if key not in merged:
+                merged[key] = value
+            elif isinstance(merged[key], dict) and isinstance(value, dict):
+                merged[key] = merge_configurations([merged[key], value], f'{path}/{key}')
+            elif not _same(merged[key], value):
+                raise ValueError(f"Can't merge the configurations, they differ in {path}/{key}.")
+    return merged
+
+
+class Launcher:
+    """
+    Keeps one quantum machine open for several games and switches between
+    their precompiled programs.
+    """
+
+    def __init__(self, games, host=None, port=None, cluster_name=None):
+        self.modules = {}
+        self.programs = {}
+        for game in games:
+            path, program_name = GAMES[game]
+            self.modules[game] = load_game_module(path)
+            self.programs[game] = getattr(self.modules[game], program_name)
+        # one configuration per script, named after its first game
+        scripts = {}
+        for game, module in self.modules.items():
+            scripts.setdefault(id(module), game)
+        configurations, renames = resolve_clashes({game: self.modules[game].configuration
+                                                   for game in scripts.values()})
+        for game, module in self.modules.items():
+            self.programs[game] = rename_operations(self.programs[game], renames[scripts[id(module)]])
+        self.configuration = merge_configurations(list(configurations.values()))
+        self.qm = get_qm(self.configuration, host=host, port=port, cluster_name=cluster_name)
+        for module in self.modules.values():
+            module.qm = self.qm
+        self.program_ids = {}
+        self.job = None
+        self.current = None
+
+    def compile_all(self):
+        """
+        Compile all programs. Returns the compile time of each game in seconds.
+        """
+        times = {}
+        for game, prog in self.programs.items():
+            t0 = time.perf_counter()
+            self.program_ids[game] = self.qm.compile(prog)
+            times[game] = time.perf_counter() - t0
+        return times
+
+    def switch(self, game):
+        """
+        Halt the running game and start `game`. Returns the switch latency in seconds.
+        """
+        if game not in self.program_ids:
+            self.program_ids[game] = self.qm.compile(self.programs[game])
+        t0 = time.perf_counter()
+        if self.job is not None:
+            self.job.halt()
+        self.job = self.qm.queue.add_compiled(self.program_ids[game]).wait_for_execution()
+        self.current = game
+        return time.perf_counter() - t0
+
+    def stop(self):
+        if self.job is not None:
+            self.job.halt()
+            self.job = None
+            self.current = None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('games', nargs='+', choices=sorted(GAMES))
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    args = parser.parse_args(argv)
+
+    launcher = Launcher(args.games, host=args.host, port=args.port)
+    for game, t in launcher.compile_all().items():
+        print(f'compiled {game} in {t:.2f} s')
+    print(f'switched to {args.games[0]} in {launcher.switch(args.games[0]) * 1e3:.1f} ms')
+    for line in sys.stdin:
+        game = line.strip()
+        if game == 'q':
+            break
+        if game not in launcher.programs:
+            print(f'unknown game {game!r}, choose one of {", ".join(launcher.programs)}')
+            continue
+        print(f'switched to {game} in {launcher.switch(game) * 1e3:.1f} ms')
+    launcher.stop()
+
+
+if __name__ == '__main__':
+    main()
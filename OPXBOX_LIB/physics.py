@@ -0,0 +1,383 @@
+"""
+Host-side reference models of the game physics.
+
+Each model does what one iteration of a game's QUA loop does to the game
+state, for `n` games at once: the state is a dict of numpy arrays with the
+games along the first axis, and `step` takes the inputs of every game.
+
+    flappy = FlappyPhysics(10000)
+    for frame in range(1000):
+        flappy.step(flap=rng.random(10000) < 0.05)
+    print(flappy.state['crashed'].mean())
+
+The models follow the QUA statements one by one, including their quirks, so
+they can serve as an oracle for the programs. With `fixed=True` every assigned
+value is truncated to the 28 fractional bits of a QUA fixed and wrapped into
+[-8, 8) like on the FPGA, and `wraps` counts the values that overflowed.
+
+The parameters default to the constants of the games and can be taken from a
+loaded game script (see launcher.load_game_module) with `from_game`:
+
+    FlappyPhysics.from_game(module, n=1000, fixed=True)
+
+    python -m OPXBOX_LIB.physics flappy --games 1000 --frames 1000
+"""
+import argparse
+import time
+
+import numpy as np
+
+FIXED_BITS = 28  # fractional bits of a QUA fixed (4.28)
+
+FLAPPY_PARAMS = {
+    'FIELD_SIZE': 0.3,
+    'N_PILLARS': 7,
+    'R_PILLAR': 0.3 * 0.075,
+    'TIME_STEP_SIZE': 0.01,
+    'GRAVITY': 0.3,
+    'FLAP_FORCE': -0.2,
+    'PILLAR_SPEED': 0.3,
+}
+
+PONG_PARAMS = {
+    'field_size': 0.3,
+    'R_asteroid': 0.3 * 0.125,
+    'player_acceleration': 0.5 * 2,
+    'max_speed': 1,
+    'time_step_size': 0.01,
+}
+
+ASTEROIDS_PARAMS = {
+    'field_size': 0.3,
+    'N_rays': 10,
+    'v_ray': 1.5,
+    'max_ray_age': 2,
+    'ray_spawn_delay': 0.1,
+    'N_asteroids': 4,
+    'R_asteroid': 0.3 * 0.075,
+    'v_asteroid': 0.2,
+    'ship_acceleration': 0.5 * 2,
+    'max_speed': 1,
+    'ship_rotation_speed': 2.0,
+    'time_step_size': 0.01,
+    'space_key': 5,
+}
+
+
+def to_fixed(x):
+    """
+    `x` as a QUA fixed: truncated to 2^-28 and wrapped into [-8, 8).
+    """
+    raw = np.floor(np.asarray(x, dtype=float) * 2 ** FIXED_BITS)
+    return ((raw + 2 ** 31) % 2 ** 32 - 2 ** 31) / 2 ** FIXED_BITS
+
+
+class _Physics:
+    PARAMS = {}
+
+    def __init__(self, n=1, fixed=False, params=None, seed=0):
+        self.n = n
+        self.fixed = fixed
+        self.params = {**self.PARAMS, **(params or {})}
+        self.rng = np.random.default_rng(seed)
+        self.wraps = 0
+        self.state = {}
+        self.reset()
+
+    @classmethod
+    def from_game(cls, module, **kwargs):
+        """
+        The model with the parameters of a loaded game script.
+        """
+        params = {k: getattr(module, k) for k in cls.PARAMS if hasattr(module, k)}
+        return cls(params={**params, **kwargs.pop('params', {})}, **kwargs)
+
+    def q(self, x):
+        """
+        An assigned value, as the FPGA stores it in fixed mode.
+        """
+        x = np.asarray(x, dtype=float)
+        if not self.fixed:
+            return x
+        self.wraps += int(np.count_nonzero((x >= 8) | (x < -8)))
+        return to_fixed(x)
+
+    def mul(self, *factors):
+        """
+        A product, evaluated left to right like a QUA expression.
+        """
+        result = self.q(factors[0])
+        for factor in factors[1:]:
+            result = self.q(np.multiply(result, self.q(factor)))
+        return result
+
+    def full(self, value, *shape):
+        return self.q(np.full((self.n,) + shape, value, dtype=float))
+
+    def cos2pi(self, a):
+        return self.q(np.cos(2 * np.pi * a))
+
+    def sin2pi(self, a):
+        return self.q(np.sin(2 * np.pi * a))
+
+    def distance(self, ax, ay, bx, by):
+        dx, dy = self.q(ax - bx), self.q(ay - by)
+        return self.q(np.sqrt(self.q(self.mul(dx, dx) + self.mul(dy, dy))))
+
+    def cycle_clip(self, x, upper, lower, where=True):
+        return np.where(where & (x > upper), lower, np.where(where & (x < lower), upper, x))
+
+    def clip(self, x, upper, lower):
+        return np.where(x > upper, upper, np.where(x < lower, lower, x))
+
+    def _tick(self):
+        s = self.state
+        s['dt'] = self.q(s['t'] - s['t_prev'])
+        s['t_prev'] = s['t']
+        return s['dt']
+
+    def _tock(self, time_step):
+        self.state['t'] = self.q(self.state['t'] + time_step)
+
+    def run(self, inputs, keys=None):
+        """
+        Step through `inputs` (a dict of arrays with the frames along the
+        first axis). Returns the history of the state (or of `keys`).
+        """
+        frames = len(next(iter(inputs.values())))
+        history = {}
+        for k in range(frames):
+            self.step(**{name: value[k] for name, value in inputs.items()})
+            for key in keys or self.state:
+                history.setdefault(key, []).append(np.copy(self.state[key]))
+        return {key: np.array(values) for key, values in history.items()}
+
+
+class FlappyPhysics(_Physics):
+    """
+    flappy_new.py: the bird falls with GRAVITY, a flap sets its speed to
+    -FLAP_FORCE, the pillars scroll left and respawn on the right.
+    """
+    PARAMS = FLAPPY_PARAMS
+
+    def reset(self):
+        p = self.params
+        field = p['FIELD_SIZE']
+        self.state = {
+            't': self.full(0), 't_prev': self.full(0), 'dt': self.full(0),
+            'bird_x': self.full(0), 'bird_y': self.full(0), 'bird_vy': self.full(0),
+            'pillars_x': self.q(np.tile(np.linspace(-field, field, p['N_PILLARS']), (self.n, 1))),
+            'pillars_y': self.full(-field, p['N_PILLARS']),
+            'pillars_active': np.ones((self.n, p['N_PILLARS']), dtype=bool),
+            'crashed': np.zeros(self.n, dtype=bool),
+        }
+
+    def step(self, flap):
+        """
+        One frame. `flap` is True for the games in which a flap was pressed.
+        """
+        p, s = self.params, self.state
+        field, r = p['FIELD_SIZE'], p['R_PILLAR']
+        dt = self._tick()
+        s['bird_vy'] = self.q(s['bird_vy'] - self.mul(p['GRAVITY'], dt))
+        s['bird_y'] = self.q(s['bird_y'] + self.mul(s['bird_vy'], dt))
+        s['bird_vy'] = np.where(flap, self.q(-p['FLAP_FORCE']), s['bird_vy'])
+
+        inside = np.abs(s['pillars_x']) < field
+        moved = self.q(s['pillars_x'] - self.mul(p['PILLAR_SPEED'], dt)[:, None])
+        respawn_y = self.q(-field + self.mul(to_fixed(self.rng.random(s['pillars_y'].shape)), 0.1))
+        s['pillars_x'] = np.where(inside, moved, self.q(field - 0.0001))
+        s['pillars_y'] = np.where(inside, s['pillars_y'], respawn_y)
+
+        y, x = s['bird_y'][:, None], s['bird_x'][:, None]
+        outside_gap = (y < self.q(s['pillars_y'] + 5 * r)) | (y > self.q(-s['pillars_y'] - 5 * r))
+        hit = s['pillars_active'] & outside_gap & (self.q(x - s['pillars_x']) < 3 * r)
+        s['crashed'] = s['crashed'] | hit.any(axis=1)
+        self._tock(p['TIME_STEP_SIZE'])
+
+
+class PongPhysics(_Physics):
+    """
+    pong.py: the paddles accelerate while their button is held, the ball
+    bounces off the paddles and the top and bottom and ends the game when it
+    leaves on a side.
+    """
+    PARAMS = PONG_PARAMS
+
+    def reset(self):
+        field = self.params['field_size']
+        self.state = {
+            't': self.full(0), 't_prev': self.full(0), 'dt': self.full(0),
+            'ball_x': self.full(0), 'ball_y': self.full(0), 'ball_vx': self.full(0.2), 'ball_vy': self.full(0.2),
+            'p1_x': self.full(-field * 0.5), 'p1_y': self.full(0), 'p1_vy': self.full(0),
+            'p2_x': self.full(field * 0.5), 'p2_y': self.full(0), 'p2_vy': self.full(0),
+            'draw_ball': np.ones(self.n, dtype=bool),
+        }
+
+    def step(self, p1, p2):
+        """
+        One frame. `p1` and `p2` are the values of IO1 and IO2 (1/2: player 1
+        up/down, 3/4: player 2 up/down).
+        """
+        p, s = self.params, self.state
+        edge, max_speed = p['field_size'] * 0.7, p['max_speed']
+        dt = self._tick()
+        p1_dir = np.where(p1 == 1, 1.0, 0.0) + np.where(p1 == 2, -1.0, 0.0)
+        p2_dir = np.where(p2 == 3, 1.0, 0.0) + np.where(p2 == 4, -1.0, 0.0)
+        for k, direction in [('p1', p1_dir), ('p2', p2_dir)]:
+            s[f'{k}_y'] = self.q(s[f'{k}_y'] + self.mul(s[f'{k}_vy'], dt))
+            s[f'{k}_vy'] = self.q(s[f'{k}_vy'] + self.mul(direction, p['player_acceleration'], dt))
+            s[f'{k}_vy'] = self.clip(s[f'{k}_vy'], max_speed, -max_speed)
+
+        s['ball_x'] = self.q(s['ball_x'] + self.mul(s['ball_vx'], dt))
+        s['ball_y'] = self.q(s['ball_y'] + self.mul(s['ball_vy'], dt))
+        for k in ['p1', 'p2']:
+            hit = self.distance(s['ball_x'], s['ball_y'], s[f'{k}_x'], s[f'{k}_y']) < p['R_asteroid']
+            # like in the game, both paddles compare with the speed of player 1
+            slow = self.q(s['ball_vy'] + s['p1_vy']) < 0.25
+            bounced = np.where(slow, self.q(-self.q(s['ball_vy'] + s[f'{k}_vy'])), -0.25)
+            s['ball_vy'] = np.where(hit, bounced, s['ball_vy'])
+            s['ball_vx'] = np.where(hit, self.q(-s['ball_vx']), s['ball_vx'])
+        s['draw_ball'] = s['draw_ball'] & ~((s['ball_x'] > edge) | (s['ball_x'] < -edge))
+        s['ball_vy'] = np.where((s['ball_y'] > edge) | (s['ball_y'] < -edge), self.q(-s['ball_vy']), s['ball_vy'])
+        for k in ['p1', 'p2']:
+            s[f'{k}_y'] = self.clip(s[f'{k}_y'], self.q(edge), self.q(-edge))
+        self._tock(p['time_step_size'])
+
+
+class AsteroidsPhysics(_Physics):
+    """
+    asteroids.py: the ship turns and thrusts, fires rays that age and die,
+    and the rays destroy the asteroids they hit. Everything wraps around the
+    field.
+    """
+    PARAMS = ASTEROIDS_PARAMS
+
+    def reset(self):
+        p = self.params
+        field, n_rays, n_asteroids = p['field_size'], p['N_rays'], p['N_asteroids']
+        self.state = {
+            't': self.full(0), 't_prev': self.full(0), 'dt': self.full(0), 't_last_ray_spawn': self.full(-1.1),
+            'ship_x': self.full(0), 'ship_y': self.full(0), 'ship_a': self.full(0),
+            'ship_vx': self.full(0), 'ship_vy': self.full(0),
+            'rays_active': np.zeros((self.n, n_rays), dtype=bool),
+            'rays_age': self.q(np.tile([p['max_ray_age']] + [0] * (n_rays - 1), (self.n, 1))),
+            'rays_x': self.full(0, n_rays), 'rays_y': self.full(0, n_rays), 'rays_a': self.full(0, n_rays),
+            'asteroids_active': np.ones((self.n, n_asteroids), dtype=bool),
+            'asteroids_x': self.q(self.rng.uniform(-field, field, (self.n, n_asteroids))),
+            'asteroids_y': self.q(self.rng.uniform(-field, field, (self.n, n_asteroids))),
+            'asteroids_a': self.q(self.rng.uniform(-.5, .5, (self.n, n_asteroids))),
+            'cont': np.ones(self.n, dtype=bool),
+        }
+
+    def _wrap(self, x, y, where=True):
+        field = self.params['field_size']
+        return self.cycle_clip(x, field, -field, where), self.cycle_clip(y, field, -field, where)
+
+    def step(self, move, act):
+        """
+        One frame. `move` is IO1 (1: forward, 2: backward, 3/4: turn) and
+        `act` is IO2 (space_key: fire, 10: end).
+        """
+        p, s = self.params, self.state
+        games = np.arange(self.n)
+        dt = self._tick()
+        forward = np.where(move == 1, 1.0, np.where(move == 2, -1.0, 0.0))
+        turn = np.where(move == 3, -1.0, np.where(move == 4, 1.0, 0.0))
+        fire = act == p['space_key']
+        s['cont'] = s['cont'] & (act != 10)
+
+        s['ship_a'] = self.q(s['ship_a'] + self.mul(turn, p['ship_rotation_speed'], dt))
+        s['ship_a'] = self.cycle_clip(s['ship_a'], 0.5, -0.5)
+
+        spawn = fire & (p['ray_spawn_delay'] < self.q(s['t'] - s['t_last_ray_spawn']))
+        i = np.argmin(s['rays_age'], axis=1)
+        for key, value in [('rays_active', True), ('rays_age', self.q(p['max_ray_age'])), ('rays_x', s['ship_x']),
+                           ('rays_y', s['ship_y']), ('rays_a', s['ship_a'])]:
+            s[key][games, i] = np.where(spawn, value, s[key][games, i])
+        s['t_last_ray_spawn'] = np.where(spawn, s['t'], s['t_last_ray_spawn'])
+
+        s['ship_x'] = self.q(s['ship_x'] + self.mul(s['ship_vx'], dt))
+        s['ship_y'] = self.q(s['ship_y'] + self.mul(s['ship_vy'], dt))
+        thrust = [self.mul(trig(s['ship_a']), forward, p['ship_acceleration'], dt) for trig in [self.cos2pi, self.sin2pi]]
+        s['ship_vx'] = self.q(s['ship_vx'] + thrust[0])
+        s['ship_vy'] = self.q(s['ship_vy'] + thrust[1])
+        s['ship_vy'] = self.clip(s['ship_vy'], p['max_speed'], -p['max_speed'])
+        s['ship_vx'] = self.clip(s['ship_vx'], p['max_speed'], -p['max_speed'])
+
+        # in the order of the nested for_ loops, a ray is gone after its first hit
+        for i in range(p['N_rays']):
+            for j in range(p['N_asteroids']):
+                distance = self.distance(s['rays_x'][:, i], s['rays_y'][:, i], s['asteroids_x'][:, j],
+                                         s['asteroids_y'][:, j])
+                hit = s['rays_active'][:, i] & s['asteroids_active'][:, j] & (distance < p['R_asteroid'])
+                s['rays_active'][:, i] &= ~hit
+                s['rays_age'][:, i] = np.where(hit, -1.0, s['rays_age'][:, i])
+                s['asteroids_active'][:, j] &= ~hit
+
+        alive = s['rays_active'] & (s['rays_age'] > 0)
+        s['rays_active'] = s['rays_active'] & alive
+        s['rays_age'] = np.where(alive, self.q(s['rays_age'] - dt[:, None]), s['rays_age'])
+        for key, trig in [('rays_x', self.cos2pi), ('rays_y', self.sin2pi)]:
+            step = self.mul(trig(s['rays_a']), p['v_ray'], dt[:, None])
+            s[key] = np.where(alive, self.q(s[key] + step), s[key])
+        for key, trig in [('asteroids_x', self.cos2pi), ('asteroids_y', self.sin2pi)]:
+            step = self.mul(trig(s['asteroids_a']), p['v_asteroid'], dt[:, None])
+            s[key] = np.where(s['asteroids_active'], self.q(s[key] + step), s[key])
+
+        s['ship_x'], s['ship_y'] = self._wrap(s['ship_x'], s['ship_y'])
+        s['rays_x'], s['rays_y'] = self._wrap(s['rays_x'], s['rays_y'], s['rays_active'])
+        s['asteroids_x'], s['asteroids_y'] = self._wrap(s['asteroids_x'], s['asteroids_y'], s['asteroids_active'])
+        self._tock(p['time_step_size'])
+
+
+MODELS = {'flappy': FlappyPhysics, 'pong': PongPhysics, 'asteroids': AsteroidsPhysics}
+
+
+def random_inputs(game, games, frames, rate=0.05, seed=0):
+    """
+    Random button presses for `games` games: each frame a button is held with
+    probability `rate`.
+    """
+    rng = np.random.default_rng(seed)
+    pressed = rng.random((frames, games)) < rate
+    if game == 'flappy':
+        return {'flap': pressed}
+    buttons = rng.integers(1, 5, (frames, games))
+    if game == 'pong':
+        other = rng.random((frames, games)) < rate
+        return {'p1': np.where(pressed, 1 + buttons % 2, 0), 'p2': np.where(other, 3 + buttons // 3, 0)}
+    return {'move': np.where(pressed, buttons, 0), 'act': np.where(rng.random((frames, games)) < rate, 5, 0)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate many games with random inputs on the host.')
+    parser.add_argument('game', choices=sorted(MODELS))
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--frames', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=0.05, help='probability of a button per frame')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    inputs = random_inputs(args.game, args.games, args.frames, args.rate, args.seed)
+    results = {}
+    for fixed in [False, True]:
+        model = MODELS[args.game](args.games, fixed=fixed, seed=args.seed)
+        t0 = time.perf_counter()
+        for k in range(args.frames):
+            model.step(**{name: value[k] for name, value in inputs.items()})
+        seconds = time.perf_counter() - t0
+        results[fixed] = model
+        print(f"{'fixed' if fixed else 'float'}: {args.games * args.frames / seconds:.3g} game frames/s, "
+              f"{model.wraps} overflows")
+    for key, value in results[False].state.items():
+        if value.dtype == bool:
+            differ = np.mean(value != results[True].state[key])
+            print(f'{key:>18}: {value.mean():.3f} true, differs in fixed point in {differ:.2%} of the games')
+        else:
+            error = np.abs(value - results[True].state[key]).max()
+            print(f'{key:>18}: largest difference float - fixed {error:.3g}')
+
+
+if __name__ == '__main__':
+    main()
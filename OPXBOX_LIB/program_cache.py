@@ -0,0 +1,169 @@
+"""
+Cache of generated QUA programs.
+
+Building a game's program runs all of its python code again (and unrolls the
+python loops each time). The cache stores the serialized program on disk,
+keyed by a hash of
+
+- the source file that builds the program and the OPXBOX_LIB modules it
+  uses (directly or through other OPXBOX_LIB modules, e.g. controller.py),
+- the configuration,
+- the extra parameters passed to `get`,
+- the contents of extra files the program depends on (e.g. a controller profile),
+- the qm-qua version,
+
+so an unchanged game loads its program instead of building it:
+
+    def build_game():
+        with program() as game:
+            ...
+        return game
+
+    game = cached_program(build_game, configuration)
+
+Random values drawn while building (e.g. start positions) are stored with the
+program, so seed them if they should change from run to run.
+
+The cache lives in ~/.cache/opxbox/programs (or OPXBOX_CACHE_DIR/programs) and
+can be disabled with OPXBOX_PROGRAM_CACHE=0.
+"""
+import hashlib
+import os
+import sys
+import time
+import types
+
+from OPXBOX_LIB.connection import config_hash
+
+CACHE_DIR = os.path.join(os.environ.get('OPXBOX_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'opxbox')),
+                         'programs')
+
+
+_HASHES = {}
+
+
+def _file_hash(path):
+    # a file is hashed again when it changed, also in a long running process
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    if _HASHES.get(path, (None,))[0] != version:
+        with open(path, 'rb') as f:
+            _HASHES[path] = version, hashlib.sha1(f.read()).hexdigest()
+    return _HASHES[path][1]
+
+
+def library_files(builder):
+    """
+    The source files of the OPXBOX_LIB modules a builder uses: the modules of
+    the names in its globals, and the modules those use in turn.
+    """
+    files = set()
+    seen = set()
+    todo = [builder.__globals__]
+    while todo:
+        for value in list(todo.pop().values()):
+            if isinstance(value, types.ModuleType):
+                module = value
+            else:
+                name = getattr(value, '__module__', None)
+                module = sys.modules.get(name) if isinstance(name, str) else None
+            name = getattr(module, '__name__', '')
+            if name.split('.')[0] != 'OPXBOX_LIB' or name in seen:
+                continue
+            seen.add(name)
+            if getattr(module, '__file__', None):
+                files.add(module.__file__)
+            todo.append(vars(module))
+    return sorted(files)
+
+
+class ProgramCache:
+    """
+    Stores serialized programs in `directory` and counts hits and misses.
+    """
+
+    def __init__(self, directory=CACHE_DIR, enabled=None):
+        self.directory = directory
+        if enabled is None:
+            enabled = os.environ.get('OPXBOX_PROGRAM_CACHE', '1') != '0'
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.build_time = 0.0
+        self.load_time = 0.0
+
+    def key(self, builder, configuration, params=None, files=()):
+        from qm.version import __version__ as qm_version
+
+        h = hashlib.sha1()
+        for part in [_file_hash(builder.__code__.co_filename), builder.__qualname__,
+                     config_hash(configuration), repr(sorted((params or {}).items())), qm_version,
+                     *[_file_hash(f) for f in [*library_files(builder), *files]]]:
+            h.update(part.encode())
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.qua')
+
+    def get(self, builder, configuration, params=None, files=()):
+        """
+        Load the program of `builder` from the cache, or build and store it.
+
+        `params` are passed to the builder as keyword arguments and are part of
+        the key, as well as the contents of `files`.
+        """
+        params = params or {}
+        if not self.enabled:
+            return builder(**params)
+        from qm import Program
+
+        path = self.path(self.key(builder, configuration, params, files))
+        if os.path.isfile(path):
+            t0 = time.perf_counter()
+            with open(path, 'rb') as f:
+                prog = Program.from_protobuf(f.read())
+            self.load_time += time.perf_counter() - t0
+            self.hits += 1
+            return prog
+
+        t0 = time.perf_counter()
+        prog = builder(**params)
+        self.build_time += time.perf_counter() - t0
+        self.misses += 1
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file first, so other processes never load half a program
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(prog.qua_program.SerializeToString())
+        os.replace(tmp, path)
+        return prog
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'build_time': self.build_time,
+            'load_time': self.load_time,
+        }
+
+    def clear(self):
+        """
+        Remove all cached programs.
+        """
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.qua'):
+                    os.remove(os.path.join(self.directory, name))
+
+
+PROGRAM_CACHE = ProgramCache()
+
+
+def cached_program(builder, configuration, files=(), **params):
+    """
+    `PROGRAM_CACHE.get(builder, configuration, params, files)`
+    """
+    return PROGRAM_CACHE.get(builder, configuration, params, files)
@@ -0,0 +1,248 @@
+"""
+How big the QUA program of a game is, and where its size comes from.
+
+Python code inside `with program()` runs once while the program is built, so
+a python loop (`for i in range(N_PILLARS)`, `for e in [x, y]`) or a helper
+function that is called in several places puts a copy of its QUA statements
+into the program each time. The program only shows how big that got. This
+counts the statements of a program by the source line that made them (their
+`loc`) and by the function around that line, so the copies show up:
+
+    size = program_size(game)
+    print(size.report())
+
+The instructions are an estimate (one per statement and per operation of
+its expressions, a few per Math/Random function), useful to compare
+programs and to see how they grow. --scale rebuilds the program with other
+values of a module constant, e.g. the number of pillars:
+
+    python -m OPXBOX_LIB.program_size flappy
+    python -m OPXBOX_LIB.program_size flappy --scale N_PILLARS=7,14,28
+"""
+import argparse
+import ast
+
+from OPXBOX_LIB.range_analysis import oneof, parse_loc, where
+
+# rough instructions per node of a program
+INSTRUCTIONS = {
+    'statement': 1,
+    'operation': 1,   # a binary operation
+    'array': 1,       # the address of an array cell
+    'function': 4,    # a Math/Random function
+}
+
+
+def _is_block(message):
+    return 'statements' in message.DESCRIPTOR.fields_by_name
+
+
+def statements(block):
+    """
+    All statements of a block, with the statements nested in them.
+    """
+    for statement in block.statements:
+        yield statement
+        kind, s = oneof(statement, 'statement_oneof')
+        yield from _nested(s)
+
+
+def _nested(message):
+    for field, value in message.ListFields():
+        if field.message_type is None:
+            continue
+        for item in (value if field.is_repeated else [value]):
+            if _is_block(item):
+                yield from statements(item)
+            else:
+                yield from _nested(item)
+
+
+def instructions(message):
+    """
+    The estimated instructions of a statement, without its nested statements.
+    """
+    count = 0
+    for field, value in message.ListFields():
+        if field.message_type is None:
+            continue
+        for item in (value if field.is_repeated else [value]):
+            if _is_block(item):
+                continue
+            if field.name == 'binaryOperation':
+                count += INSTRUCTIONS['operation']
+            elif field.name == 'arrayCell':
+                count += INSTRUCTIONS['array']
+            elif field.name == 'libFunction':
+                count += INSTRUCTIONS['function']
+            count += instructions(item)
+    return count
+
+
+def _first_loc(message):
+    # the loc of a statement, or of the first thing in it (while_ has none)
+    for field, value in message.ListFields():
+        if field.name == 'loc' and value:
+            return value
+    for field, value in message.ListFields():
+        if field.message_type is not None:
+            for item in (value if field.is_repeated else [value]):
+                loc = _first_loc(item)
+                if loc:
+                    return loc
+    return ''
+
+
+class _Functions:
+    """
+    The innermost function around a line of a source file.
+    """
+
+    def __init__(self):
+        self._files = {}
+
+    def _ranges(self, path):
+        if path not in self._files:
+            ranges = []
+            try:
+                with open(path) as f:
+                    tree = ast.parse(f.read())
+            except (OSError, SyntaxError):
+                tree = None
+            for node in ast.walk(tree) if tree is not None else []:
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    ranges.append((node.lineno, node.end_lineno, node.name))
+            self._files[path] = ranges
+        return self._files[path]
+
+    def __call__(self, path, line):
+        around = [r for r in self._ranges(path) if r[0] <= line <= r[1]]
+        return min(around, key=lambda r: r[1] - r[0]) if around else None
+
+
+class ProgramSize:
+    """
+    The statements and estimated instructions of a program by source line and
+    by function. After `run`, `lines` maps (file, line) and `functions` maps
+    (file, first line, name) to [statements, instructions].
+    """
+
+    def __init__(self, program):
+        self.program = program
+        self.script = program.qua_program.script
+        self.lines = {}
+        self.functions = {}
+        self.code = {}
+        self.function_of = {}
+        self.statements = 0
+        self.instructions = 0
+
+    def run(self):
+        functions = _Functions()
+        for statement in statements(self.script.body):
+            kind, s = oneof(statement, 'statement_oneof')
+            file, line, code = parse_loc(_first_loc(s))
+            cost = INSTRUCTIONS['statement'] + instructions(s)
+            self.statements += 1
+            self.instructions += cost
+            key = (file, line)
+            self.code.setdefault(key, code)
+            self.function_of[key] = self._function(functions, file, line)
+            for counts, k in [(self.lines, key), (self.functions, self.function_of[key])]:
+                counts.setdefault(k, [0, 0])
+                counts[k][0] += 1
+                counts[k][1] += cost
+        return self
+
+    @staticmethod
+    def _function(functions, file, line):
+        if file is None:
+            return None, None, '?'
+        found = functions(file, line)
+        return (file, found[0], found[2]) if found else (file, None, '<module>')
+
+    @property
+    def variable_words(self):
+        """
+        The words of data memory of the declared variables (a word per value).
+        """
+        return sum(max(1, variable.size) for variable in self.script.variables)
+
+    @property
+    def protobuf_bytes(self):
+        return self.program.qua_program.ByteSize()
+
+    def repeats(self, function):
+        """
+        How often the most repeated line of a function is in the program, i.e.
+        how often it was unrolled or called.
+        """
+        return max(self.lines[key][0] for key, f in self.function_of.items() if f == function)
+
+    def report(self, top=15):
+        lines = [f'{self.statements} statements, ~{self.instructions} instructions, '
+                 f'{self.variable_words} variable words, {self.protobuf_bytes / 1e3:.1f} kB of protobuf',
+                 'by function:']
+        for function, (n, cost) in sorted(self.functions.items(), key=lambda f: -f[1][1])[:top]:
+            file, first, name = function
+            lines.append(f'  {name:<28}{where(file, first or ""):<24}{n:>6} statements{cost:>7} instructions'
+                         f'   most repeated line x{self.repeats(function)}')
+        lines.append('by line:')
+        for (file, line), (n, cost) in sorted(self.lines.items(), key=lambda l: -l[1][1])[:top]:
+            lines.append(f'  {where(file, line):<28}x{n:<6}{cost:>8} instructions    {self.code[(file, line)][:60]}')
+        return '\n'.join(lines)
+
+
+def program_size(program):
+    """
+    The size of a QUA program by source line and function.
+    """
+    return ProgramSize(program).run()
+
+
+def scaled_sizes(module, program_name, constant, values):
+    """
+    The statements and instructions of a game's program built with other
+    values of one of its module constants, as [(value, ProgramSize)].
+    """
+    build = getattr(module, 'build_' + program_name)
+    original = getattr(module, constant)
+    result = []
+    try:
+        for value in values:
+            setattr(module, constant, value)
+            result.append((value, program_size(build())))
+    finally:
+        setattr(module, constant, original)
+    return result
+
+
+def main(argv=None):
+    from OPXBOX_LIB.launcher import GAMES, load_game_module
+
+    parser = argparse.ArgumentParser(description='Count the statements of a game program by source line.')
+    parser.add_argument('game', choices=sorted(GAMES))
+    parser.add_argument('--top', type=int, default=15, help='the number of functions and lines to list')
+    parser.add_argument('--scale', metavar='CONSTANT=V1,V2,...',
+                        help='rebuild the program with these values of a module constant')
+    args = parser.parse_args(argv)
+
+    path, program_name = GAMES[args.game]
+    module = load_game_module(path)
+    print(program_size(getattr(module, program_name)).report(args.top))
+    if args.scale:
+        constant, _, values = args.scale.partition('=')
+        if not hasattr(module, constant):
+            raise ValueError(f"The game has no constant '{constant}'.")
+        sizes = scaled_sizes(module, program_name, constant, [int(v) for v in values.split(',')])
+        print(f'{constant:>12}{"statements":>12}{"instructions":>14}{"per step":>10}')
+        for k, (value, size) in enumerate(sizes):
+            step = ''
+            if k:
+                previous_value, previous = sizes[k - 1]
+                step = f'{(size.instructions - previous.instructions) / (value - previous_value):.0f}'
+            print(f'{value:>12}{size.statements:>12}{size.instructions:>14}{step:>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,581 @@
+"""
+Static range analysis of the variables of a QUA program.
+
+A QUA fixed holds values in [-8, 8) and an int 32 bits, and both wrap around
+silently when a value leaves that range (e.g. the bursts of rays in asteroids,
+see "Overflows" in the README). The games defend against this with clip and
+cycle_clip checks on their variables every frame.
+
+`analyze` walks the statements of a program with interval arithmetic: every
+variable has a range of values it can hold, assignments compute the range of
+their expression, if_ branches narrow the ranges by their condition, and
+loops are repeated until the ranges stop growing (a range that keeps growing
+is widened to the next constant of the program, then to the full range of its
+type). It reports
+
+- overflows: assignments and operations whose result can leave the range of
+  its type, and
+- redundant checks: if_/elif_ conditions that can never be true (the branch,
+  e.g. the clip it does, can be dropped) or are always true.
+
+The ranges are a superset of what the program really does, so an overflow
+found here may not happen in a game, but a redundant check is provably
+redundant. Ranges a game ensures some other way, e.g. that a game is never
+played for more than 8 s, can be assumed:
+
+    analysis = analyze(game, assume={'t': (0, 7.9)})
+    print(analysis.report())
+
+    python -m OPXBOX_LIB.range_analysis asteroids --assume t=0:7.9 t_prim=0:7.9
+"""
+import argparse
+import math
+import os
+import re
+
+LIMITS = {
+    'INT': (-2.0 ** 31, 2.0 ** 31 - 1),
+    'REAL': (-8.0, 8.0 - 2.0 ** -28),
+    'BOOL': (0.0, 1.0),
+}
+TYPES = ['INT', 'BOOL', 'REAL']  # the order of the protobuf enum
+OPERATORS = {'ADD': '+', 'SUB': '-', 'MULT': '*', 'DIV': '/', 'AND': '&', 'OR': '|', 'XOR': '^', 'LT': '<',
+             'LET': '<=', 'GT': '>', 'GET': '>=', 'EQ': '==', 'SHL': '<<', 'SHR': '>>'}
+_OP_NAMES = ['ADD', 'SUB', 'MULT', 'DIV', 'AND', 'OR', 'XOR', 'LT', 'LET', 'GT', 'GET', 'EQ', 'SHL', 'SHR']
+_LOC = re.compile(r'File "(?P<file>[^"]*)", line (?P<line>\d+):?(?P<code>.*)')
+
+
+def parse_loc(loc):
+    """
+    The file, line and source code of a protobuf `loc` string.
+    """
+    match = _LOC.match(loc or '')
+    if not match:
+        return None, None, ''
+    return match['file'], int(match['line']), match['code'].strip()
+
+
+def where(file, line):
+    """
+    'file.py:line' of a parsed `loc`, for the reports.
+    """
+    return f'{os.path.basename(file)}:{line}' if file else f'?:{line}'
+
+
+def oneof(message, name):
+    """
+    The name and the value of the field set in the oneof `name` of a protobuf
+    message, (None, None) if none is set.
+    """
+    kind = message.WhichOneof(name)
+    return kind, getattr(message, kind) if kind else None
+
+
+def _products(a, b):
+    values = [x * y for x in a for y in b]
+    # 0 * inf is 0 for ranges
+    return [0.0 if math.isnan(v) else v for v in values]
+
+
+def _join(a, b):
+    if a is None:
+        return None if b is None else dict(b)
+    if b is None:
+        return dict(a)
+    return {k: (min(a[k][0], b[k][0]), max(a[k][1], b[k][1])) for k in a}
+
+
+class RangeAnalysis:
+    """
+    The interval analysis of a program, see the module docstring. After
+    `run`, `ranges` holds the range of every variable, `overflows` and
+    `branches` the findings.
+    """
+
+    def __init__(self, program, assume=None, widen_after=3):
+        self.script = program.qua_program.script
+        self.widen_after = widen_after
+        self.types = {}
+        self.initial = {}
+        for variable in self.script.variables:
+            self.types[variable.name] = TYPES[variable.type]
+            values = [self._literal(v.value, TYPES[v.type]) for v in variable.value]
+            # variables without an initial value can hold anything of their type
+            self.initial[variable.name] = (min(values), max(values)) if values else LIMITS[TYPES[variable.type]]
+        self.names = self._python_names()
+        by_name = {python: name for name, python in self.names.items()}
+        self.assume = {by_name.get(k, k): tuple(map(float, v)) for k, v in (assume or {}).items()}
+        for name, (low, high) in self.assume.items():
+            if name in self.initial:
+                self.initial[name] = (min(max(self.initial[name][0], low), high),
+                                      max(min(self.initial[name][1], high), low))
+        # the bounds a growing range is widened to before it takes the limits of its type
+        values = {self._literal(v, TYPES[t]) for v, t in _literals(self.script.body)}
+        values |= {b for bounds in list(self.assume.values()) + list(self.initial.values()) for b in bounds}
+        self.thresholds = sorted(values | {-v for v in values})
+        self.ranges = {}
+        self.overflows = {}
+        self.branches = {}
+
+    # names
+
+    def _python_names(self):
+        names = {}
+        for variable in self.script.variables:
+            for value in variable.value[:1]:
+                match = re.match(r'(\w+)\s*=\s*declare', parse_loc(value.loc)[2])
+                if match:
+                    names[variable.name] = match[1]
+        for statement, _ in self._statements(self.script.body):
+            if statement.WhichOneof('statement_oneof') == 'assign':
+                target = statement.assign.target
+                if target.WhichOneof('target') == 'variable' and target.variable.name not in names:
+                    match = re.match(r'assign\(\s*(\w+)\s*,', parse_loc(statement.assign.loc)[2])
+                    if match:
+                        names[target.variable.name] = match[1]
+        return names
+
+    def _statements(self, block, path=()):
+        for k, statement in enumerate(block.statements):
+            yield statement, path + (k,)
+            kind, body = oneof(statement, 'statement_oneof')
+            if kind == 'if':
+                yield from self._statements(body.body, path + (k, 0))
+                for j, elif_ in enumerate(body.elseifs):
+                    yield from self._statements(elif_.body, path + (k, j + 1))
+                yield from self._statements(getattr(body, 'else'), path + (k, -1))
+            elif kind == 'for':
+                for j, part in enumerate([body.init, body.body, body.update]):
+                    yield from self._statements(part, path + (k, j))
+            elif kind in ('forEach', 'strictTiming'):
+                yield from self._statements(body.body, path + (k, 0))
+
+    def name(self, name):
+        return self.names.get(name, name)
+
+    def text(self, expression):
+        """
+        The source of an expression, with the names of the game's variables.
+        """
+        kind, e = oneof(expression, 'expression_oneof')
+        if kind == 'variable':
+            return f'IO{e.ioNumber}' if e.WhichOneof('var_oneof') == 'ioNumber' else self.name(e.name)
+        if kind == 'literal':
+            return e.value
+        if kind == 'binaryOperation':
+            return self._binary_text(e)
+        if kind == 'arrayCell':
+            return f'{self.name(e.arrayVar.name)}[{self.text(e.index)}]'
+        if kind == 'libFunction':
+            return self._call_text(e)
+        return kind
+
+    def _binary_text(self, e):
+        return f'({self.text(e.left)} {OPERATORS[_OP_NAMES[e.op]]} {self.text(e.right)})'
+
+    def _call_text(self, e):
+        arguments = [self.text(a.scalar) if a.WhichOneof('argument_oneof') == 'scalar' else self.name(a.array.name)
+                     for a in e.arguments]
+        return f"{e.libraryName}.{e.functionName}({', '.join(arguments)})"
+
+    # expressions
+
+    @staticmethod
+    def _literal(value, kind):
+        if kind == 'BOOL' or value in ('True', 'False'):
+            return float(value == 'True')
+        return float(value)
+
+    def _overflow(self, loc, what, low, high, kind):
+        limit_low, limit_high = LIMITS[kind]
+        if low >= limit_low and high <= limit_high:
+            return low, high
+        key = (loc, what)
+        old = self.overflows.get(key, (low, high))
+        self.overflows[key] = (min(old[0], low), max(old[1], high))
+        return LIMITS[kind]
+
+    def evaluate(self, expression, env):
+        """
+        The range and type of an expression.
+        """
+        kind, e = oneof(expression, 'expression_oneof')
+        if kind == 'variable':
+            if e.WhichOneof('var_oneof') == 'ioNumber':
+                return self.assume.get(f'IO{e.ioNumber}', LIMITS['INT']), 'INT'
+            return env[e.name], self.types[e.name]
+        if kind == 'literal':
+            value_type = TYPES[e.type]
+            value = self._literal(e.value, value_type)
+            return (value, value), value_type
+        if kind == 'arrayCell':
+            return env[e.arrayVar.name], self.types[e.arrayVar.name]
+        if kind == 'binaryOperation':
+            return self._binary(e, env)
+        if kind == 'libFunction':
+            return self._function(e, env)
+        if kind == 'arrayLength':
+            return (0, LIMITS['INT'][1]), 'INT'
+        # functions the analysis doesn't know can return anything
+        return LIMITS['REAL'], 'REAL'
+
+    def _binary(self, e, env):
+        op = _OP_NAMES[e.op]
+        (a, a_type), (b, b_type) = self.evaluate(e.left, env), self.evaluate(e.right, env)
+        kind = 'REAL' if 'REAL' in (a_type, b_type) else 'INT'
+        if op in ('LT', 'LET', 'GT', 'GET', 'EQ'):
+            return self._compare(op, a, b), 'BOOL'
+        if a_type == 'BOOL' and b_type == 'BOOL':
+            if op == 'AND':
+                return (a[0] * b[0], a[1] * b[1]), 'BOOL'
+            if op == 'OR':
+                return (max(a[0], b[0]), max(a[1], b[1])), 'BOOL'
+            return (0.0, 1.0), 'BOOL'
+        if op in ('ADD', 'SUB'):
+            result = (a[0] + b[0], a[1] + b[1]) if op == 'ADD' else (a[0] - b[1], a[1] - b[0])
+        elif op == 'MULT':
+            products = _products(a, b)
+            result = (min(products), max(products))
+        elif op == 'DIV':
+            if b[0] <= 0 <= b[1]:
+                return LIMITS[kind], kind
+            quotients = [x / y for x in a for y in b]
+            result = (min(quotients), max(quotients))
+        elif op in ('SHL', 'SHR'):
+            factors = [2.0 ** (s if op == 'SHL' else -s) for s in (max(b[0], 0), max(b[1], 0))]
+            products = _products(a, factors)
+            result = (min(products), max(products))
+            if kind == 'INT' and op == 'SHR':
+                result = (math.floor(result[0]), math.floor(result[1]))
+        elif a[0] >= 0 and b[0] >= 0:
+            # bitwise operations of non-negative ints
+            top = min(a[1], b[1]) if op == 'AND' else 2 ** math.ceil(math.log2(max(a[1], b[1]) + 1)) - 1
+            result = (0.0, float(top))
+        else:
+            result = LIMITS[kind]
+        return self._overflow(e.loc, self._binary_text(e), *result, kind), kind
+
+    @staticmethod
+    def _compare(op, a, b):
+        if op == 'GT' or op == 'GET':
+            op, a, b = {'GT': 'LT', 'GET': 'LET'}[op], b, a
+        if op == 'LT':
+            return float(a[1] < b[0]), float(not a[0] >= b[1])
+        if op == 'LET':
+            return float(a[1] <= b[0]), float(not a[0] > b[1])
+        # EQ
+        certain = a[0] == a[1] == b[0] == b[1]
+        disjoint = a[1] < b[0] or b[1] < a[0]
+        return float(certain), float(not disjoint)
+
+    def _function(self, e, env):
+        name = e.functionName
+        arguments = []
+        for argument in e.arguments:
+            if argument.WhichOneof('argument_oneof') == 'scalar':
+                arguments.append(self.evaluate(argument.scalar, env))
+            else:
+                arguments.append((env[argument.array.name], self.types[argument.array.name]))
+        sizes = {v.name: v.size for v in self.script.variables}
+        if name in ('cos2pi', 'sin2pi', 'cos', 'sin'):
+            return (-1.0, 1.0), 'REAL'
+        if name == 'abs':
+            (low, high), kind = arguments[0]
+            return (0.0 if low <= 0 <= high else min(abs(low), abs(high)), max(abs(low), abs(high))), kind
+        if name == 'sqrt':
+            (low, high), _ = arguments[0]
+            return (math.sqrt(max(low, 0)), math.sqrt(max(high, 0))), 'REAL'
+        if name in ('argmin', 'argmax'):
+            return (0.0, float(sizes[e.arguments[0].array.name] - 1)), 'INT'
+        if name in ('min', 'max'):
+            return arguments[0]
+        if name == 'rand_fixed':
+            return (0.0, 1.0 - 2.0 ** -28), 'REAL'
+        if name == 'rand_int':
+            (low, high), _ = arguments[0] if arguments else ((1.0, LIMITS['INT'][1]), 'INT')
+            return (0.0, max(high - 1, 0)), 'INT'
+        if name == 'to_int':
+            (low, high), _ = arguments[0]
+            return (float(math.floor(low)), float(math.floor(high))), 'INT'
+        if name == 'to_bool':
+            return (0.0, 1.0), 'BOOL'
+        if name == 'to_fixed':
+            (low, high), _ = arguments[0]
+            return self._overflow(e.loc, self._call_text(e), low, high, 'REAL'), 'REAL'
+        if name in ('mul_fixed_by_int', 'mul_int_by_fixed'):
+            products = _products(arguments[0][0], arguments[1][0])
+            kind = 'REAL' if name == 'mul_fixed_by_int' else 'INT'
+            return self._overflow(e.loc, self._call_text(e), min(products), max(products), kind), kind
+        kind = 'INT' if name in ('to_int', 'rand_int') else 'REAL'
+        return LIMITS[kind], kind
+
+    # conditions
+
+    def _narrow(self, env, name, low=-math.inf, high=math.inf):
+        old_low, old_high = env[name]
+        low, high = max(old_low, low), min(old_high, high)
+        if low > high:
+            return None
+        env = dict(env)
+        env[name] = (low, high)
+        return env
+
+    def refine(self, condition, env, truth):
+        """
+        The ranges in which the condition is `truth`, None if it never is.
+        """
+        if env is None:
+            return None
+        kind, e = oneof(condition, 'expression_oneof')
+        if kind == 'variable' and e.WhichOneof('var_oneof') == 'name' and self.types[e.name] == 'BOOL':
+            return self._narrow(env, e.name, float(truth), float(truth))
+        if kind != 'binaryOperation':
+            return env
+        op = _OP_NAMES[e.op]
+        if op == 'AND' and truth or op == 'OR' and not truth:
+            return self.refine(e.right, self.refine(e.left, env, truth), truth)
+        if op not in ('LT', 'LET', 'GT', 'GET', 'EQ') or op == 'EQ' and not truth:
+            return env
+        for side, other, flip in [(e.left, e.right, False), (e.right, e.left, True)]:
+            side_kind, var = oneof(side, 'expression_oneof')
+            if side_kind != 'variable' or var.WhichOneof('var_oneof') != 'name':
+                continue
+            (low, high), _ = self.evaluate(other, env)
+            relation = {'LT': 'LT', 'LET': 'LT', 'GT': 'GT', 'GET': 'GT', 'EQ': 'EQ'}[op]
+            strict = op in ('LT', 'GT')
+            if flip:
+                relation = {'LT': 'GT', 'GT': 'LT', 'EQ': 'EQ'}[relation]
+            if not truth:
+                relation = {'LT': 'GT', 'GT': 'LT'}[relation]
+                strict = not strict
+            # the smallest step of the variable's type makes < of <=
+            step = (1.0 if self.types[var.name] == 'INT' else 2.0 ** -28) if strict else 0.0
+            if relation == 'LT':
+                env = self._narrow(env, var.name, high=high - step)
+            elif relation == 'GT':
+                env = self._narrow(env, var.name, low=low + step)
+            else:
+                env = self._narrow(env, var.name, low, high)
+            if env is None:
+                return None
+        return env
+
+    def _truth(self, condition, env):
+        # whether the condition can be true and whether it can be false
+        low, high = self.evaluate(condition, env)[0]
+        if (low, high) in [(0, 0), (1, 1), (0, 1)]:
+            return high == 1, low == 0
+        # not a boolean range (e.g. widened), so nothing is known
+        return True, True
+
+    def _branch(self, path, condition, env, loc):
+        record = self.branches.setdefault(path, {'loc': condition_loc(condition) or loc, 'condition': self.text(condition),
+                                                 'can_be_true': False, 'can_be_false': False, 'reached': False})
+        if env is None:
+            return False, False
+        can_true, can_false = self._truth(condition, env)
+        record['reached'] = True
+        record['can_be_true'] |= can_true
+        record['can_be_false'] |= can_false
+        return can_true, can_false
+
+    # statements
+
+    def _assign(self, statement, env):
+        value, value_type = self.evaluate(statement.expression, env)
+        target_kind, target = oneof(statement.target, 'target')
+        name = target.name if target_kind == 'variable' else target.arrayVar.name
+        kind = self.types[name]
+        if kind == 'INT' and value_type == 'REAL':
+            value = (math.floor(value[0]), math.floor(value[1]))
+        value = self._overflow(statement.loc, self.name(name), *value, kind)
+        if name in self.assume:
+            low, high = self.assume[name]
+            value = (min(max(value[0], low), high), max(min(value[1], high), low))
+        env = dict(env)
+        # a cell of an array only adds to the range of the array
+        env[name] = value if target_kind == 'variable' else (min(env[name][0], value[0]), max(env[name][1], value[1]))
+        self.ranges[name] = value if name not in self.ranges else \
+            (min(self.ranges[name][0], value[0]), max(self.ranges[name][1], value[1]))
+        return env
+
+    def _widen(self, name, old, new):
+        # a bound that keeps growing jumps to the next constant of the program (or
+        # an assumed bound), then to the limit of its type
+        limit_low, limit_high = self.assume.get(name, LIMITS[self.types[name]])
+        low, high = new
+        if low < old[0]:
+            low = max([t for t in self.thresholds if t <= low] + [limit_low])
+        if high > old[1]:
+            high = min([t for t in self.thresholds if t >= high] + [limit_high])
+        return low, high
+
+    def _loop(self, env, path, condition, body, update=None):
+        head = env
+        for iteration in range(1000):
+            can_true, _ = self._truth(condition, head)
+            after = self.block(body, self.refine(condition, head, True) if can_true else None, path + (1,))
+            if update is not None:
+                after = self.block(update, after, path + (2,))
+            new_head = _join(head, after)
+            if new_head == head:
+                break
+            if iteration >= self.widen_after:
+                new_head = {k: self._widen(k, head[k], new_head[k]) for k in head}
+            head = new_head
+        _, can_false = self._truth(condition, head)
+        return self.refine(condition, head, False) if can_false else None
+
+    def block(self, block, env, path=()):
+        for k, statement in enumerate(block.statements):
+            if env is None:
+                return None
+            env = self.statement(statement, env, path + (k,))
+        return env
+
+    def statement(self, statement, env, path):
+        kind, s = oneof(statement, 'statement_oneof')
+        if kind == 'assign':
+            return self._assign(s, env)
+        if kind == 'if':
+            result = None
+            rest = env
+            branches = [(s.condition, s.body, s.loc)] + [(e.condition, e.body, e.loc) for e in s.elseifs]
+            for j, (condition, body, loc) in enumerate(branches):
+                can_true, can_false = self._branch(path + (j,), condition, rest, loc)
+                result = _join(result, self.block(body, self.refine(condition, rest, True) if can_true else None,
+                                                  path + (j,)))
+                rest = self.refine(condition, rest, False) if can_false else None
+            return _join(result, self.block(getattr(s, 'else'), rest, path + (-1,)))
+        if kind == 'for':
+            return self._loop(self.block(s.init, env, path + (0,)), path, s.condition, s.body, s.update)
+        if kind == 'forEach':
+            env = dict(env)
+            for iterator in s.iterator:
+                env[iterator.variable.name] = env[iterator.array.name]
+            head = env
+            while True:
+                new_head = _join(head, self.block(s.body, head, path + (0,)))
+                if new_head == head:
+                    return head
+                head = new_head
+        if kind == 'strictTiming':
+            return self.block(s.body, env, path + (0,))
+        if kind == 'measure':
+            # the demodulated results can be anything
+            env = dict(env)
+            for name in _names(s):
+                if name in env:
+                    env[name] = LIMITS[self.types[name]]
+            return env
+        return env
+
+    def run(self):
+        self.block(self.script.body, dict(self.initial))
+        for name, (low, high) in self.initial.items():
+            old_low, old_high = self.ranges.get(name, (low, high))
+            self.ranges[name] = (min(low, old_low), max(high, old_high))
+        return self
+
+    # results
+
+    def overflow_list(self):
+        """
+        The possible overflows as (file, line, code, what, low, high), by line.
+        """
+        return sorted(((*parse_loc(loc), what, low, high) for (loc, what), (low, high) in self.overflows.items()),
+                      key=_by_line)
+
+    def redundant_checks(self):
+        """
+        The if_/elif_ conditions that are never true or always true, as
+        (file, line, code, condition, 'never true'/'always true'), by line.
+        """
+        result = []
+        for record in self.branches.values():
+            if not record['reached']:
+                continue
+            if not record['can_be_true'] or not record['can_be_false']:
+                verdict = 'never true' if not record['can_be_true'] else 'always true'
+                result.append((*parse_loc(record['loc']), record['condition'], verdict))
+        return sorted(result, key=_by_line)
+
+    def report(self):
+        lines = ['overflows:']
+        by_line = {}
+        for file, line, code, what, low, high in self.overflow_list():
+            by_line.setdefault((file, line, code), []).append((what, low, high))
+        for (file, line, code), found in by_line.items():
+            # the outermost expression of the line, the longest one
+            what, low, high = max(found, key=lambda f: len(f[0]))
+            inner = f' (and {len(found) - 1} of its terms)' if len(found) > 1 else ''
+            lines.append(f'  {where(file, line)}: {what} can reach [{low:.4g}, {high:.4g}]{inner}    # {code}')
+        checks = self.redundant_checks()
+        lines.append(f'redundant checks ({len(checks)} of {sum(r["reached"] for r in self.branches.values())}):')
+        for file, line, code, condition, verdict in checks:
+            lines.append(f'  {where(file, line)}: {condition} is {verdict}    # {code}')
+        return '\n'.join(lines)
+
+
+def _by_line(item):
+    return item[0] or '', item[1] or 0, item[3]
+
+
+def condition_loc(condition):
+    _, e = oneof(condition, 'expression_oneof')
+    return getattr(e, 'loc', '')
+
+
+def _names(message):
+    """
+    All variable names referenced anywhere in a protobuf message.
+    """
+    for field, value in message.ListFields():
+        if field.name == 'name' and isinstance(value, str):
+            yield value
+        elif field.message_type is not None:
+            for item in (value if field.is_repeated else [value]):
+                yield from _names(item)
+
+
+def _literals(message):
+    """
+    The (value, type) of all literals anywhere in a protobuf message.
+    """
+    for field, value in message.ListFields():
+        if field.name == 'literal':
+            yield value.value, value.type
+        elif field.message_type is not None:
+            for item in (value if field.is_repeated else [value]):
+                yield from _literals(item)
+
+
+def analyze(program, assume=None):
+    """
+    The range analysis of a QUA program. `assume` maps variables (by their
+    name in the game or in the program, or 'IO1'/'IO2') to a (low, high)
+    range that they are known to stay in.
+    """
+    return RangeAnalysis(program, assume).run()
+
+
+def main(argv=None):
+    from OPXBOX_LIB.launcher import GAMES, load_game_module
+
+    parser = argparse.ArgumentParser(description='Find the variables of a game that can overflow.')
+    parser.add_argument('game', choices=sorted(GAMES))
+    parser.add_argument('--assume', nargs='*', default=[], metavar='NAME=LOW:HIGH',
+                        help='ranges the variables are known to stay in, e.g. t=0:7.9 IO1=0:10')
+    args = parser.parse_args(argv)
+
+    assume = {}
+    for item in args.assume:
+        name, _, bounds = item.partition('=')
+        low, _, high = bounds.partition(':')
+        assume[name] = (float(low), float(high))
+    path, program_name = GAMES[args.game]
+    print(analyze(getattr(load_game_module(path), program_name), assume).report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+Recording the inputs of a game and playing them back.
+
+A game gets its input as the values the keyboard forwarder writes to IO1
+and IO2, so every session is different. `InputRecorder` wraps the quantum
+machine of a game, passes the IO writes on and keeps them with their time
+since the start; they are saved to a small binary file (9 bytes per write).
+A recording is played back in two ways:
+
+- `replay` writes the values to the IOs of a (fake) quantum machine at their
+  recorded times, through the same calls as the forwarder, and
+- `InputTable` puts them into the QUA program: the writes are rounded to the
+  frame they happened in (a tap shorter than a frame still lasts one) and the
+  program applies them itself, so every run of the game gets the same input in
+  the same frame, on the fake QM and on the OPX:
+
+    table = InputTable.from_file('session.rec', frame_time=0.02)
+    with program() as game:
+        table.declare()
+        with while_(cont):
+            table.read(move, act)    # instead of assign(move, IO1), assign(act, IO2)
+            ...
+
+Record and replay a game from the command line (escape ends a recording):
+
+    python -m OPXBOX_LIB.recording record asteroids session.rec
+    python -m OPXBOX_LIB.recording replay asteroids session.rec
+    python -m OPXBOX_LIB.recording show session.rec --frame-time 0.02
+"""
+import argparse
+import time
+
+import numpy as np
+
+MAGIC = b'OPXIO\x01'
+EVENT = np.dtype([('time_us', '<u4'), ('io', 'u1'), ('value', '<i4')])  # 9 bytes, packed
+END_FRAME = 2 ** 31 - 1  # the frame of the sentinel at the end of an input table
+
+# the keys of the forwarders in the games: key -> (io, value while pressed)
+KEYS = {
+    'esc': (2, 10), 'space': (2, 5), 'ctrl_l': (2, 6),
+    'w': (1, 1), 's': (1, 2), 'a': (1, 3), 'd': (1, 4),
+}
+MARIO_KEYS = {'esc': (2, 10), 'a': (1, 1), 'd': (1, 2), 'w': (2, 5)}
+
+
+def write_recording(path, events):
+    events = np.asarray(events, dtype=EVENT)
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(events.tobytes())
+
+
+def read_recording(path):
+    """
+    The IO writes of a recording, as a structured array (time_us, io, value).
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' is not an input recording.")
+        return np.frombuffer(f.read(), dtype=EVENT).copy()
+
+
+class InputRecorder:
+    """
+    Passes the IO writes on to `qm` and records them. Everything else is
+    looked up on `qm`, so it stands in for the quantum machine of a game:
+
+        module.qm = InputRecorder(module.qm)
+    """
+
+    def __init__(self, qm, clock=time.perf_counter):
+        self._qm = qm
+        self._clock = clock
+        self._start = None
+        self._events = []
+
+    def _record(self, io, value):
+        now = self._clock()
+        if self._start is None:
+            self._start = now
+        self._events.append((int(round((now - self._start) * 1e6)), io, int(value)))
+
+    def set_io1_value(self, value):
+        self._record(1, value)
+        return self._qm.set_io1_value(value)
+
+    def set_io2_value(self, value):
+        self._record(2, value)
+        return self._qm.set_io2_value(value)
+
+    def set_io_values(self, io1_value=None, io2_value=None):
+        if io1_value is not None:
+            self._record(1, io1_value)
+        if io2_value is not None:
+            self._record(2, io2_value)
+        return self._qm.set_io_values(io1_value, io2_value)
+
+    def start(self):
+        """
+        Start the clock of the recording now, e.g. when the game is executed.
+        """
+        self._start = self._clock()
+
+    @property
+    def events(self):
+        return np.array(self._events, dtype=EVENT)
+
+    def save(self, path):
+        write_recording(path, self.events)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._qm, name)
+
+
+def replay(events, qm, speed=1.0, clock=time.perf_counter, sleep=time.sleep):
+    """
+    Write the recorded values to the IOs of `qm` at their times (divided by
+    `speed`). Returns the largest delay (s) of a write.
+    """
+    start = clock()
+    late = 0.0
+    for t, io, value in zip(events['time_us'], events['io'], events['value']):
+        due = start + t / 1e6 / speed
+        wait = due - clock()
+        if wait > 0:
+            sleep(wait)
+        late = max(late, clock() - due)
+        getattr(qm, f'set_io{io}_value')(int(value))
+    return late
+
+
+def frame_table(events, frame_time):
+    """
+    The writes rounded down to the frame they happened in, as the arrays
+    (frames, io, values), ending with a sentinel write in END_FRAME. A press
+    (a value other than 0) is kept for at least a frame: the next write to its
+    IO moves to the next frame if it happened in the same one.
+    """
+    frames = (events['time_us'] / 1e6 // frame_time).astype(np.int64)
+    previous = {}
+    for k, (io, value) in enumerate(zip(events['io'], events['value'])):
+        if io in previous:
+            frame, pressed = previous[io]
+            frames[k] = max(frames[k], frame + pressed)
+        previous[io] = frames[k], int(value != 0)
+    order = np.argsort(frames, kind='stable')
+    return (np.append(frames[order], END_FRAME), np.append(events['io'][order].astype(int), 0),
+            np.append(events['value'][order].astype(int), 0))
+
+
+class InputTable:
+    """
+    The writes of a recording as a table in the QUA program: `read` applies
+    the writes of the current frame and returns the IO values like IO1/IO2.
+    """
+
+    def __init__(self, events, frame_time):
+        self.frame_time = frame_time
+        self.frames, self.ios, self.values = frame_table(events, frame_time)
+        self.io1 = None
+        self.io2 = None
+
+    @classmethod
+    def from_file(cls, path, frame_time):
+        return cls(read_recording(path), frame_time)
+
+    def emulate(self, frames):
+        """
+        The IO1 and IO2 values that `read` returns in each of `frames` frames, on the host.
+        """
+        io = np.zeros((frames, 3), dtype=int)
+        k = 0
+        for frame in range(frames):
+            while self.frames[k] <= frame:
+                io[frame, self.ios[k]] = self.values[k]
+                k += 1
+            if frame + 1 < frames:
+                io[frame + 1] = io[frame]
+        return io[:, 1], io[:, 2]
+
+    def declare(self):
+        """
+        Declare the table, call inside the program.
+        """
+        from qm.qua import declare
+
+        self._frames = declare(int, value=self.frames.tolist())
+        self._ios = declare(int, value=self.ios.tolist())
+        self._values = declare(int, value=self.values.tolist())
+        self._k = declare(int, value=0)
+        self._frame = declare(int, value=0)
+        self.io1 = declare(int, value=0)
+        self.io2 = declare(int, value=0)
+
+    def read(self, io1_target=None, io2_target=None):
+        """
+        Apply the writes of this frame, assign the IO values to the targets
+        and go to the next frame. Call once per frame.
+        """
+        from qm.qua import assign, elif_, if_, while_
+
+        k = self._k
+        with while_(self._frames[k] <= self._frame):
+            with if_(self._ios[k] == 1):
+                assign(self.io1, self._values[k])
+            with elif_(self._ios[k] == 2):
+                assign(self.io2, self._values[k])
+            assign(k, k + 1)
+        assign(self._frame, self._frame + 1)
+        if io1_target is not None:
+            assign(io1_target, self.io1)
+        if io2_target is not None:
+            assign(io2_target, self.io2)
+
+
+def forward_keyboard(qm, keys=KEYS, stop='esc'):
+    """
+    The keyboard forwarder of the games: writes the value of a key to its IO
+    while it is pressed, and 0 when it is released. Returns after `stop`.
+    """
+    # only needed to record, not to replay
+    from pynput import keyboard
+
+    with keyboard.Events() as events:
+        for event in events:
+            key = getattr(event.key, 'char', None) or getattr(event.key, 'name', None)
+            if key not in keys:
+                continue
+            io, value = keys[key]
+            getattr(qm, f'set_io{io}_value')(value if isinstance(event, keyboard.Events.Press) else 0)
+            if key == stop:
+                break
+
+
+def main(argv=None):
+    from OPXBOX_LIB.launcher import GAMES, load_game_module
+
+    parser = argparse.ArgumentParser(description='Record the inputs of a game, or play them back.')
+    parser.add_argument('command', choices=['record', 'replay', 'show'])
+    parser.add_argument('game_or_file', help='the game (record/replay) or the recording (show)')
+    parser.add_argument('recording', nargs='?')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay faster (>1) or slower')
+    parser.add_argument('--frame-time', type=float, default=0.02, help='s per frame of the game (show)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        events = read_recording(args.game_or_file)
+        frames, ios, values = frame_table(events, args.frame_time)
+        duration = events['time_us'][-1] / 1e6 if len(events) else 0
+        print(f'{len(events)} writes in {duration:.2f} s ({len(events) * EVENT.itemsize} bytes)')
+        for frame, io, value in zip(frames[:-1], ios, values):
+            print(f'  frame {frame:>6}  IO{io} = {value}')
+        return
+
+    if args.recording is None:
+        parser.error('record and replay need the file of the recording')
+    path, program_name = GAMES[args.game_or_file]
+    module = load_game_module(path)
+    qm = module.qm
+    job = qm.execute(getattr(module, program_name))
+    try:
+        if args.command == 'record':
+            recorder = InputRecorder(qm)
+            recorder.start()
+            print('Recording, press escape to end the game.')
+            forward_keyboard(recorder, MARIO_KEYS if args.game_or_file == 'mario' else KEYS)
+            recorder.save(args.recording)
+            print(f'{len(recorder.events)} writes -> {args.recording}')
+        else:
+            late = replay(read_recording(args.recording), qm, args.speed)
+            print(f'replayed {args.recording}, the latest write was {late * 1e3:.1f} ms late')
+    finally:
+        job.halt()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Reading buttons by scanning digital outputs.
+
+An alternative to the resistor ladder controller, proposed in
+Examples/README.md: every button connects its own digital output to one
+analog input. The scanner raises the digital outputs one at a time and
+measures the input for a short window, a pressed button shows up as a high
+level. The results are packed into a bitmask, bit k is set when button k is
+pressed.
+
+    scanner = ButtonScanner(['A', 'B', 'Up', 'Down'],
+                            digital_ports=[('con1', 5, 1), ('con1', 5, 2), ('con1', 5, 3), ('con1', 5, 4)],
+                            output_port=('con1', 5, 8), input_port=('con1', 5, 1))
+    configuration = merge_configurations([configuration, scanner.configuration()])
+    with program() as prog:
+        scanner.declare()
+        ...
+        scanner.scan()           # scanner.mask holds the pressed buttons
+        scanner.unpack(act)      # or act[k] = 1 for every pressed button k
+
+The analog output port only carries a 0 V waveform, the measurement elements
+need one. Run the benchmark (scans per second and error rate against the
+window length, on a simulated input signal) with
+
+    python -m OPXBOX_LIB.scanner
+"""
+import argparse
+
+import numpy as np
+
+# the demodulated level of a 1 V input, per ns of the integration window
+DEMOD_SCALE = 2 ** -12
+
+
+class ButtonScanner:
+    """
+    Measures one button after the other and packs them into a bitmask.
+
+    `threshold` is the input voltage above which a button counts as pressed.
+    The first `settle` ns of every window are not integrated, so the digital
+    output can rise first. `overhead` (ns) estimates the time between two
+    measurements (time of flight and the align), it is only used for the timing.
+    """
+
+    def __init__(self, buttons, digital_ports, output_port, input_port, window=1000, settle=100,
+                 threshold=0.01, time_of_flight=200, overhead=250):
+        if len(buttons) != len(digital_ports):
+            raise ValueError('There has to be one digital port per button.')
+        if window % 4 or settle % 4 or window <= 0:
+            raise ValueError('The window and the settle time have to be positive multiples of 4 ns.')
+        self.buttons = list(buttons)
+        self.digital_ports = list(digital_ports)
+        self.output_port = output_port
+        self.input_port = input_port
+        self.window = window
+        self.settle = settle
+        self.threshold = threshold
+        self.time_of_flight = time_of_flight
+        self.overhead = overhead
+        self.mask = None
+
+    @property
+    def elements(self):
+        return [f'scan_{name}' for name in self.buttons]
+
+    @property
+    def scan_time(self):
+        """
+        The estimated time of one scan of all buttons, in ns.
+        """
+        return len(self.buttons) * (self.settle + self.window + self.overhead)
+
+    def configuration(self):
+        """
+        The elements, pulses and weights of the scanner, merge them into the
+        game's configuration (e.g. with launcher.merge_configurations).
+        """
+        length = self.settle + self.window
+        cosine = [(0.0, self.settle), (1.0, self.window)] if self.settle else [(1.0, self.window)]
+        return {
+            'elements': {
+                element: {
+                    'singleInput': {'port': self.output_port},
+                    'digitalInputs': {'button': {'port': port, 'delay': 0, 'buffer': 0}},
+                    'outputs': {'out1': self.input_port},
+                    'intermediate_frequency': 0,
+                    'operations': {'scan': 'scan_pulse'},
+                    'time_of_flight': self.time_of_flight,
+                    'smearing': 0,
+                } for element, port in zip(self.elements, self.digital_ports)
+            },
+            'pulses': {
+                'scan_pulse': {
+                    'operation': 'measurement',
+                    'length': length,
+                    'waveforms': {'single': 'scan_wf'},
+                    'digital_marker': 'scan_on',
+                    'integration_weights': {'cos': 'scan_weights'},
+                },
+            },
+            'waveforms': {'scan_wf': {'type': 'constant', 'sample': 0.0}},
+            'digital_waveforms': {'scan_on': {'samples': [(1, 0)]}},
+            'integration_weights': {
+                'scan_weights': {'cosine': cosine, 'sine': [(0.0, length)]},
+            },
+        }
+
+    def pack(self, pressed):
+        """
+        The bitmask of boolean `pressed` values (shape (..., buttons)), on the host.
+        """
+        pressed = np.asarray(pressed, dtype=np.int64)
+        return (pressed << np.arange(len(self.buttons))).sum(axis=-1)
+
+    def unpack_mask(self, mask):
+        """
+        The names of the buttons set in `mask`.
+        """
+        return [name for k, name in enumerate(self.buttons) if mask >> k & 1]
+
+    def declare(self):
+        """
+        Declare the mask and the measured level, call inside the program.
+        """
+        from qm.qua import declare, fixed
+
+        self._level = declare(fixed)
+        self.mask = declare(int, value=0)
+        return self.mask
+
+    def scan(self):
+        """
+        Measure every button once and assign the bitmask to `self.mask`.
+        """
+        from qm.qua import Cast, align, assign, demod, measure
+
+        threshold = self.threshold * self.window * DEMOD_SCALE
+        assign(self.mask, 0)
+        for k, element in enumerate(self.elements):
+            # one digital output at a time, the elements would run in parallel otherwise
+            align(*self.elements)
+            measure('scan', element, demod.full('cos', self._level, 'out1'))
+            assign(self.mask, self.mask | (Cast.to_int(self._level > threshold) << k))
+        align(*self.elements)
+        return self.mask
+
+    def unpack(self, act):
+        """
+        Set act[k] to 1 for every pressed button k, the other entries are not touched.
+        """
+        from qm.qua import assign, if_
+
+        for k in range(len(self.buttons)):
+            with if_((self.mask >> k) & 1 == 1):
+                assign(act[k], 1)
+
+
+def simulate(scanner, pressed, level=0.02, noise=0.05, seed=0):
+    """
+    The masks of scans of the boolean `pressed` array (shape (scans, buttons)),
+    with a pressed button at `level` V and white noise of `noise` V per sample.
+    """
+    rng = np.random.default_rng(seed)
+    pressed = np.asarray(pressed, dtype=bool)
+    # the mean of the window's samples, i.e. the demodulated level in volts
+    measured = pressed * level + rng.normal(0, noise / np.sqrt(scanner.window), pressed.shape)
+    return scanner.pack(measured > scanner.threshold)
+
+
+def benchmark(windows, buttons=4, scans=100000, level=0.02, noise=0.05, settle=100, overhead=250, seed=0):
+    """
+    Scans per second and the rate of wrong masks for every window length, on
+    random button presses.
+    """
+    rows = []
+    rng = np.random.default_rng(seed)
+    pressed = rng.random((scans, buttons)) < 0.5
+    for window in windows:
+        scanner = ButtonScanner([f'b{k}' for k in range(buttons)], [None] * buttons, None, None, window=window,
+                                settle=settle, threshold=level / 2, overhead=overhead)
+        masks = simulate(scanner, pressed, level, noise, seed)
+        rows.append({
+            'window': window,
+            'scan_time_us': scanner.scan_time / 1e3,
+            'scans_per_second': 1e9 / scanner.scan_time,
+            'error_rate': float(np.mean(masks != scanner.pack(pressed))),
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the button scanner on a simulated input.')
+    parser.add_argument('--windows', type=int, nargs='+', default=[40, 100, 200, 500, 1000, 2000, 5000])
+    parser.add_argument('--buttons', type=int, default=4)
+    parser.add_argument('--scans', type=int, default=100000)
+    parser.add_argument('--level', type=float, default=0.02, help='input level of a pressed button (V)')
+    parser.add_argument('--noise', type=float, default=0.05, help='noise per sample (V)')
+    parser.add_argument('--settle', type=int, default=100)
+    parser.add_argument('--overhead', type=int, default=250)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'window [ns]':>12}{'scan [us]':>11}{'scans/s':>10}{'error rate':>12}")
+    for r in benchmark(args.windows, args.buttons, args.scans, args.level, args.noise, args.settle, args.overhead,
+                       args.seed):
+        print(f"{r['window']:>12}{r['scan_time_us']:>11.2f}{r['scans_per_second']:>10.0f}{r['error_rate']:>12.2e}")
+
+
+if __name__ == '__main__':
+    main()
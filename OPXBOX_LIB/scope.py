@@ -0,0 +1,298 @@
+"""
+An offline XY oscilloscope for the screen element.
+
+The emulator takes the drawing commands of a game, i.e. the
+`set_dc_offset("screen", "I"/"Q", v)` and `play(pulse * amp(...), "screen")`
+events, together with the configuration's waveforms, and rasterizes the beam
+path into an image. Each frame the old image fades by `persistence`, like the
+phosphor of a real scope:
+
+    scope = ScopeEmulator(configuration)
+    scope.set_dc_offset('I', 0.1)
+    scope.play('bird', amp=(0, -1, 1, 0))     # amp(v00, v01, v10, v11) or a scalar
+    image = scope.frame()
+
+The draw functions of a game can be run as they are with `emulate_qua`, which
+swaps their QUA commands for the emulator while they are called with plain
+numbers. Samples blanked by the pulse's digital marker are not drawn.
+
+    python -m OPXBOX_LIB.scope pong --output frames/ --frames 30 --video sprites.mp4
+
+renders every sprite of a game (rotating over the frames) to PNG frames and a video.
+"""
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+
+SAMPLE_TIME = 1e-9  # s, the OPX plays one sample per ns
+
+
+def pulse_samples(configuration, element, operation):
+    """
+    The I and Q samples (shape (2, length)) of an operation of an element, and
+    the mask of the samples its digital marker leaves unblanked.
+    """
+    pulse = configuration['pulses'][configuration['elements'][element]['operations'][operation]]
+    length = pulse['length']
+    waveforms = []
+    for port in ['I', 'Q']:
+        waveform = configuration['waveforms'][pulse['waveforms'][port]]
+        if waveform['type'] == 'constant':
+            waveforms.append(np.full(length, waveform['sample'], dtype=float))
+        else:
+            waveforms.append(np.asarray(waveform['samples'], dtype=float))
+    mask = np.ones(length, dtype=bool)
+    if 'digital_marker' in pulse:
+        mask[:] = False
+        position = 0
+        for value, n in configuration['digital_waveforms'][pulse['digital_marker']]['samples']:
+            # a length of 0 holds the value until the end of the pulse
+            end = length if n == 0 else position + n
+            mask[position:end] = bool(value)
+            position = end
+    return np.array(waveforms), mask
+
+
+def amp_matrix(amp):
+    """
+    The 2x2 matrix of `amp(v)` or `amp(v00, v01, v10, v11)`.
+    """
+    amp = np.asarray(amp, dtype=float)
+    if amp.size == 1:
+        return np.eye(2) * amp.item()
+    return amp.reshape(2, 2)
+
+
+class ScopeEmulator:
+    """
+    Rasterizes the beam of the `element` into a `resolution` x `resolution`
+    image that spans +-span V on both axes.
+
+    `gain` sets the brightness of a pixel hit for one ns, and `persistence`
+    the fraction of the image that is left after a frame.
+    """
+
+    def __init__(self, configuration, element='screen', resolution=400, span=0.5, persistence=0.3, gain=1.0):
+        self.configuration = configuration
+        self.element = element
+        self.resolution = resolution
+        self.span = span
+        self.persistence = persistence
+        self.gain = gain
+        self.offset = np.zeros(2)
+        self.image = np.zeros((resolution, resolution))
+        self._energy = np.zeros(resolution * resolution)
+        self._pulses = {}
+        # the time the beam spent drawing in the current frame
+        self.drawn_time = 0.0
+
+    def _pulse(self, operation):
+        if operation not in self._pulses:
+            self._pulses[operation] = pulse_samples(self.configuration, self.element, operation)
+        return self._pulses[operation]
+
+    def set_dc_offset(self, port, value):
+        """
+        Move the beam, `port` is 'I' (x) or 'Q' (y).
+        """
+        self.offset[{'I': 0, 'Q': 1}[port]] = value
+
+    def play(self, operation, amp=1.0):
+        """
+        Draw an operation of the element at the current offset.
+        """
+        samples, mask = self._pulse(operation)
+        points = (amp_matrix(amp) @ samples).T + self.offset
+        self.draw(points, mask)
+        self.drawn_time += samples.shape[1] * SAMPLE_TIME
+
+    def draw(self, points, mask=None):
+        """
+        Add the beam path through `points` (V, shape (N, 2)) to the frame,
+        without the segments that touch a blanked sample.
+        """
+        points = np.asarray(points, dtype=float)
+        pixels = (points + self.span) / (2 * self.span) * (self.resolution - 1)
+        start, step = pixels[:-1], np.diff(pixels, axis=0)
+        visible = np.ones(len(step), dtype=bool) if mask is None else mask[:-1] & mask[1:]
+        start, step = start[visible], step[visible]
+        # split every segment into pieces shorter than a pixel, each ns spreads over its pieces
+        pieces = np.maximum(1, np.ceil(np.abs(step).max(axis=1, initial=0))).astype(int)
+        segment = np.repeat(np.arange(len(step)), pieces)
+        first = np.repeat(np.cumsum(pieces) - pieces, pieces)
+        t = (np.arange(len(segment)) - first + 0.5) / pieces[segment]
+        xy = np.rint(start[segment] + t[:, None] * step[segment]).astype(int)
+        inside = ((xy >= 0) & (xy < self.resolution)).all(axis=1)
+        xy, weight = xy[inside], 1.0 / pieces[segment][inside]
+        # y points up
+        flat = (self.resolution - 1 - xy[:, 1]) * self.resolution + xy[:, 0]
+        self._energy += np.bincount(flat, weight, minlength=self._energy.size)
+
+    def frame(self):
+        """
+        Finish the frame: fade the old image, add the beam of this frame and
+        return the image as uint8.
+        """
+        self.image = self.persistence * self.image + self._energy.reshape(self.image.shape)
+        self._energy[:] = 0
+        self.drawn_time = 0.0
+        return self.to_uint8(self.image)
+
+    def to_uint8(self, image):
+        return np.round(255 * (1 - np.exp(-self.gain * image))).astype(np.uint8)
+
+    def render(self, events):
+        """
+        Run a sequence of events and yield the image of every frame. The events
+        are tuples ('set_dc_offset', port, value), ('play', operation[, amp])
+        and ('frame',).
+        """
+        for event in events:
+            kind, args = event[0], event[1:]
+            if kind == 'frame':
+                yield self.frame()
+            else:
+                getattr(self, kind)(*args)
+
+
+class _Amp:
+    def __init__(self, *values):
+        self.values = values
+
+    def __rmul__(self, operation):
+        return operation, self.values
+
+
+class _Math:
+    cos2pi = staticmethod(lambda a: np.cos(2 * np.pi * a))
+    sin2pi = staticmethod(lambda a: np.sin(2 * np.pi * a))
+    cos = staticmethod(np.cos)
+    sin = staticmethod(np.sin)
+    sqrt = staticmethod(np.sqrt)
+    abs = staticmethod(np.abs)
+
+
+@contextlib.contextmanager
+def emulate_qua(module, scope):
+    """
+    While inside, the draw functions of a game module draw on `scope` instead
+    of building QUA. Call them with plain numbers.
+    """
+    def set_dc_offset(element, port, value):
+        if element == scope.element:
+            scope.set_dc_offset(port, float(value))
+
+    def play(pulse, element, *args, **kwargs):
+        if element == scope.element and isinstance(pulse, tuple):
+            operation, values = pulse
+            scope.play(operation, [float(v) for v in values])
+        elif element == scope.element:
+            scope.play(pulse)
+
+    names = {'set_dc_offset': set_dc_offset, 'play': play, 'amp': _Amp, 'Math': _Math,
+             'align': lambda *args: None, 'wait': lambda *args, **kwargs: None}
+    original = {name: module.__dict__[name] for name in names if name in module.__dict__}
+    module.__dict__.update(names)
+    try:
+        yield scope
+    finally:
+        for name in names:
+            module.__dict__.pop(name, None)
+        module.__dict__.update(original)
+
+
+def colorize(image):
+    """
+    A green (BGR) version of a uint8 image, the color of a scope's phosphor.
+    """
+    return np.stack([image // 4, image, image // 4], axis=-1)
+
+
+def write_frames(frames, directory, prefix='frame'):
+    """
+    Write the frames as PNG files. Returns the number of frames.
+    """
+    import cv2
+
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for count, image in enumerate(frames, 1):
+        cv2.imwrite(os.path.join(directory, f'{prefix}_{count - 1:05d}.png'), colorize(image))
+    return count
+
+
+def write_video(frames, path, fps=30):
+    """
+    Write the frames to a video file (mp4). Returns the number of frames.
+    """
+    import cv2
+
+    writer = None
+    count = 0
+    try:
+        for count, image in enumerate(frames, 1):
+            if writer is None:
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, image.shape[::-1])
+                if not writer.isOpened():
+                    raise ValueError(f"Could not write a video to '{path}'.")
+            writer.write(colorize(image))
+    finally:
+        if writer is not None:
+            writer.release()
+    return count
+
+
+def sprite_events(configuration, element='screen', frames=1, spacing=0.25):
+    """
+    Events that draw all operations of the element side by side, rotating
+    once over `frames` frames.
+    """
+    operations = list(configuration['elements'][element]['operations'])
+    columns = int(np.ceil(np.sqrt(len(operations))))
+    for k in range(frames):
+        a = k / frames
+        for i, operation in enumerate(operations):
+            row, column = divmod(i, columns)
+            yield 'set_dc_offset', 'I', (column - (columns - 1) / 2) * spacing
+            yield 'set_dc_offset', 'Q', ((columns - 1) / 2 - row) * spacing
+            yield 'play', operation, (np.cos(2 * np.pi * a), -np.sin(2 * np.pi * a),
+                                      np.sin(2 * np.pi * a), np.cos(2 * np.pi * a))
+        yield 'frame',
+
+
+def main(argv=None):
+    from OPXBOX_LIB.launcher import GAMES, load_game_module
+
+    parser = argparse.ArgumentParser(description='Render the sprites of a game on an emulated XY scope.')
+    parser.add_argument('game', choices=sorted(GAMES))
+    parser.add_argument('--output', help='directory for the PNG frames')
+    parser.add_argument('--video', help='video file (mp4)')
+    parser.add_argument('--frames', type=int, default=1)
+    parser.add_argument('--resolution', type=int, default=400)
+    parser.add_argument('--span', type=float, help='V, half the width of the screen')
+    parser.add_argument('--spacing', type=float, default=0.25, help='V between the sprites')
+    parser.add_argument('--persistence', type=float, default=0.3)
+    args = parser.parse_args(argv)
+
+    configuration = load_game_module(GAMES[args.game][0]).configuration
+    operations = configuration['elements']['screen']['operations']
+    span = args.span or args.spacing * (int(np.ceil(np.sqrt(len(operations)))) + 1) / 2
+    scope = ScopeEmulator(configuration, resolution=args.resolution, span=span, persistence=args.persistence)
+    t0 = time.perf_counter()
+    frames = list(scope.render(sprite_events(configuration, frames=args.frames, spacing=args.spacing)))
+    seconds = time.perf_counter() - t0
+    print(f'{len(operations)} operations, {len(frames)} frames in {seconds:.2f} s '
+          f'({len(frames) / seconds:.0f} frames/s)')
+    if args.output:
+        write_frames(frames, args.output)
+        print(f'frames -> {args.output}')
+    if args.video:
+        write_video(frames, args.video)
+        print(f'video -> {args.video}')
+
+
+if __name__ == '__main__':
+    main()
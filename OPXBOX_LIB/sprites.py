@@ -1,6 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import pytest
 
 
 def resample_trace(x, y, points):
@@ -24,6 +22,8 @@ def get_border_pulse(points):
 
 
 def draw_example(pulse):
+    import matplotlib.pyplot as plt
+
     plt.plot(*pulse)
     plt.show()
 
@@ -0,0 +1,139 @@
+"""
+Measure how long it takes to start each game.
+
+Every game is imported in a fresh python process, so the times include the
+cold imports. For each game the following is reported (in seconds):
+
+- deps: importing numpy and qm.qua, which every game needs
+- import: executing the game script (including its config and programs)
+- config: building the configuration again with `build_configuration()`
+- program: building the QUA programs, i.e. the time spent in `with program()`
+
+Usage:
+    python -m OPXBOX_LIB.startup_benchmark
+    python -m OPXBOX_LIB.startup_benchmark flappy mario --save startup.json
+    python -m OPXBOX_LIB.startup_benchmark --compare startup.json
+
+Cached programs (see program_cache.py) are used like in a normal start, pass
+--no-cache to measure building them.
+
+With --compare the script exits with 1 if a time got slower than the saved one
+by more than --tolerance, so regressions are caught.
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+from OPXBOX_LIB.launcher import GAMES, ROOT
+
+METRICS = ['deps', 'import', 'config', 'program']
+
+
+def measure(game):
+    """
+    Measure the startup of `game` in the current process (which should not
+    have imported it or its dependencies yet).
+    """
+    t0 = time.perf_counter()
+    import numpy
+    import qm.qua
+    deps = time.perf_counter() - t0
+
+    program_times = []
+    original_program = qm.qua.program
+
+    @contextlib.contextmanager
+    def timed_program():
+        t = time.perf_counter()
+        with original_program() as prog:
+            yield prog
+        program_times.append(time.perf_counter() - t)
+
+    # the games use `from qm.qua import *`, so they pick up the timed version
+    qm.qua.program = timed_program
+    try:
+        from OPXBOX_LIB.launcher import load_game_module
+
+        t0 = time.perf_counter()
+        module = load_game_module(GAMES[game][0])
+        import_time = time.perf_counter() - t0
+    finally:
+        qm.qua.program = original_program
+
+    t0 = time.perf_counter()
+    module.build_configuration()
+    config = time.perf_counter() - t0
+    return {'deps': deps, 'import': import_time, 'config': config, 'program': sum(program_times)}
+
+
+def measure_in_subprocess(game, use_cache=True):
+    env = dict(os.environ, MPLBACKEND='Agg')
+    if not use_cache:
+        env['OPXBOX_PROGRAM_CACHE'] = '0'
+    out = subprocess.run([sys.executable, '-m', 'OPXBOX_LIB.startup_benchmark', '--child', game],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().split('\n')[-1])
+
+
+def run(games, repeat=1, use_cache=True):
+    """
+    The best of `repeat` runs of every metric, per game.
+    """
+    results = {}
+    for game in games:
+        runs = [measure_in_subprocess(game, use_cache) for _ in range(repeat)]
+        results[game] = {m: min(r[m] for r in runs) for m in METRICS}
+    return results
+
+
+def compare(results, baseline, tolerance, slack=0.01):
+    """
+    The (game, metric, now, before) of everything that got slower than the
+    baseline by more than `tolerance` (relative) plus `slack` seconds.
+    """
+    slower = []
+    for game, times in results.items():
+        for metric, now in times.items():
+            before = baseline.get(game, {}).get(metric)
+            if before is not None and now > before * (1 + tolerance) + slack:
+                slower.append((game, metric, now, before))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the startup time of the games.')
+    parser.add_argument('games', nargs='*', default=[], help='default: all games')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='write the results to this json file')
+    parser.add_argument('--compare', help='compare to the results in this json file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--no-cache', action='store_true', help="don't load cached programs")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        return 0
+
+    results = run(args.games or list(GAMES), args.repeat, use_cache=not args.no_cache)
+    print(f"{'game':<20}" + ''.join(f'{m:>10}' for m in METRICS))
+    for game, times in results.items():
+        print(f'{game:<20}' + ''.join(f'{times[m]:>10.3f}' for m in METRICS))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for game, metric, now, before in slower:
+            print(f'{game} {metric} got slower: {before:.3f} s -> {now:.3f} s')
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
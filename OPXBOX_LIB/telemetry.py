@@ -0,0 +1,187 @@
+"""
+Live plotting of streamed results while a game is running.
+
+Instead of plotting ``res.move.fetch_all()`` after the game ended, the
+``LivePlotter`` polls the result handles at a fixed refresh rate, only fetches
+the values that arrived since the last refresh and redraws the lines with
+matplotlib blitting. Long histories are reduced with a min/max downsampling so
+spikes (e.g. a button press) stay visible while only a few hundred points are
+drawn.
+
+Example:
+    job = qm.execute(controller_debug)
+    LivePlotter(job.result_handles, ["I"]).run()
+"""
+import time
+
+import numpy as np
+
+
+def minmax_downsample(y, n_bins):
+    """
+    Reduce y to at most 2 * n_bins points by keeping the minimum and the
+    maximum of each bin (in the order they occur).
+
+    Returns the indices of the kept points and their values.
+    """
+    y = np.asarray(y)
+    if len(y) <= 2 * n_bins:
+        return np.arange(len(y)), y
+    bin_size = int(np.ceil(len(y) / n_bins))
+    n_bins = int(np.ceil(len(y) / bin_size))
+    padded = np.pad(y, (0, n_bins * bin_size - len(y)), mode='edge')
+    binned = padded.reshape(n_bins, bin_size)
+    start = np.arange(n_bins) * bin_size
+    i_min = start + np.argmin(binned, axis=1)
+    i_max = start + np.argmax(binned, axis=1)
+    idx = np.stack([np.minimum(i_min, i_max), np.maximum(i_min, i_max)], axis=1).ravel()
+    idx = np.minimum(idx, len(y) - 1)
+    return idx, y[idx]
+
+
+class StreamHistory:
+    """
+    The last `length` values of one result stream.
+
+    Only the values that arrived since the previous call of `poll` are fetched.
+    """
+
+    def __init__(self, handle, length):
+        self.handle = handle
+        self.length = length
+        self.values = np.zeros(0)
+        self.count = 0
+        self.rate = 0.0
+        self._t_last = None
+
+    def poll(self):
+        """
+        Fetch the new values. Returns the number of new values.
+        """
+        count = self.handle.count_so_far()
+        new = count - self.count
+        now = time.perf_counter()
+        if self._t_last is not None and now > self._t_last:
+            self.rate = new / (now - self._t_last)
+        self._t_last = now
+        if new <= 0:
+            return 0
+        # values older than the history are never drawn, so don't fetch them
+        start = max(self.count, count - self.length)
+        data = self.handle.fetch(slice(start, count), flat_struct=True)
+        data = np.asarray(data, dtype=float).ravel()
+        self.values = np.concatenate([self.values, data])[-self.length:]
+        self.count = count
+        return new
+
+
+class LivePlotter:
+    """
+    Plot streams of a running job, one axis per stream.
+
+    result_handles: the `job.result_handles` of the running job
+    names: the names of the streams to plot (they have to use `save_all`)
+    history: number of values shown per stream
+    max_points: maximal number of points drawn per line (min/max downsampled)
+    refresh_rate: redraws per second
+    budget: fraction of a refresh period that may be spent fetching and
+        drawing. When it is exceeded, `max_points` is halved, and when a frame
+        takes less than a quarter of it, it is doubled again up to the given value.
+    """
+
+    def __init__(self, result_handles, names, history=10000, max_points=1000, refresh_rate=10, budget=0.5):
+        self.result_handles = result_handles
+        self.names = list(names)
+        self.history = history
+        self.max_points = max_points
+        self.target_points = max_points
+        self.period = 1 / refresh_rate
+        self.budget = budget
+        self.streams = [StreamHistory(result_handles.get(n), history) for n in self.names]
+        self.fig = None
+
+    def _setup(self):
+        import matplotlib.pyplot as plt
+
+        plt.ion()
+        self.fig, axes = plt.subplots(len(self.names), 1, sharex=True, squeeze=False)
+        self.axes = axes[:, 0]
+        self.lines = []
+        self.labels = []
+        for ax, name in zip(self.axes, self.names):
+            line, = ax.plot([], [], animated=True)
+            label = ax.text(0.99, 0.95, '', transform=ax.transAxes, ha='right', va='top',
+                            fontsize='small', animated=True)
+            ax.set_xlim(-self.history, 0)
+            ax.set_ylim(-1, 1)
+            ax.set_ylabel(name)
+            self.lines.append(line)
+            self.labels.append(label)
+        self.axes[-1].set_xlabel('samples')
+        plt.show(block=False)
+        self._redraw_background()
+
+    def _redraw_background(self):
+        canvas = self.fig.canvas
+        canvas.draw()
+        self.background = canvas.copy_from_bbox(self.fig.bbox)
+
+    def _fit_ylim(self, ax, values):
+        # only called when the data leaves the current limits, as it needs a full redraw
+        low, high = ax.get_ylim()
+        if values.min() >= low and values.max() <= high:
+            return False
+        span = max(values.max() - values.min(), 1e-6)
+        ax.set_ylim(values.min() - 0.1 * span, values.max() + 0.1 * span)
+        return True
+
+    def update(self):
+        """
+        Fetch new values and redraw the lines.
+        """
+        if self.fig is None:
+            self._setup()
+        rescaled = False
+        for stream, ax, line, label in zip(self.streams, self.axes, self.lines, self.labels):
+            stream.poll()
+            if len(stream.values) == 0:
+                continue
+            idx, values = minmax_downsample(stream.values, self.max_points // 2)
+            line.set_data(idx - len(stream.values), values)
+            rescaled |= self._fit_ylim(ax, values)
+            label.set_text(f'{stream.count} values, {stream.rate:.1f}/s')
+        if rescaled:
+            self._redraw_background()
+        canvas = self.fig.canvas
+        canvas.restore_region(self.background)
+        for ax, line, label in zip(self.axes, self.lines, self.labels):
+            ax.draw_artist(line)
+            ax.draw_artist(label)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def adapt(self, spent):
+        """
+        Adjust `max_points` to the time `spent` on the last frame.
+        """
+        budget = self.budget * self.period
+        if spent > budget and self.max_points > 100:
+            self.max_points //= 2
+        # a quarter, so the doubled points still fit and it doesn't flip back and forth
+        elif spent < budget / 4 and self.max_points < self.target_points:
+            self.max_points = min(2 * self.max_points, self.target_points)
+
+    def run(self, duration=None):
+        """
+        Refresh until the job stopped (or `duration` seconds passed).
+        """
+        t_start = time.perf_counter()
+        while self.result_handles.is_processing():
+            t0 = time.perf_counter()
+            self.update()
+            spent = time.perf_counter() - t0
+            self.adapt(spent)
+            if duration is not None and t0 - t_start > duration:
+                break
+            time.sleep(max(0.0, self.period - spent))
+        self.update()
@@ -0,0 +1,173 @@
+"""
+Turning images into traces for the XY display.
+
+An image is drawn as one waveform: all significant contours of its edges,
+ordered so the jumps between them are short, with the samples shared between
+the contours by their length. During a jump the beam is blanked with the
+draw_marker digital output, so no retrace lines are visible:
+
+    edges = cv2.Canny(img, 100, 200)
+    trace, marker = build_drawing(order_contours(find_contours(edges)), 16500)
+
+`trace` holds the x and y samples of the pulse and `marker` the digital
+waveform samples ([(1, n), (0, jump), ...]) to use as its `digital_marker`.
+"""
+import numpy as np
+
+JUMP_SAMPLES = 16  # samples of the blanked move between two contours
+
+
+def resample_trace(x, y, points):
+    """
+    Resample the trace defined by x and y to a given number of points.
+    """
+    assert len(x) == len(y)
+    t = np.linspace(0, len(x) - 1, points)
+    x_resampled = np.interp(t, np.arange(len(x)), x)
+    y_resampled = np.interp(t, np.arange(len(y)), y)
+    return np.array([x_resampled, y_resampled])
+
+
+def arc_length(points):
+    """
+    The length of the polyline through `points` (shape (N, 2)).
+    """
+    return float(np.sum(np.hypot(*np.diff(points, axis=0).T)))
+
+
+def resample_polyline(points, n):
+    """
+    `n` points evenly spaced along the polyline through `points`, so the beam
+    moves with a constant speed.
+    """
+    points = np.asarray(points, dtype=float)
+    s = np.concatenate([[0], np.cumsum(np.hypot(*np.diff(points, axis=0).T))])
+    if s[-1] == 0:
+        return np.repeat(points[:1], n, axis=0)
+    t = np.linspace(0, s[-1], n)
+    return np.stack([np.interp(t, s, points[:, 0]), np.interp(t, s, points[:, 1])], axis=1)
+
+
+def find_contours(edges, min_length=20, epsilon=0.001, max_contours=None):
+    """
+    All contours of an edge image that are at least `min_length` pixels long,
+    simplified with a tolerance of `epsilon` times their length. The contours
+    are closed, i.e. end on their first point.
+    """
+    import cv2
+
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+    result = []
+    for contour in contours:
+        length = cv2.arcLength(contour, True)
+        if length < min_length:
+            continue
+        approx = cv2.approxPolyDP(contour, epsilon * length, True).reshape(-1, 2).astype(float)
+        result.append((length, np.vstack([approx, approx[:1]])))
+    result.sort(key=lambda item: -item[0])
+    return [points for _, points in result[:max_contours]]
+
+
+def _is_closed(points):
+    return len(points) > 2 and np.array_equal(points[0], points[-1])
+
+
+def order_contours(contours, start=(0.0, 0.0)):
+    """
+    Order (and orient) the contours greedily, so each one starts close to
+    where the previous one ended. Closed contours may start at any of their
+    points, open ones at either end.
+    """
+    remaining = [np.asarray(c, dtype=float) for c in contours]
+    position = np.asarray(start, dtype=float)
+    ordered = []
+    while remaining:
+        best = None
+        for k, contour in enumerate(remaining):
+            if _is_closed(contour):
+                d = np.hypot(*(contour[:-1] - position).T)
+                i = int(np.argmin(d))
+                candidate = (d[i], k, np.vstack([contour[i:-1], contour[:i + 1]]))
+            else:
+                d_start, d_end = np.hypot(*(contour[[0, -1]] - position).T)
+                candidate = (d_start, k, contour) if d_start <= d_end else (d_end, k, contour[::-1])
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+        _, k, contour = best
+        ordered.append(contour)
+        position = contour[-1]
+        remaining.pop(k)
+    return ordered
+
+
+def jump_distance(contours):
+    """
+    The total distance of the (blanked) jumps between consecutive contours.
+    """
+    return float(sum(np.hypot(*(b[0] - a[-1])) for a, b in zip(contours, contours[1:])))
+
+
+def allocate_samples(lengths, budget, min_samples=2):
+    """
+    Share `budget` samples between contours proportionally to their lengths
+    (at least `min_samples` each), rounding so the sum is exactly `budget`.
+    """
+    lengths = np.asarray(lengths, dtype=float)
+    if budget < min_samples * len(lengths):
+        raise ValueError(f'{budget} samples are not enough for {len(lengths)} contours.')
+    share = lengths / lengths.sum() * (budget - min_samples * len(lengths)) if lengths.sum() else \
+        np.full(len(lengths), (budget - min_samples * len(lengths)) / len(lengths))
+    samples = np.floor(share).astype(int)
+    # the largest remainders get the samples lost by rounding down
+    samples[np.argsort(samples - share)[:budget - min_samples * len(lengths) - samples.sum()]] += 1
+    return samples + min_samples
+
+
+def build_drawing(contours, budget, size=0.1, jump_samples=JUMP_SAMPLES, samples=None, bounds=None):
+    """
+    One trace of `budget` samples drawing all contours in order, scaled so
+    the drawing spans +-size and centered.
+
+    Between the contours (and from the last back to the first one, as the
+    pulse is played in a loop) the beam jumps in `jump_samples` samples.
+    Returns the trace (shape (2, budget)) and the digital marker samples,
+    which are 1 while drawing and 0 during the jumps.
+
+    `samples` fixes the samples of each contour (they default to a share by
+    length), and `bounds` ((x0, y0), (x1, y1)) the area that is scaled to the
+    drawing instead of the contours' own extent.
+    """
+    if not contours:
+        raise ValueError('There are no contours to draw.')
+    if samples is None:
+        samples = allocate_samples([arc_length(c) for c in contours], budget - jump_samples * len(contours))
+    if sum(samples) + jump_samples * len(contours) != budget:
+        raise ValueError(f'The samples of the contours and jumps have to add up to {budget}.')
+    pieces = []
+    marker = []
+    for k, (contour, n) in enumerate(zip(contours, samples)):
+        pieces.append(resample_polyline(contour, n))
+        following = contours[(k + 1) % len(contours)][0]
+        pieces.append(np.linspace(contour[-1], following, jump_samples + 2)[1:-1])
+        marker += [(1, int(n)), (0, jump_samples)]
+    points = np.concatenate(pieces)
+
+    low, high = (points.min(axis=0), points.max(axis=0)) if bounds is None else np.asarray(bounds, dtype=float)
+    scale = 2 * size / max(high - low) if max(high - low) else 0
+    trace = ((points - (low + high) / 2) * scale).T
+    return trace, marker
+
+
+def image_to_drawing(img, budget, size=0.1, canny=(100, 200), min_length=20, epsilon=0.001, max_contours=None,
+                     jump_samples=JUMP_SAMPLES):
+    """
+    The trace and marker (see `build_drawing`) of a grayscale image, and its edge image.
+    """
+    import cv2
+
+    edges = cv2.Canny(img, *canny)
+    contours = find_contours(edges, min_length, epsilon, max_contours)
+    if not contours:
+        raise ValueError('No contours found. Try adjusting the Canny thresholds or using a simpler image.')
+    trace, marker = build_drawing(order_contours(contours), budget, size, jump_samples)
+    return trace, marker, edges
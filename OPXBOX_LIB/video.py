@@ -0,0 +1,235 @@
+"""
+Turning videos and image sequences into one drawing per frame.
+
+Every step is a generator, so a clip streams through frame by frame and never
+has to fit in memory:
+
+    frames = read_frames('clip.mp4')            # or a directory of images
+    for trace, marker in video_drawings(frames, 4000):
+        ...
+
+All frames get the same number of samples, so they play as pulses of the same
+length. To keep the drawing from flickering, the `ContourTracker` matches the
+contours of a frame to the ones of the previous frame (by their centers),
+keeps their drawing order and starting points, and smooths the samples given
+to each contour over the frames.
+
+    python -m OPXBOX_LIB.video clip.mp4 frames/ --samples 4000
+    python -m OPXBOX_LIB.video --benchmark
+
+writes frames/frame_00000.npz, ... (see image_converter.load_drawing), which
+picture/animation.py plays in a loop. --benchmark converts a synthetic clip
+and reports the conversion speed in frames per second.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from OPXBOX_LIB.vector_image import JUMP_SAMPLES, allocate_samples, arc_length, build_drawing, find_contours, \
+    order_contours
+
+
+def read_frames(source):
+    """
+    The grayscale frames of a video file or of the images in a directory (in
+    the order of their names).
+    """
+    import cv2
+
+    if os.path.isdir(source):
+        from OPXBOX_LIB.image_converter import find_images
+
+        for path in find_images(source):
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                raise FileNotFoundError(f"Could not read '{path}'.")
+            yield img
+        return
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Could not open '{source}'.")
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    finally:
+        capture.release()
+
+
+def synthetic_clip(frames=120, size=240):
+    """
+    A clip of a circle moving around a rotating square, for tests and benchmarks.
+    """
+    import cv2
+
+    for k in range(frames):
+        img = np.zeros((size, size), np.uint8)
+        phase = 2 * np.pi * k / frames
+        center = (int(size / 2 + size / 4 * np.cos(phase)), int(size / 2 + size / 4 * np.sin(phase)))
+        cv2.circle(img, center, size // 10, 255, -1)
+        box = cv2.boxPoints(((size / 2, size / 2), (size / 5, size / 5), np.degrees(phase)))
+        cv2.fillPoly(img, [box.astype(np.int32)], 180)
+        yield img
+
+
+class ContourTracker:
+    """
+    Keeps the contours of consecutive frames in correspondence.
+
+    `smoothing` is the weight of the current frame in the moving average of
+    the length of a contour, which sets its samples. Contours whose centers
+    moved more than `max_distance` (pixels) start new tracks.
+    """
+
+    def __init__(self, budget, jump_samples=JUMP_SAMPLES, smoothing=0.3, max_distance=30):
+        self.budget = budget
+        self.jump_samples = jump_samples
+        self.smoothing = smoothing
+        self.max_distance = max_distance
+        # per track of the previous frame: center, smoothed length, start point, samples
+        self.tracks = []
+        # mean change of the samples of the matched contours in the last frame
+        self.sample_change = 0.0
+
+    def _match(self, centers):
+        matches = {}
+        if not self.tracks or not len(centers):
+            return matches
+        previous = np.array([t['center'] for t in self.tracks])
+        distance = np.hypot(*(previous[:, None, :] - centers[None, :, :]).transpose(2, 0, 1))
+        # greedy: the closest pairs first
+        for flat in np.argsort(distance, axis=None):
+            i, j = np.unravel_index(flat, distance.shape)
+            if distance[i, j] > self.max_distance:
+                break
+            if i not in matches and j not in matches.values():
+                matches[i] = j
+        return matches
+
+    def update(self, contours):
+        """
+        The contours of the next frame in drawing order, and their samples.
+        """
+        centers = np.array([c[:-1].mean(axis=0) for c in contours]).reshape(-1, 2)
+        lengths = [arc_length(c) for c in contours]
+        matches = self._match(centers)
+        ordered, smoothed, previous_samples = [], [], []
+        for i in sorted(matches):
+            j = matches[i]
+            track = self.tracks[i]
+            contour = contours[j]
+            # start where the previous frame started this contour
+            k = int(np.argmin(np.hypot(*(contour[:-1] - track['start']).T)))
+            ordered.append(np.vstack([contour[k:-1], contour[:k + 1]]))
+            smoothed.append((1 - self.smoothing) * track['length'] + self.smoothing * lengths[j])
+            previous_samples.append(track['samples'])
+        new = [j for j in range(len(contours)) if j not in matches.values()]
+        start = ordered[-1][-1] if ordered else (0.0, 0.0)
+        for contour in order_contours([contours[j] for j in new], start):
+            ordered.append(contour)
+            smoothed.append(arc_length(contour))
+        if not ordered:
+            self.tracks = []
+            return [], []
+        samples = allocate_samples(smoothed, self.budget - self.jump_samples * len(ordered))
+        if previous_samples:
+            self.sample_change = float(np.mean(np.abs(samples[:len(previous_samples)] - previous_samples)))
+        self.tracks = [{'center': c[:-1].mean(axis=0), 'length': l, 'start': c[0], 'samples': n}
+                       for c, l, n in zip(ordered, smoothed, samples)]
+        return ordered, samples
+
+
+def video_drawings(frames, budget, size=0.1, canny=(100, 200), min_length=20, epsilon=0.001, max_contours=None,
+                   jump_samples=JUMP_SAMPLES, smoothing=0.3, tracker=None):
+    """
+    The trace and marker (see `build_drawing`) of every frame. The frame, not
+    the contours, is scaled to +-size, so the drawing doesn't jump around.
+    Frames without contours are blanked.
+    """
+    import cv2
+
+    tracker = tracker or ContourTracker(budget, jump_samples, smoothing)
+    for img in frames:
+        edges = cv2.Canny(img, *canny)
+        contours, samples = tracker.update(find_contours(edges, min_length, epsilon, max_contours))
+        if not contours:
+            yield np.zeros((2, budget)), [(0, budget)]
+            continue
+        height, width = img.shape[:2]
+        yield build_drawing(contours, budget, size, jump_samples, samples=samples,
+                            bounds=((0, 0), (width, height)))
+
+
+def write_drawings(drawings, directory):
+    """
+    Store the drawings as frame_00000.npz, ... in `directory`. Returns the
+    number of frames.
+    """
+    from OPXBOX_LIB.image_converter import save_drawing
+
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for count, (trace, marker) in enumerate(drawings, 1):
+        save_drawing(os.path.join(directory, f'frame_{count - 1:05d}.npz'), trace, marker)
+    return count
+
+
+def load_frames(directory):
+    """
+    The drawings written by `write_drawings`, one after the other.
+    """
+    from OPXBOX_LIB.image_converter import load_drawing
+
+    for name in sorted(os.listdir(directory)):
+        if name.startswith('frame_') and name.endswith('.npz'):
+            yield load_drawing(os.path.join(directory, name))
+
+
+def benchmark(frames=120, size=240, budget=4000, smoothing=0.3):
+    """
+    Convert a synthetic clip. Returns the frames per second of the conversion
+    and the mean change of the samples of a contour from frame to frame.
+    """
+    tracker = ContourTracker(budget, smoothing=smoothing)
+    changes = []
+    t0 = time.perf_counter()
+    for _ in video_drawings(synthetic_clip(frames, size), budget, tracker=tracker):
+        changes.append(tracker.sample_change)
+    seconds = time.perf_counter() - t0
+    return {'frames': frames, 'fps': frames / seconds, 'sample_change': float(np.mean(changes[1:]))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a video or image sequence to one drawing per frame.')
+    parser.add_argument('source', nargs='?', help='video file or directory of images')
+    parser.add_argument('output', nargs='?', help='directory for the frames')
+    parser.add_argument('--samples', type=int, default=4000, help='samples per frame')
+    parser.add_argument('--size', type=float, default=0.1)
+    parser.add_argument('--canny', type=int, nargs=2, default=[100, 200])
+    parser.add_argument('--min-length', type=int, default=20)
+    parser.add_argument('--max-contours', type=int)
+    parser.add_argument('--smoothing', type=float, default=0.3)
+    parser.add_argument('--benchmark', action='store_true', help='convert a synthetic clip and report the speed')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        for smoothing in [1.0, args.smoothing]:
+            r = benchmark(budget=args.samples, smoothing=smoothing)
+            print(f"smoothing {smoothing:.2f}: {r['fps']:.0f} frames/s, "
+                  f"samples per contour change by {r['sample_change']:.1f} per frame")
+        return
+    if not args.source or not args.output:
+        parser.error('the source and output are required without --benchmark')
+    t0 = time.perf_counter()
+    drawings = video_drawings(read_frames(args.source), args.samples, args.size, tuple(args.canny),
+                              args.min_length, max_contours=args.max_contours, smoothing=args.smoothing)
+    count = write_drawings(drawings, args.output)
+    print(f'{count} frames in {time.perf_counter() - t0:.2f} s -> {args.output}')
+
+
+if __name__ == '__main__':
+    main()
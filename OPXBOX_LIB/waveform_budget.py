@@ -0,0 +1,224 @@
+"""
+Fitting a drawing into a waveform memory budget.
+
+`build_drawing` shares a fixed number of samples between the contours by
+their length, with one simplification tolerance for all of them. The solver
+here instead picks, for every contour, the simplification tolerance and the
+number of samples, so the largest Hausdorff distance between a drawn contour
+and its source contour is as small as possible while all contours (and the
+jumps between them) fit into `budget` samples:
+
+    plan = solve_budget(contours, 16500)
+    trace, marker = build_planned_drawing(plan, size=0.1)
+
+The Hausdorff distance is measured between the source contour (the pixel
+outline found in the image) and the polyline through the samples the OPX
+plays. With `max_error` the solver instead uses as few samples as it can
+while keeping every error below it, to save waveform memory. The footprint of
+a drawing is reported as the samples of its x and y waveforms:
+
+    python -m OPXBOX_LIB.waveform_budget face.jpg --budget 4000
+    python -m OPXBOX_LIB.waveform_budget face.jpg --max-error 0.5
+"""
+import argparse
+
+import numpy as np
+
+from OPXBOX_LIB.vector_image import JUMP_SAMPLES, allocate_samples, arc_length, build_drawing, resample_polyline
+
+TOLERANCES = [0.0, 0.25, 0.5, 1.0, 2.0, 4.0]  # px, simplification tolerances tried per contour
+MIN_SAMPLES = 4
+
+
+def densify(points, spacing=0.5):
+    """
+    The polyline through `points` with at most `spacing` between its points.
+    """
+    n = max(2, int(np.ceil(arc_length(points) / spacing)) + 1)
+    return resample_polyline(points, n)
+
+
+def distance_to_polyline(points, polyline, chunk=4096):
+    """
+    The distance of every point to the closest segment of the polyline.
+    """
+    a, b = polyline[:-1], polyline[1:]
+    ab = b - a
+    length2 = np.maximum((ab ** 2).sum(axis=1), 1e-12)
+    result = np.empty(len(points))
+    step = max(1, chunk * 64 // max(len(a), 1))
+    for start in range(0, len(points), step):
+        p = points[start:start + step, None, :]
+        t = np.clip(((p - a) * ab).sum(axis=2) / length2, 0, 1)
+        closest = a + t[..., None] * ab
+        result[start:start + step] = np.sqrt(((p - closest) ** 2).sum(axis=2)).min(axis=1)
+    return result
+
+
+def hausdorff(source, drawn):
+    """
+    The symmetric Hausdorff distance between two polylines.
+    """
+    if len(drawn) < 2:
+        drawn = np.vstack([drawn, drawn])
+    return float(max(distance_to_polyline(densify(source), drawn).max(),
+                     distance_to_polyline(densify(drawn), source).max()))
+
+
+def simplify(contour, tolerance):
+    """
+    The closed contour simplified with the Douglas-Peucker `tolerance` (px).
+    """
+    if tolerance <= 0:
+        return contour
+    import cv2
+
+    approx = cv2.approxPolyDP(contour[:-1].astype(np.float32).reshape(-1, 1, 2), tolerance, True).reshape(-1, 2)
+    return np.vstack([approx, approx[:1]]).astype(float)
+
+
+def sample_grid(contour, budget, count=16):
+    """
+    The sample counts tried for a contour, up to about 16 samples per pixel.
+    """
+    top = max(MIN_SAMPLES + 1, min(budget, int(16 * arc_length(contour)) + 2))
+    return np.unique(np.geomspace(MIN_SAMPLES, top, count).astype(int))
+
+
+def error_table(contour, budget, tolerances=TOLERANCES):
+    """
+    For each tried sample count, the smallest error over the tolerances and
+    the tolerance that reaches it. The errors never grow with more samples,
+    a count uses the best choice of all counts up to it.
+    """
+    grid = sample_grid(contour, budget)
+    errors = np.empty((len(tolerances), len(grid)))
+    for i, tolerance in enumerate(tolerances):
+        simplified = simplify(contour, tolerance)
+        for j, n in enumerate(grid):
+            errors[i, j] = hausdorff(contour, resample_polyline(simplified, n))
+    best = errors.argmin(axis=0)
+    error = errors[best, np.arange(len(grid))]
+    # carry the best smaller choice forward
+    position = np.maximum.accumulate(np.where(error == np.minimum.accumulate(error), np.arange(len(grid)), 0))
+    return grid[position], np.asarray(tolerances)[best[position]], error[position], grid
+
+
+def solve_budget(contours, budget, jump_samples=JUMP_SAMPLES, tolerances=TOLERANCES, max_error=None):
+    """
+    The tolerance and samples of every contour that minimize the largest
+    Hausdorff error within `budget` samples, or (with `max_error`) that use
+    the fewest samples with all errors below it. Returns a plan dict.
+    """
+    # the waveforms are padded to a multiple of 4 samples, which has to fit the budget too
+    available = budget - budget % 4 - jump_samples * len(contours)
+    if available < MIN_SAMPLES * len(contours):
+        raise ValueError(f'{budget} samples are not enough for {len(contours)} contours, drop some contours.')
+    tables = [error_table(c, available, tolerances) for c in contours]
+    # the smallest error every contour can reach within the budget
+    candidates = np.unique(np.concatenate([error for _, _, error, _ in tables]))
+    if max_error is not None and (candidates <= max_error).any():
+        # the largest error that is still good enough needs the fewest samples
+        candidates = np.concatenate([candidates[candidates <= max_error][::-1], candidates[candidates > max_error]])
+    choice = None
+    for target in candidates:
+        picks = [int(np.argmax(error <= target)) if (error <= target).any() else None for _, _, error, _ in tables]
+        if None in picks:
+            continue
+        if sum(samples[k] for (samples, _, _, _), k in zip(tables, picks)) <= available:
+            choice = picks
+            break
+    if choice is None:
+        # every contour at its smallest count
+        choice = [0] * len(contours)
+    samples = np.array([table[0][k] for table, k in zip(tables, choice)])
+    if samples.sum() > available:
+        raise ValueError(f'{budget} samples are not enough for {len(contours)} contours, drop some contours.')
+    tolerance = [float(table[1][k]) for table, k in zip(tables, choice)]
+    simplified = [simplify(c, t) for c, t in zip(contours, tolerance)]
+    return {
+        'contours': simplified,
+        'source': list(contours),
+        'tolerance': tolerance,
+        'samples': samples,
+        'error': [hausdorff(c, resample_polyline(s, n)) for c, s, n in zip(contours, simplified, samples)],
+        'jump_samples': jump_samples,
+        'length': int(samples.sum() + jump_samples * len(contours)),
+    }
+
+
+def uniform_plan(contours, budget, jump_samples=JUMP_SAMPLES, tolerance=0.0):
+    """
+    The plan of `build_drawing`: one tolerance, the samples shared by length.
+    """
+    budget -= budget % 4
+    simplified = [simplify(c, tolerance) for c in contours]
+    samples = allocate_samples([arc_length(c) for c in simplified], budget - jump_samples * len(contours))
+    return {
+        'contours': simplified,
+        'source': list(contours),
+        'tolerance': [tolerance] * len(contours),
+        'samples': samples,
+        'error': [hausdorff(c, resample_polyline(s, n)) for c, s, n in zip(contours, simplified, samples)],
+        'jump_samples': jump_samples,
+        'length': budget,
+    }
+
+
+def padded_length(length):
+    """
+    The length of a waveform in memory: padded to a multiple of 4 samples, the
+    pulse length the OPX needs.
+    """
+    return length + (-length) % 4
+
+
+def footprint(plan):
+    """
+    The waveform memory of a plan: samples of the pulse and of its x and y waveforms.
+    """
+    length = padded_length(plan['length'])
+    return {'pulse_samples': length, 'waveform_samples': 2 * length,
+            'drawn_samples': int(np.sum(plan['samples'])), 'max_error': float(max(plan['error']))}
+
+
+def build_planned_drawing(plan, size=0.1, bounds=None):
+    """
+    The trace and marker of a plan, padded to a multiple of 4 samples (the
+    pulse length the OPX needs) on its longest contour.
+    """
+    samples = np.array(plan['samples'])
+    length = padded_length(plan['length'])
+    samples[np.argmax(samples)] += length - plan['length']
+    return build_drawing(plan['contours'], length, size, plan['jump_samples'], samples=samples, bounds=bounds)
+
+
+def main(argv=None):
+    import cv2
+
+    from OPXBOX_LIB.vector_image import find_contours, order_contours
+
+    parser = argparse.ArgumentParser(description='Fit the drawing of an image into a sample budget.')
+    parser.add_argument('image')
+    parser.add_argument('--budget', type=int, default=16500, help='samples of the pulse')
+    parser.add_argument('--canny', type=int, nargs=2, default=[100, 200])
+    parser.add_argument('--min-length', type=int, default=20)
+    parser.add_argument('--max-error', type=float, help='use the fewest samples with errors below this (px)')
+    args = parser.parse_args(argv)
+
+    img = cv2.imread(args.image, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise FileNotFoundError(f"Could not read '{args.image}'.")
+    contours = order_contours(find_contours(cv2.Canny(img, *args.canny), args.min_length, epsilon=0))
+    plan = solve_budget(contours, args.budget, max_error=args.max_error)
+    print(f"{'contour':>8}{'length':>9}{'tolerance':>11}{'samples':>9}{'error [px]':>12}")
+    for k, (c, t, n, e) in enumerate(zip(plan['source'], plan['tolerance'], plan['samples'], plan['error'])):
+        print(f'{k:>8}{arc_length(c):>9.1f}{t:>11.2f}{n:>9}{e:>12.2f}')
+    for name, p in [('solved', plan), ('uniform', uniform_plan(contours, args.budget))]:
+        f = footprint(p)
+        print(f"{name}: {f['pulse_samples']} samples per waveform ({f['waveform_samples']} for x and y), "
+              f"largest Hausdorff error {f['max_error']:.2f} px")
+
+
+if __name__ == '__main__':
+    main()
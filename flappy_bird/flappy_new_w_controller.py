@@ -1,10 +1,12 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from pynput import keyboard
 
-from qm import QuantumMachinesManager
 from qm.qua import *
 from sprites_new import *
+from OPXBOX_LIB.connection import LazyQM
+from OPXBOX_LIB.controller import ControllerDecoder, DriftTracker, ShortWindowReader
+from OPXBOX_LIB.inputs import InputConditioner
+from OPXBOX_LIB.program_cache import cached_program
+from OPXBOX_LIB.telemetry import LivePlotter
 import random
 import time
 
@@ -27,11 +29,23 @@ MAX_SPEED = 0.2              # V/s, maximum bird speed
 # Timing parameters
 TIME_STEP_SIZE = 0.01      # s, time advanced per tick
 USER_INPUT_PULSE_LENGTH = 500000  # ns, pulse length for user input probing
+INPUT_WINDOW_LENGTH = 10000  # ns, length of one short controller read
 SPRITE_LENGTH = 16500        # number of samples used to draw sprites
 WAIT_TIME = 1e7 / 2        # ns, wait time after drawing sprites
 
 # Controller input parameters
 INPUT_PROBE_VOLTAGE = 0.5  # V, amplitude used to probe the controller
+# Decodes the measured level into the pressed button, see OPXBOX_LIB/controller_profile.json
+DECODER = ControllerDecoder.from_profile()
+# Read the controller with a few short windows instead of one long measurement,
+# see `python -m OPXBOX_LIB.controller_sim` for the error rate of the window length
+SHORT_INPUT_READ = True
+READER = ShortWindowReader(DECODER, INPUT_WINDOW_LENGTH, USER_INPUT_PULSE_LENGTH, max_windows=4)
+# Follow the drift of the levels in the frames without a press, instead of recalibrating
+DRIFT_TRACKING = True
+TRACKER = DriftTracker(DECODER, alpha=0.02, max_offset=0.05)
+# Debounces the decoded buttons, a press has to be seen in 2 frames in a row
+INPUTS = InputConditioner(DECODER.buttons, debounce=2)
 
 # Additional game parameters
 GRAVITY = 1         # Gravity affecting the bird's fall speed
@@ -43,184 +57,201 @@ BIRD_Y_MAX = FIELD_SIZE - 0.1  # Maximum height for the bird
 # =============================================================================
 # QUA Configuration Dictionary
 # =============================================================================
-configuration = {
-    'version': 1,
-    'controllers': {
-        'con1': {
-            "type": "opx1000",
-            "fems": {
-                5: {
-                    "type": "LF",
-                    "analog_outputs": {i: {"offset": 0.0} for i in range(1, 9)},
-                    "analog_inputs": {
-                        1: {"offset": 0.0, "gain_db": 0},
-                        2: {"offset": 0.0, "gain_db": 0},
+def build_configuration():
+    """
+    The QUA configuration of the game, with all sprite waveforms.
+    """
+    return {
+        'version': 1,
+        'controllers': {
+            'con1': {
+                "type": "opx1000",
+                "fems": {
+                    5: {
+                        "type": "LF",
+                        "analog_outputs": {i: {"offset": 0.0} for i in range(1, 9)},
+                        "analog_inputs": {
+                            1: {"offset": 0.0, "gain_db": 0},
+                            2: {"offset": 0.0, "gain_db": 0},
+                        },
+                        "digital_outputs": {i: {} for i in range(1, 8)},
                     },
-                    "digital_outputs": {i: {} for i in range(1, 8)},
-                },
-                3: {
-                    "type": "LF",
-                    "analog_outputs": {i: {"offset": 0.0} for i in range(1, 9)},
-                    "analog_inputs": {
-                        1: {"offset": 0.0, "gain_db": 0},
-                        2: {"offset": 0.0, "gain_db": 0},
+                    3: {
+                        "type": "LF",
+                        "analog_outputs": {i: {"offset": 0.0} for i in range(1, 9)},
+                        "analog_inputs": {
+                            1: {"offset": 0.0, "gain_db": 0},
+                            2: {"offset": 0.0, "gain_db": 0},
+                        },
+                        "digital_outputs": {i: {} for i in range(1, 8)},
                     },
-                    "digital_outputs": {i: {} for i in range(1, 8)},
                 },
             },
         },
-    },
-    'elements': {
-        'screen': {
-            'mixInputs': {
-                'I': ('con1', 5, 5),
-                'Q': ('con1', 5, 6),
+        'elements': {
+            'screen': {
+                'mixInputs': {
+                    'I': ('con1', 5, 5),
+                    'Q': ('con1', 5, 6),
+                },
+                'intermediate_frequency': 0,
+                'digitalInputs': {
+                    'draw_marker': {
+                        'port': ('con1', 5, 1),
+                        'delay': 0,
+                        'buffer': 0,
+                    },
+                },
+                'operations': {
+                    "bird": "bird",
+                    "pillar_short": "pillar_short",
+                    "pillar_medium": "pillar_medium",
+                    "pillar_long": "pillar_long",
+                    "border": "border",
+                    "r_pillar_short": "r_pillar_short",
+                    "r_pillar_medium": "r_pillar_medium",
+                    "r_pillar_long": "r_pillar_long",
+                    "blank": "blank",
+                    "game_over": "game_over",
+                },
             },
-            'intermediate_frequency': 0,
-            'digitalInputs': {
-                'draw_marker': {
+            'draw_marker_element': {
+                'singleInput': {
                     'port': ('con1', 5, 1),
-                    'delay': 0,
-                    'buffer': 0,
+                },
+                'intermediate_frequency': 0,
+                'operations': {
+                    "marker_pulse": "marker_pulse",
                 },
             },
-            'operations': {
-                "bird": "bird",
-                "pillar_short": "pillar_short",
-                "pillar_medium": "pillar_medium",
-                "pillar_long": "pillar_long",
-                "border": "border",
-                "r_pillar_short": "r_pillar_short",
-                "r_pillar_medium": "r_pillar_medium",
-                "r_pillar_long": "r_pillar_long",
-                "blank": "blank",
-                "game_over": "game_over",
+            'user_input_element': {
+                'singleInput': {
+                    'port': ('con1', 5, 2),
+                },
+                'outputs': {
+                    'out2': ('con1', 5, 2),
+                },
+                'intermediate_frequency': 0,
+                'operations': {
+                    "measure_user_input": "measure_user_input",
+                    "measure_user_input_short": "measure_user_input_short",
+                },
+                'time_of_flight': 136,
+                'smearing': 0
             },
         },
-        'draw_marker_element': {
-            'singleInput': {
-                'port': ('con1', 5, 1),
+        'pulses': {
+            **{n: {
+                'operation': 'control',
+                'length': SPRITE_LENGTH,
+                'waveforms': {k: f"{n}_{l}" for k, l in zip(["I", "Q"], ["x", "y"])},
+            } for n in [
+                "bird", "pillar_short", "pillar_medium", "pillar_long",
+                "border", "r_pillar_short", "r_pillar_medium", "r_pillar_long","game_over"
+            ]},
+            "measure_user_input": {
+                "operation": "measurement",
+                'length': USER_INPUT_PULSE_LENGTH,
+                "integration_weights": {"cos": "cosine_weights"},
+                'waveforms': {"single": "input_wf"},
             },
-            'intermediate_frequency': 0,
-            'operations': {
-                "marker_pulse": "marker_pulse",
-            },
-        },
-        'user_input_element': {
-            'singleInput': {
-                'port': ('con1', 5, 2),
+            "measure_user_input_short": {
+                "operation": "measurement",
+                'length': INPUT_WINDOW_LENGTH,
+                "integration_weights": {"cos": "short_cosine_weights"},
+                'waveforms': {"single": "input_wf"},
             },
-            'outputs': {
-                'out2': ('con1', 5, 2),
+            "marker_pulse": {
+                "operation": "control",
+                'length': SPRITE_LENGTH,
+                'waveforms': {"single": "marker_wf"},
             },
-            'intermediate_frequency': 0,
-            'operations': {
-                "measure_user_input": "measure_user_input",
+            "blank": {
+                "operation": "control",
+                "length": 16,
+                "waveforms": {
+                    "I":"blank_wf",
+                    "Q":"blank_wf",
+                }
             },
-            'time_of_flight': 136,
-            'smearing': 0
-        },
-    },
-    'pulses': {
-        **{n: {
-            'operation': 'control',
-            'length': SPRITE_LENGTH,
-            'waveforms': {k: f"{n}_{l}" for k, l in zip(["I", "Q"], ["x", "y"])},
-        } for n in [
-            "bird", "pillar_short", "pillar_medium", "pillar_long",
-            "border", "r_pillar_short", "r_pillar_medium", "r_pillar_long","game_over"
-        ]},
-        "measure_user_input": {
-            "operation": "measurement",
-            'length': USER_INPUT_PULSE_LENGTH,
-            "integration_weights": {"cos": "cosine_weights"},
-            'waveforms': {"single": "input_wf"},
-        },
-        "marker_pulse": {
-            "operation": "control",
-            'length': SPRITE_LENGTH,
-            'waveforms': {"single": "marker_wf"},
-        },
-        "blank": {
-            "operation": "control",
-            "length": 16,
-            "waveforms": {
-                "I":"blank_wf",
-                "Q":"blank_wf",
-            }
-        },
         
-    },
-    'waveforms': {
-        **{
-            f"bird_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"],
-                            get_bird_pulse(SPRITE_LENGTH) * FIELD_SIZE * 0.1)
-        },
-        **{
-            f"pillar_short_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"],
-                            get_pillar_pulse(SPRITE_LENGTH, 2) * R_PILLAR * 2)
-        },
-        **{
-            f"pillar_medium_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"],
-                            get_pillar_pulse(SPRITE_LENGTH, 3) * R_PILLAR * 2)
-        },
-        **{
-            f"pillar_long_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"],
-                            get_pillar_pulse(SPRITE_LENGTH, 4) * R_PILLAR * 2)
-        },
-        **{
-            f"border_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"],
-                            get_border_pulse(SPRITE_LENGTH) * FIELD_SIZE)
-        },
-        **{
-            f"r_pillar_short_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"],
-                            get_pillar_pulse(SPRITE_LENGTH, 2, -1) * R_PILLAR * 2)
-        },
-        **{
-            f"r_pillar_medium_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"],
-                            get_pillar_pulse(SPRITE_LENGTH, 3, -1) * R_PILLAR * 2)
         },
-        **{
-            f"r_pillar_long_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"],
-                            get_pillar_pulse(SPRITE_LENGTH, 4, -1) * R_PILLAR * 2)
-        },
-        **{
-            f"game_over_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_word_pulse(SPRITE_LENGTH, [g(), a(), m(), e1(), space(), o(), v(), e2(), r()]) * FIELD_SIZE * 0.1)
+        'waveforms': {
+            **{
+                f"bird_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"],
+                                get_bird_pulse(SPRITE_LENGTH) * FIELD_SIZE * 0.1)
+            },
+            **{
+                f"pillar_short_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"],
+                                get_pillar_pulse(SPRITE_LENGTH, 2) * R_PILLAR * 2)
+            },
+            **{
+                f"pillar_medium_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"],
+                                get_pillar_pulse(SPRITE_LENGTH, 3) * R_PILLAR * 2)
+            },
+            **{
+                f"pillar_long_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"],
+                                get_pillar_pulse(SPRITE_LENGTH, 4) * R_PILLAR * 2)
+            },
+            **{
+                f"border_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"],
+                                get_border_pulse(SPRITE_LENGTH) * FIELD_SIZE)
+            },
+            **{
+                f"r_pillar_short_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"],
+                                get_pillar_pulse(SPRITE_LENGTH, 2, -1) * R_PILLAR * 2)
+            },
+            **{
+                f"r_pillar_medium_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"],
+                                get_pillar_pulse(SPRITE_LENGTH, 3, -1) * R_PILLAR * 2)
+            },
+            **{
+                f"r_pillar_long_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"],
+                                get_pillar_pulse(SPRITE_LENGTH, 4, -1) * R_PILLAR * 2)
+            },
+            **{
+                f"game_over_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_word_pulse(SPRITE_LENGTH, [g(), a(), m(), e1(), space(), o(), v(), e2(), r()]) * FIELD_SIZE * 0.1)
+            },
+            'marker_wf': {"type": "constant", "sample": 0.2},
+            'input_wf': {"type": "constant", "sample": INPUT_PROBE_VOLTAGE},
+            "blank_wf": {"type": "constant", "sample": 0.0},
         },
-        'marker_wf': {"type": "constant", "sample": 0.2},
-        'input_wf': {"type": "constant", "sample": INPUT_PROBE_VOLTAGE},
-        "blank_wf": {"type": "constant", "sample": 0.0},
-    },
-    'digital_waveforms': {
-        'draw_trigger': {'samples': [(1, 0)]}
-    },
-    "integration_weights": {
-        "cosine_weights": {
-            "cosine": [(1.0, USER_INPUT_PULSE_LENGTH)],
-            "sine": [(0.0, USER_INPUT_PULSE_LENGTH)],
+        'digital_waveforms': {
+            'draw_trigger': {'samples': [(1, 0)]}
         },
-        "sine_weights": {
-            "cosine": [(0.0, USER_INPUT_PULSE_LENGTH)],
-            "sine": [(1.0, USER_INPUT_PULSE_LENGTH)],
+        "integration_weights": {
+            "cosine_weights": {
+                "cosine": [(1.0, USER_INPUT_PULSE_LENGTH)],
+                "sine": [(0.0, USER_INPUT_PULSE_LENGTH)],
+            },
+            "sine_weights": {
+                "cosine": [(0.0, USER_INPUT_PULSE_LENGTH)],
+                "sine": [(1.0, USER_INPUT_PULSE_LENGTH)],
+            },
+            "short_cosine_weights": {
+                "cosine": [(1.0, INPUT_WINDOW_LENGTH)],
+                "sine": [(0.0, INPUT_WINDOW_LENGTH)],
+            },
         },
-    },
-}
+    }
+
+
+configuration = build_configuration()
 
 # =============================================================================
 # QUA Machine Setup
 # =============================================================================
 qop_ip = '172.16.33.107'
-qmm = QuantumMachinesManager(host=qop_ip, port=9510)
-qm = qmm.open_qm(configuration)
+qm = LazyQM(configuration, host=qop_ip, port=9510)
 
 # =============================================================================
 # Graphics and Utility Functions
@@ -318,167 +349,204 @@ def clip_angle(a):
 def clip_velocity(v):
     return clip(v, MAX_SPEED, -MAX_SPEED)
 
+def declare_controller():
+    # the tables and variables used by get_controller_input
+    if SHORT_INPUT_READ:
+        READER.declare()
+    else:
+        DECODER.declare()
+    if DRIFT_TRACKING:
+        TRACKER.declare()
+
 def get_controller_input(I, act):
     for d in range(6):
         assign(act[d], 0)
     align()
     reset_if_phase("user_input_element")
-    measure("measure_user_input", "user_input_element",None, demod.full("cos", I, "out2"))
-    align()
-    with if_((I > -3.2) & (I < -3.0)): # A
-        assign(act[0], 1)
-    with elif_((I > -1.5) & (I < -1.2)): # B
-        assign(act[1], 1)
-    with elif_((I > -0.1) & (I < 0.1)): # Down
-        assign(act[2], 1)
-    with elif_((I > -0.5) & (I < -0.4)): # Up
-        assign(act[3], 1)
-    with elif_((I > 0.3) & (I < 0.37)): # Right
-        assign(act[4], 1)
-    with elif_((I > 0.2) & (I < 0.29)): # Left
-        assign(act[5], 1)
+    if SHORT_INPUT_READ:
+        READER.read(I, "measure_user_input_short", "user_input_element",
+                    offset=TRACKER.offset if DRIFT_TRACKING else None)
+        align()
+    else:
+        measure("measure_user_input", "user_input_element",None, demod.full("cos", I, "out2"))
+        align()
+        if DRIFT_TRACKING:
+            TRACKER.compensate(I)
+        DECODER.decode(I)
+    if DRIFT_TRACKING:
+        TRACKER.update(I)
+    # act[0..5]: A, B, Down, Up, Right, Left
+    DECODER.set_flags(act)
 
 # =============================================================================
 # Game Program
 # =============================================================================
 rng = np.random.default_rng(seed=1234)
 
-with program() as game_controller:
-    # Declare game variables
-    bird_a = declare(fixed, 0)
-    bird_x = declare(fixed, 0)
-    bird_y = declare(fixed, 0)
-    bird_vx = declare(fixed, 0)
-    bird_vy = declare(fixed, 0)
-
-    pillars_active = declare(bool, value=[True] * N_PILLARS)
-    pillars_y = declare(fixed, value=[random.uniform(-FIELD_SIZE, -FIELD_SIZE) for _ in range(N_PILLARS)])
-    pillars_x = declare(fixed, value=np.linspace(-FIELD_SIZE, FIELD_SIZE, num=N_PILLARS).tolist())
-    pillars_a = declare(fixed, value=np.linspace(-0.2, 0.2, num=N_PILLARS).tolist())
-
-    # Game state variables
-    bird_flap = declare(int, 0)
-    pillar_x = declare(fixed, FIELD_SIZE)
-    pillar_y = declare(fixed, -0.2)
-    pillar_gap = 0.1
-    score = declare(int, 0)
-    game_over = declare(bool, False)
-    offsety = declare(fixed,0)
-    I = declare(fixed)
-    I_stream = declare_stream()
-    act = declare(int, value = [0,0,0,0,0,0])
-    act_stream = declare_stream()
-
-    t = declare(fixed, 0)
-    t_prev = declare(fixed, 0)
-    t_last_pillar_spawn = declare(fixed, -8)
-    dt = declare(fixed, 0)
-    i = declare(int, 0)
-    j = declare(int, 0)
-    k = declare(int,0)
-
-    move = declare(int)
-    # act = declare(int)
-    ui_phi = declare(fixed, 0)
-    ui_forward = declare(fixed, 0)
-    ui_fire = declare(bool, False)
-
-    cont = declare(bool, True)
-    crashed = declare(bool, False)
-
-    if DEBUG:
-        a_stream = declare_stream()
-        b_stream = declare_stream()
-
-    # Main game loop
-    with while_(cont):
-        assign(dt, t - t_prev)
-        assign(t_prev, t)
-
-        # Process user inputs
-        assign(ui_phi, 0)
-        assign(ui_forward, 0)
-        assign(ui_fire, False)
-        assign(move, 0)
-        get_controller_input(I, act)
-        align()
-        with if_(act[0] == 1):
-            assign(bird_flap, 1)
-
-        # Update bird physics
-        assign(bird_vy, bird_vy - GRAVITY * dt)
-        assign(bird_y, bird_y + bird_vy * dt)
-        with if_(bird_flap == 1):
-            assign(bird_vy, -FLAP_FORCE)
-            assign(bird_flap, 0)
-
-        # Move pillars
-        for i in range (N_PILLARS):
-            with if_(Math.abs(pillars_x[i]) < FIELD_SIZE):
-                assign(pillars_x[i], pillars_x[i] - PILLAR_SPEED * dt)
+def build_game_controller():
+    """
+    The flappy bird game, controlled with the analog controller.
+    """
+    with program() as game_controller:
+        # Declare game variables
+        bird_a = declare(fixed, 0)
+        bird_x = declare(fixed, 0)
+        bird_y = declare(fixed, 0)
+        bird_vx = declare(fixed, 0)
+        bird_vy = declare(fixed, 0)
+
+        pillars_active = declare(bool, value=[True] * N_PILLARS)
+        pillars_y = declare(fixed, value=[random.uniform(-FIELD_SIZE, -FIELD_SIZE) for _ in range(N_PILLARS)])
+        pillars_x = declare(fixed, value=np.linspace(-FIELD_SIZE, FIELD_SIZE, num=N_PILLARS).tolist())
+        pillars_a = declare(fixed, value=np.linspace(-0.2, 0.2, num=N_PILLARS).tolist())
+
+        # Game state variables
+        bird_flap = declare(int, 0)
+        pillar_x = declare(fixed, FIELD_SIZE)
+        pillar_y = declare(fixed, -0.2)
+        pillar_gap = 0.1
+        score = declare(int, 0)
+        game_over = declare(bool, False)
+        offsety = declare(fixed,0)
+        I = declare(fixed)
+        declare_controller()
+        I_stream = declare_stream()
+        act = declare(int, value = [0,0,0,0,0,0])
+        act_stream = declare_stream()
+
+        t = declare(fixed, 0)
+        t_prev = declare(fixed, 0)
+        t_last_pillar_spawn = declare(fixed, -8)
+        dt = declare(fixed, 0)
+        i = declare(int, 0)
+        j = declare(int, 0)
+        k = declare(int,0)
+
+        move = declare(int)
+        # act = declare(int)
+        INPUTS.declare()
+        ui_phi = declare(fixed, 0)
+        ui_forward = declare(fixed, 0)
+        ui_fire = declare(bool, False)
+
+        cont = declare(bool, True)
+        crashed = declare(bool, False)
+
+        if DEBUG:
+            a_stream = declare_stream()
+            b_stream = declare_stream()
+
+        # Main game loop
+        with while_(cont):
+            assign(dt, t - t_prev)
+            assign(t_prev, t)
+
+            # Process user inputs
+            assign(ui_phi, 0)
+            assign(ui_forward, 0)
+            assign(ui_fire, False)
+            assign(move, 0)
+            get_controller_input(I, act)
+            align()
+            INPUTS.from_flags(act)
+            INPUTS.update()
+            # flap once per press of A
+            with if_(INPUTS.pressed[0]):
+                assign(bird_flap, 1)
+
+            # Update bird physics
+            assign(bird_vy, bird_vy - GRAVITY * dt)
+            assign(bird_y, bird_y + bird_vy * dt)
+            with if_(bird_flap == 1):
+                assign(bird_vy, -FLAP_FORCE)
+                assign(bird_flap, 0)
+
+            # Move pillars
+            for i in range (N_PILLARS):
+                with if_(Math.abs(pillars_x[i]) < FIELD_SIZE):
+                    assign(pillars_x[i], pillars_x[i] - PILLAR_SPEED * dt)
+                with else_():
+                    # Pillar went off left edge, respawn it on the right
+                    # e.g., place it slightly beyond +FIELD_SIZE so it moves in
+                    assign(pillars_x[i], FIELD_SIZE-0.0001)
+                    assign(pillars_y[i], -FIELD_SIZE + Random().rand_fixed() *0.1)
+
+            # Check collisions between bird and pillars
+            with for_(j, 0, j < N_PILLARS, j + 1):
+                with if_(pillars_active[j]):
+                    with if_(((bird_y < (pillars_y[j] + 5*R_PILLAR)) | (bird_y > (- pillars_y[j] - 5*R_PILLAR)))):
+                        with if_((bird_x-pillars_x[j] <  3*R_PILLAR)):
+                            assign(crashed, True)
+
+
+            # Draw graphics
+            play("marker_pulse", "draw_marker_element")
+
+            with if_(crashed):
+                draw_game_over(-0.15,0)
             with else_():
-                # Pillar went off left edge, respawn it on the right
-                # e.g., place it slightly beyond +FIELD_SIZE so it moves in
-                assign(pillars_x[i], FIELD_SIZE-0.0001)  
-                assign(pillars_y[i], -FIELD_SIZE + Random().rand_fixed() *0.1)
-
-        # Check collisions between bird and pillars
-        with for_(j, 0, j < N_PILLARS, j + 1):
-            with if_(pillars_active[j]):
-                with if_(((bird_y < (pillars_y[j] + 5*R_PILLAR)) | (bird_y > (- pillars_y[j] - 5*R_PILLAR)))):
-                    with if_((bird_x-pillars_x[j] <  3*R_PILLAR)):
-                        assign(crashed, True)
+                play("blank", "screen")
+                # draw_border()
+                for i in range(N_PILLARS):
+                    # Only draw pillars that are within the visible field.
+                    with if_(pillars_x[i] < FIELD_SIZE):
+                        length = 3
+                        draw_pillar(pillars_x[i], pillars_y[i], length)
+                        draw_reverse_pillar(pillars_x[i], -(pillars_y[i] * 1.5), length)
+
+                # Draw the bird last so it appears on top of everything
+                draw_bird(bird_x, bird_y, bird_a)
+            align()
+            wait(int(WAIT_TIME))
+            assign(t, t + TIME_STEP_SIZE)
+
+        if DEBUG:
+            with stream_processing():
+                a_stream.save_all('move')
+                b_stream.save_all('act')
+    return game_controller
+
+
+game_controller = cached_program(build_game_controller, configuration, files=[DECODER.path])
+
+def build_controller_debug():
+    """
+    Measures the controller in a loop and streams the measured level, the
+    decoded buttons and the drift offset.
+    """
+    with program() as controller_debug:
+        I = declare(fixed)
+        I_stream = declare_stream()
+        act = declare(int, value = [0,0,0,0,0,0])
+        act_stream = declare_stream()
+        offset_stream = declare_stream()
+        length_s = declare_stream()
+        lens = declare(int,0)
+        n=declare(int,0)
+        declare_controller()
+        with infinite_loop_():
+            with for_(n,0,n<6,n+1):
+                assign(act[n], 0)
+            reset_if_phase("user_input_element")
+            play("marker_pulse", "draw_marker_element")
+            measure("measure_user_input", "user_input_element",None, demod.full("cos", I, "out2"))
+            align()
+            get_controller_input(I, act)
+            align()
+            with for_(n,0,n<6,n+1):
+                save(act[n], act_stream)
+            save(I,I_stream)
+            if DRIFT_TRACKING:
+                save(TRACKER.offset, offset_stream)
+        with stream_processing():
+            I_stream.save_all('I')
+            act_stream.buffer(6).save('act')
+            if DRIFT_TRACKING:
+                offset_stream.save_all('offset')
+    return controller_debug
 
 
-        # Draw graphics
-        play("marker_pulse", "draw_marker_element")
-        
-        with if_(crashed):
-            draw_game_over(-0.15,0)
-        with else_():
-            play("blank", "screen")
-            # draw_border()
-            for i in range(N_PILLARS):
-                # Only draw pillars that are within the visible field.
-                with if_(pillars_x[i] < FIELD_SIZE):
-                    length = 3
-                    draw_pillar(pillars_x[i], pillars_y[i], length)
-                    draw_reverse_pillar(pillars_x[i], -(pillars_y[i] * 1.5), length)
-
-            # Draw the bird last so it appears on top of everything
-            draw_bird(bird_x, bird_y, bird_a)
-        align()
-        wait(int(WAIT_TIME))   
-        assign(t, t + TIME_STEP_SIZE)
-
-    if DEBUG:
-        with stream_processing():
-            a_stream.save_all('move')
-            b_stream.save_all('act')
-
-with program() as controller_debug:
-    I = declare(fixed)
-    I_stream = declare_stream()
-    act = declare(int, value = [0,0,0,0,0,0])
-    act_stream = declare_stream()
-    length_s = declare_stream()
-    lens = declare(int,0)
-    n=declare(int,0)
-    with infinite_loop_():
-        with for_(n,0,n<6,n+1):
-            assign(act[n], 0)
-        reset_if_phase("user_input_element")
-        play("marker_pulse", "draw_marker_element")
-        measure("measure_user_input", "user_input_element",None, demod.full("cos", I, "out2"))
-        align()
-        get_controller_input(I, act)
-        align()
-        with for_(n,0,n<6,n+1):
-            save(act[n], act_stream)
-        save(I,I_stream)
-    with stream_processing():
-        I_stream.save('I')
-        act_stream.buffer(6).save('act')
+controller_debug = cached_program(build_controller_debug, configuration, files=[DECODER.path])
 
 # =============================================================================
 # IO and Main Execution
@@ -496,11 +564,9 @@ if __name__ == '__main__':
         job = qm.execute(controller_debug)
         res = job.result_handles
         print("test_controller")
-        res.act.wait_for_values(1)
-        while res.is_processing():
-            print(res.act.fetch_all())
-            print(res.I.fetch_all())
-            time.sleep(1)
+        res.I.wait_for_values(1)
+        # watch the measured controller levels live
+        LivePlotter(res, ['I', 'offset'] if DRIFT_TRACKING else ['I']).run()
 
         # controller keys -> measured I:
         # Nothing: 0.45 - 0.52
@@ -1,6 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import pytest
 
 def resample_trace(x, y, points):
     """
@@ -20,20 +18,6 @@ def calc_distances(x, y):
     y = np.asarray(y)
     return np.sqrt(np.square(np.diff(x)) + np.square(np.diff(y)))
 
-@pytest.mark.parametrize("x, y, exp", [
-    ([0, 0], [0, 0], 0),
-    ([0, 0], [1, 1], 0),
-    ([0, 1], [0, 0], 1),
-    ([0, 0], [1, 0], 1),
-    ([0, 0], [0, 1], 1),
-    ([0, 1], [0, 1], np.sqrt(2)),
-    ([1, 0], [1, 0], np.sqrt(2)),
-])
-def test_distances(x, y, exp):
-    res = calc_distances(x, y)
-    assert res.shape == (1,)
-    assert res[0] == pytest.approx(exp)
-
 def sample_with_speed(x, y, speed):
     """
     Sample the trace with a given speed (in sample/volt).
@@ -302,6 +286,8 @@ def get_word_pulse(points, letters):
     return resample_trace(x, y, points)
 
 def draw_example(pulse):
+    import matplotlib.pyplot as plt
+
     plt.plot(pulse[0], pulse[1])
     plt.show()
 
@@ -0,0 +1,148 @@
+from qm.qua import *
+import itertools
+import os
+from OPXBOX_LIB.config_size import config_size
+from OPXBOX_LIB.connection import LazyQM
+from OPXBOX_LIB.program_cache import cached_program
+from OPXBOX_LIB.video import load_frames, synthetic_clip, video_drawings
+
+################################################################################
+# 1. FRAMES
+################################################################################
+
+# Frames written by `python -m OPXBOX_LIB.video clip.mp4 picture/animation`
+ANIMATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'animation')
+FRAME_LENGTH = 4000    # samples per frame of the synthetic clip
+SYNTHETIC_FRAMES = 30  # frames of the synthetic clip
+REPEATS = 20           # times each frame is drawn before the next one
+# every frame is a pulse of the configuration and is unrolled in the program,
+# so only the start of a long clip is played
+MAX_FRAMES = 60
+SAMPLE_BUDGET = 300000  # waveform samples of all frames, about the ones of flappy
+
+
+def load_animation(max_frames=MAX_FRAMES):
+    """
+    The drawings of the first `max_frames` frames of the converted clip, or of
+    a synthetic clip if there is none.
+    """
+    frames = []
+    if os.path.isdir(ANIMATION_DIR):
+        frames = list(itertools.islice(load_frames(ANIMATION_DIR), max_frames))
+    if not frames:
+        frames = list(video_drawings(synthetic_clip(min(SYNTHETIC_FRAMES, max_frames)), FRAME_LENGTH))
+    for k, (trace, _) in enumerate(frames):
+        if trace.shape[1] % 4:
+            raise ValueError(f"Frame {k} has {trace.shape[1]} samples, the OPX needs a multiple of 4. "
+                             f"Convert the clip again with --samples a multiple of 4.")
+    return frames
+
+################################################################################
+# 2. BUILD QUA CONFIGURATION
+################################################################################
+
+def build_configuration():
+    """
+    The QUA configuration with one pulse (and blanking marker) per frame.
+    """
+    frames = load_animation()
+    configuration = {
+        'version': 1,
+        'controllers': {
+            'con1': {
+                "type": "opx1000",
+                "fems": {
+                    5: {
+                        "type": "LF",
+                        "analog_outputs": {i: {"offset": 0.0} for i in range(1, 9)},
+                        "digital_outputs": {i: {} for i in range(1, 8)},
+                    },
+                },
+            },
+        },
+        "elements": {
+            "screen": {
+                "mixInputs": {
+                    "I": ("con1", 5, 5),
+                    "Q": ("con1", 5, 6),
+                },
+                "intermediate_frequency": 0,
+                # blanks the beam while it jumps between the outlines
+                "digitalInputs": {
+                    "draw_marker": {
+                        "port": ("con1", 5, 1),
+                        "delay": 0,
+                        "buffer": 0,
+                    },
+                },
+                "operations": {f"frame_{k}": f"frame_{k}_pulse" for k in range(len(frames))},
+            },
+            'draw_marker_element': {
+                'singleInput': {
+                    'port': ('con1', 5, 1),
+                },
+                'intermediate_frequency': 0,
+                'operations': {
+                    "marker_pulse": "marker_pulse",
+                },
+            },
+        },
+        "pulses": {
+            **{f"frame_{k}_pulse": {
+                "operation": "control",
+                "length": trace.shape[1],
+                "waveforms": {"I": f"frame_{k}_x_wf", "Q": f"frame_{k}_y_wf"},
+                "digital_marker": f"frame_{k}_marker",
+            } for k, (trace, _) in enumerate(frames)},
+            "marker_pulse": {
+                "operation": "control",
+                # the same as in the other games, so the launcher can merge the configurations
+                'length': 16500,
+                'waveforms': {"single": "marker_wf"},
+            },
+        },
+        "waveforms": {
+            **{f"frame_{k}_{a}_wf": {"type": "arbitrary", "samples": trace[i].tolist()}
+               for k, (trace, _) in enumerate(frames) for i, a in enumerate(["x", "y"])},
+            'marker_wf': {"type": "constant", "sample": 0.2},
+        },
+        "digital_waveforms": {
+            f"frame_{k}_marker": {"samples": marker} for k, (_, marker) in enumerate(frames)
+        },
+    }
+    samples = config_size(configuration).samples
+    if samples > SAMPLE_BUDGET:
+        raise ValueError(f"The {len(frames)} frames take {samples} waveform samples, more than SAMPLE_BUDGET = "
+                         f"{SAMPLE_BUDGET}. Use fewer frames or fewer samples per frame.")
+    return configuration
+
+
+configuration = build_configuration()
+N_FRAMES = len(configuration["elements"]["screen"]["operations"])
+
+################################################################################
+# 3. QUA PROGRAM THAT CYCLES THE FRAMES
+################################################################################
+
+qm = LazyQM(configuration, host="172.16.33.107", port=9510)
+
+
+def build_player():
+    """
+    Draws every frame REPEATS times, then the next one, in a loop.
+    """
+    with program() as player:
+        r = declare(int)
+        with infinite_loop_():
+            play("marker_pulse", "draw_marker_element")
+            for k in range(N_FRAMES):
+                with for_(r, 0, r < REPEATS, r + 1):
+                    play(f"frame_{k}", "screen")
+    return player
+
+
+player = cached_program(build_player, configuration)
+
+if __name__ == '__main__':
+    job = qm.execute(player)
+    print(f"Playing {N_FRAMES} frames...")
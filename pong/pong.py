@@ -1,10 +1,8 @@
-import matplotlib.pyplot as plt
-from pynput import keyboard
-
-from qm import QuantumMachinesManager
 from qm.qua import *
 
 from sprites import *
+from OPXBOX_LIB.connection import LazyQM
+from OPXBOX_LIB.program_cache import cached_program
 
 # %%
 
@@ -69,140 +67,143 @@ input_probe_voltage = .5  # V
 
 # %%
 
-configuration = {
-    'version': 1,
-    'controllers': {
-        'con1': {
-            'type': 'opx1',
-            'analog_outputs': {
-                1: {'offset': +0.0},
-                2: {'offset': +0.0},
-                3: {'offset': +0.0},
-                4: {'offset': +0.0},
-            },
-            'digital_outputs': {
-                1: {},
-            },
-            'analog_inputs': {
-                1: {'offset': -0.0},
-                2: {'offset': -0.0},
+def build_configuration():
+    """
+    The QUA configuration of the game, with all sprite waveforms.
+    """
+    return {
+        'version': 1,
+        'controllers': {
+            'con1': {
+                'type': 'opx1',
+                'analog_outputs': {
+                    1: {'offset': +0.0},
+                    2: {'offset': +0.0},
+                    3: {'offset': +0.0},
+                    4: {'offset': +0.0},
+                },
+                'digital_outputs': {
+                    1: {},
+                },
+                'analog_inputs': {
+                    1: {'offset': -0.0},
+                    2: {'offset': -0.0},
+                }
             }
-        }
-    },
-    'elements': {
-        'screen': {
-            'mixInputs': {
-                'I': ('con1', 1),
-                'Q': ('con1', 3),
+        },
+        'elements': {
+            'screen': {
+                'mixInputs': {
+                    'I': ('con1', 1),
+                    'Q': ('con1', 3),
+                },
+                'intermediate_frequency': intermediate_frequency,
+                'digitalInputs': {
+                    'draw_marker': {
+                        'port': ('con1', 1),
+                        'delay': 0,
+                        'buffer': 0,
+                    },
+                },
+                'operations': {
+                    "player": "player",
+                    "ray": "ray",
+                    "border": "border",
+                    "game_over": "game_over",
+                },
             },
-            'intermediate_frequency': intermediate_frequency,
-            'digitalInputs': {
-                'draw_marker': {
-                    'port': ('con1', 1),
-                    'delay': 0,
-                    'buffer': 0,
+            'draw_marker_element': {
+                'singleInput': {
+                    'port': ('con1', 3),
+                },
+                'intermediate_frequency': intermediate_frequency,
+                'operations': {
+                    "marker_pulse": "marker_pulse",
                 },
             },
-            'operations': {
-                "player": "player",
-                "ray": "ray",
-                "border": "border",
-                "game_over": "game_over",
+            'user_input_element': {
+                'singleInput': {
+                    'port': ('con1', 4),
+                },
+                'outputs': {
+                    'a': ('con1', 1),
+                    'b': ('con1', 2),
+                },
+                'intermediate_frequency': intermediate_frequency,
+                'operations': {
+                    "measure_user_input": "measure_user_input",
+                },
+                'time_of_flight': 100,
+                'smearing': 0
             },
         },
-        'draw_marker_element': {
-            'singleInput': {
-                'port': ('con1', 3),
-            },
-            'intermediate_frequency': intermediate_frequency,
-            'operations': {
-                "marker_pulse": "marker_pulse",
+        'pulses': {
+            **{n: {
+                'operation': 'control',
+                'length': sprite_length,
+                'waveforms': {k: f"{n}_{l}" for k, l in zip(["I", "Q"], ["x", "y"])},
+            }
+                for n in ["player", "ray", "border", "game_over"]},
+            "measure_user_input": {
+                "operation": "measurement",
+                'length': user_input_pulse_length,
+                "integration_weights": {
+                    "constant": "cosine_weights",
+                },
+                'waveforms': {"single": "input_wf"},
             },
+            "marker_pulse": {
+                "operation": "control",
+                'length': sprite_length,
+                'waveforms': {"single": "marker_wf"},
+            }
         },
-        'user_input_element': {
-            'singleInput': {
-                'port': ('con1', 4),
+        'waveforms': {
+            **{
+                f"player_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_pong_player_pulse(sprite_length) * field_size * 0.15)
             },
-            'outputs': {
-                'a': ('con1', 1),
-                'b': ('con1', 2),
+            **{
+                f"ray_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_ray_pulse(sprite_length) * field_size * 0.005)
             },
-            'intermediate_frequency': intermediate_frequency,
-            'operations': {
-                "measure_user_input": "measure_user_input",
+            **{
+                f"border_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_border_pulse(sprite_length) * field_size)
             },
-            'time_of_flight': 100,
-            'smearing': 0
-        },
-    },
-    'pulses': {
-        **{n: {
-            'operation': 'control',
-            'length': sprite_length,
-            'waveforms': {k: f"{n}_{l}" for k, l in zip(["I", "Q"], ["x", "y"])},
-        }
-            for n in ["player", "ray", "border", "game_over"]},
-        "measure_user_input": {
-            "operation": "measurement",
-            'length': user_input_pulse_length,
-            "integration_weights": {
-                "constant": "cosine_weights",
+            **{
+                f"game_over_{a}": {'type': 'arbitrary', 'samples': v}
+                for a, v in zip(["x", "y"], get_word_pulse(100, [g(), a(), m(), e1(), space(), o(), v(), e2(), r()]) * field_size * 0.1)
             },
-            'waveforms': {"single": "input_wf"},
-        },
-        "marker_pulse": {
-            "operation": "control",
-            'length': sprite_length,
-            'waveforms': {"single": "marker_wf"},
-        }
-    },
-    'waveforms': {
-        **{
-            f"player_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_pong_player_pulse(sprite_length) * field_size * 0.15)
-        },
-        **{
-            f"ray_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_ray_pulse(sprite_length) * field_size * 0.005)
-        },
-        **{
-            f"border_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_border_pulse(sprite_length) * field_size)
-        },
-        **{
-            f"game_over_{a}": {'type': 'arbitrary', 'samples': v}
-            for a, v in zip(["x", "y"], get_word_pulse(100, [g(), a(), m(), e1(), space(), o(), v(), e2(), r()]) * field_size * 0.1)
-        },
 
-        # 'marker_wf': {'type':'arbitrary', 'samples':[.1]*50+[0]*50},
-        'marker_wf': {"type": "constant", "sample": 0.2},
-        'input_wf': {"type": "constant", "sample": input_probe_voltage},
-    },
-    'digital_waveforms': {
-        'draw_trigger': {
-            'samples': [(1, 0)]
-        }
-    },
-    "integration_weights": {
-        "cosine_weights": {
-            "cosine": [(1.0, user_input_pulse_length)],
-            "sine": [(0.0, user_input_pulse_length)],
+            # 'marker_wf': {'type':'arbitrary', 'samples':[.1]*50+[0]*50},
+            'marker_wf': {"type": "constant", "sample": 0.2},
+            'input_wf': {"type": "constant", "sample": input_probe_voltage},
+        },
+        'digital_waveforms': {
+            'draw_trigger': {
+                'samples': [(1, 0)]
+            }
         },
-        "sine_weights": {
-            "cosine": [(0.0, user_input_pulse_length)],
-            "sine": [(1.0, user_input_pulse_length)],
+        "integration_weights": {
+            "cosine_weights": {
+                "cosine": [(1.0, user_input_pulse_length)],
+                "sine": [(0.0, user_input_pulse_length)],
+            },
+            "sine_weights": {
+                "cosine": [(0.0, user_input_pulse_length)],
+                "sine": [(1.0, user_input_pulse_length)],
+            },
         },
-    },
-}
+    }
 
-# %%
 
-qop_ip = '192.168.116.171'
-qmm = QuantumMachinesManager(host=qop_ip, port = 80)
+configuration = build_configuration()
 
 # %%
 
-qm = qmm.open_qm(configuration)
+qop_ip = '192.168.116.171'
+qm = LazyQM(configuration, host=qop_ip, port=80)
 
 
 # %%
@@ -312,7 +313,7 @@ def clip_velocity(v):
     return clip(v, max_speed, -max_speed)
 
 
-def get_inputs(p1, p2):
+def get_inputs(p1, p2, a_stream=None, b_stream=None):
     """
     The inputs
     IO1
@@ -339,165 +340,174 @@ def get_inputs(p1, p2):
 rng = np.random.default_rng(seed=1234)
 # %%
 
-with program() as game:
-    draw_ball_b = declare(bool, True)
-    rays_active = declare(bool, value=[False] + [False] * (N_rays - 1))
-    rays_age = declare(fixed, value=[max_ray_age] + [0] * (N_rays - 1))
-    rays_x = declare(fixed, value=[0] * N_rays)
-    rays_y = declare(fixed, value=[0] * N_rays)
-    rays_a = declare(fixed, value=[0] * N_rays)
-    v_ray_x = declare(fixed, 0.2)
-    v_ray_y = declare(fixed, 0.2)
-
-    asteroids_active = declare(bool, value=[True] * N_asteroids)
-    asteroids_x = declare(fixed, value=rng.uniform(-field_size, field_size, N_asteroids))
-    asteroids_y = declare(fixed, value=rng.uniform(-field_size, field_size, N_asteroids))
-    asteroids_a = declare(fixed, value=rng.uniform(-.5, .5, N_asteroids))
-    ball_x = declare(fixed, 0)
-    ball_y = declare(fixed, 0)
-    ball_a = declare(fixed, 0)
-
-    # spawn the ball
-    assign(ball_x, 0)
-    assign(ball_y, 0)
-    assign(ball_a, 0)
-
-    t = declare(fixed, 0)
-    t_prim = declare(fixed, 0)
-    t_last_ray_spawn = declare(fixed, -1.1)
-    dt = declare(fixed, 0)
-    i = declare(int, 0)
-    j = declare(int, 0)
-
-    p1 = declare(int)
-    p2 = declare(int)
-    p1_up = declare(fixed, 0)
-    p2_up = declare(fixed, 0)
-    p1_down = declare(fixed, 0)
-    p2_down = declare(fixed, 0)
-    p1_x = declare(fixed, -field_size*0.5)
-    p1_vx = declare(fixed, 0)
-    p2_x = declare(fixed, field_size*0.5)
-    p2_vx = declare(fixed, 0)
-    p1_y = declare(fixed, 0)
-    p1_vy = declare(fixed, 0)
-    p2_y = declare(fixed, 0)
-    p2_vy = declare(fixed, 0)
-
-    cont = declare(bool, True)
-    crashed = declare(bool,False)
-
-    if debug:
-        a_stream = declare_stream()
-        b_stream = declare_stream()
-
-    # Game loop
-    # with while_(t < 500*time_step_size):
-    with while_(cont):
-        assign(dt, t - t_prim)
-        assign(t_prim, t)
-
-        # process user inputs
-        assign(p1, 0)  # The user input
-        assign(p2, 0)  # The user input
-        assign(p1_up, 0)
-        assign(p2_up, 0)
-        assign(p2_down, 0)
-        assign(p1_down, 0)
-
-
-        '''
-        The inputs
-        w - forward
-        a - left
-        d - right
-        
-        space - fire
-        escape - end game
-        '''
-
-        get_inputs(p1, p2)
-        with if_(p1 == 1):
-            assign(p1_up, 1)
-        with elif_(p1 == 2):
-            assign(p1_down, -1)
-
-        with if_(p2 == 3):
-            assign(p2_up, 1)
-        with elif_(p2 == 4):
-            assign(p2_down, -1)
-
-        # # update the velocity and position of the players
-        assign(p1_y, p1_y + p1_vy * dt)
-        assign(p2_y, p2_y + p2_vy * dt)
-        assign(p1_vy, p1_vy + (p1_up+p1_down) * player_acceleration * dt)
-        assign(p2_vy, p2_vy + (p2_up+p2_down) * player_acceleration * dt)
-        clip_velocity(p1_vy)
-        clip_velocity(p2_vy)
-
-        # move the ball
-
-        assign(ball_x, ball_x + v_ray_x * dt)
-        assign(ball_y, ball_y + v_ray_y * dt)
-
-        # process hits
-        with if_((get_distance(ball_x, ball_y, p1_x, p1_y) < R_asteroid)):
-            with if_(v_ray_y + p1_vy < 0.25):
-                assign(v_ray_y, -1 * (v_ray_y + p1_vy))
-                assign(v_ray_x, -1 * (v_ray_x))
-            with else_():
-                assign(v_ray_y, -1 * (0.25))
-                assign(v_ray_x, -1 * (v_ray_x))
-        with if_((get_distance(ball_x, ball_y, p2_x, p2_y) < R_asteroid)):
-            with if_(v_ray_y + p1_vy < 0.25):
-                assign(v_ray_y, -1 * (v_ray_y + p2_vy))
-                assign(v_ray_x, -1 * (v_ray_x))
+def build_game():
+    """
+    The pong game for two players.
+    """
+    with program() as game:
+        draw_ball_b = declare(bool, True)
+        rays_active = declare(bool, value=[False] + [False] * (N_rays - 1))
+        rays_age = declare(fixed, value=[max_ray_age] + [0] * (N_rays - 1))
+        rays_x = declare(fixed, value=[0] * N_rays)
+        rays_y = declare(fixed, value=[0] * N_rays)
+        rays_a = declare(fixed, value=[0] * N_rays)
+        v_ray_x = declare(fixed, 0.2)
+        v_ray_y = declare(fixed, 0.2)
+
+        asteroids_active = declare(bool, value=[True] * N_asteroids)
+        asteroids_x = declare(fixed, value=rng.uniform(-field_size, field_size, N_asteroids))
+        asteroids_y = declare(fixed, value=rng.uniform(-field_size, field_size, N_asteroids))
+        asteroids_a = declare(fixed, value=rng.uniform(-.5, .5, N_asteroids))
+        ball_x = declare(fixed, 0)
+        ball_y = declare(fixed, 0)
+        ball_a = declare(fixed, 0)
+
+        # spawn the ball
+        assign(ball_x, 0)
+        assign(ball_y, 0)
+        assign(ball_a, 0)
+
+        t = declare(fixed, 0)
+        t_prim = declare(fixed, 0)
+        t_last_ray_spawn = declare(fixed, -1.1)
+        dt = declare(fixed, 0)
+        i = declare(int, 0)
+        j = declare(int, 0)
+
+        p1 = declare(int)
+        p2 = declare(int)
+        p1_up = declare(fixed, 0)
+        p2_up = declare(fixed, 0)
+        p1_down = declare(fixed, 0)
+        p2_down = declare(fixed, 0)
+        p1_x = declare(fixed, -field_size*0.5)
+        p1_vx = declare(fixed, 0)
+        p2_x = declare(fixed, field_size*0.5)
+        p2_vx = declare(fixed, 0)
+        p1_y = declare(fixed, 0)
+        p1_vy = declare(fixed, 0)
+        p2_y = declare(fixed, 0)
+        p2_vy = declare(fixed, 0)
+
+        cont = declare(bool, True)
+        crashed = declare(bool,False)
+
+        a_stream, b_stream = None, None
+        if debug:
+            a_stream = declare_stream()
+            b_stream = declare_stream()
+
+        # Game loop
+        # with while_(t < 500*time_step_size):
+        with while_(cont):
+            assign(dt, t - t_prim)
+            assign(t_prim, t)
+
+            # process user inputs
+            assign(p1, 0)  # The user input
+            assign(p2, 0)  # The user input
+            assign(p1_up, 0)
+            assign(p2_up, 0)
+            assign(p2_down, 0)
+            assign(p1_down, 0)
+
+
+            '''
+            The inputs
+            w - forward
+            a - left
+            d - right
+
+            space - fire
+            escape - end game
+            '''
+
+            get_inputs(p1, p2, a_stream, b_stream)
+            with if_(p1 == 1):
+                assign(p1_up, 1)
+            with elif_(p1 == 2):
+                assign(p1_down, -1)
+
+            with if_(p2 == 3):
+                assign(p2_up, 1)
+            with elif_(p2 == 4):
+                assign(p2_down, -1)
+
+            # # update the velocity and position of the players
+            assign(p1_y, p1_y + p1_vy * dt)
+            assign(p2_y, p2_y + p2_vy * dt)
+            assign(p1_vy, p1_vy + (p1_up+p1_down) * player_acceleration * dt)
+            assign(p2_vy, p2_vy + (p2_up+p2_down) * player_acceleration * dt)
+            clip_velocity(p1_vy)
+            clip_velocity(p2_vy)
+
+            # move the ball
+
+            assign(ball_x, ball_x + v_ray_x * dt)
+            assign(ball_y, ball_y + v_ray_y * dt)
+
+            # process hits
+            with if_((get_distance(ball_x, ball_y, p1_x, p1_y) < R_asteroid)):
+                with if_(v_ray_y + p1_vy < 0.25):
+                    assign(v_ray_y, -1 * (v_ray_y + p1_vy))
+                    assign(v_ray_x, -1 * (v_ray_x))
+                with else_():
+                    assign(v_ray_y, -1 * (0.25))
+                    assign(v_ray_x, -1 * (v_ray_x))
+            with if_((get_distance(ball_x, ball_y, p2_x, p2_y) < R_asteroid)):
+                with if_(v_ray_y + p1_vy < 0.25):
+                    assign(v_ray_y, -1 * (v_ray_y + p2_vy))
+                    assign(v_ray_x, -1 * (v_ray_x))
+                with else_():
+                    assign(v_ray_y, -1 * (0.25))
+                    assign(v_ray_x, -1 * (v_ray_x))
+            with if_(ball_x > field_size*0.7):
+                assign(draw_ball_b, False)
+            with elif_(ball_x < -field_size*0.7):
+                assign(draw_ball_b, False)
+            with if_(ball_y > field_size*0.7):
+                assign(v_ray_y, -1 * (v_ray_y))
+            with elif_(ball_y < -field_size*0.7):
+                assign(v_ray_y, -1 * (v_ray_y))
+            with if_(p1_y > field_size*0.7):
+                assign(p1_y, field_size*0.7)
+            with elif_(p1_y < -field_size*0.7):
+                assign(p1_y, -field_size*0.7)
+            with if_(p2_y > field_size*0.7):
+                assign(p2_y, field_size*0.7)
+            with elif_(p2_y < -field_size*0.7):
+                assign(p2_y, -field_size*0.7)
+
+
+            # draw graphics
+            play("marker_pulse", "draw_marker_element")
+            with if_(draw_ball_b):
+                draw_player2(p2_x, p2_y, 0)
+                draw_ray(ball_x, ball_y, 0)
+                draw_player1(p1_x, p1_y, 0)
             with else_():
-                assign(v_ray_y, -1 * (0.25))
-                assign(v_ray_x, -1 * (v_ray_x))
-        with if_(ball_x > field_size*0.7):
-            assign(draw_ball_b, False)
-        with elif_(ball_x < -field_size*0.7):
-            assign(draw_ball_b, False)
-        with if_(ball_y > field_size*0.7):
-            assign(v_ray_y, -1 * (v_ray_y))
-        with elif_(ball_y < -field_size*0.7):
-            assign(v_ray_y, -1 * (v_ray_y))
-        with if_(p1_y > field_size*0.7):
-            assign(p1_y, field_size*0.7)
-        with elif_(p1_y < -field_size*0.7):
-            assign(p1_y, -field_size*0.7)
-        with if_(p2_y > field_size*0.7):
-            assign(p2_y, field_size*0.7)
-        with elif_(p2_y < -field_size*0.7):
-            assign(p2_y, -field_size*0.7)
-
-
-        # draw graphics
-        play("marker_pulse", "draw_marker_element")
-        with if_(draw_ball_b):
-            draw_player2(p2_x, p2_y, 0)
-            draw_ray(ball_x, ball_y, 0)
-            draw_player1(p1_x, p1_y, 0)
-        with else_():
-            draw_ray(0, 0, 0)
-            draw_game_over(-0.15,0)
-
-
-        draw_border()
-
-        # wait until everything is drawn
-        align()
-
-        wait(int(wait_time))
-
-        # update time
-        assign(t, t + time_step_size)
+                draw_ray(0, 0, 0)
+                draw_game_over(-0.15,0)
 
-    if debug:
-        with stream_processing():
-            a_stream.save_all('move')
-            b_stream.save_all('act')
+
+            draw_border()
+
+            # wait until everything is drawn
+            align()
+
+            wait(int(wait_time))
+
+            # update time
+            assign(t, t + time_step_size)
+
+        if debug:
+            with stream_processing():
+                a_stream.save_all('move')
+                b_stream.save_all('act')
+    return game
+
+
+game = cached_program(build_game, configuration)
 
 # %%
 
@@ -512,6 +522,8 @@ def send_over_io(io_num, value, set_value):
 
 
 if __name__ == '__main__':
+    from pynput import keyboard
+
     job = qm.execute(game)
     res = job.result_handles
 
@@ -546,6 +558,8 @@ if __name__ == '__main__':
                 pass
 
     if debug:
+        import matplotlib.pyplot as plt
+
         res.wait_for_all_values()
         move = res.move.fetch_all()
         act = res.act.fetch_all()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the games and OPXBOX_LIB are plain scripts/folders, make them importable
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
@@ -0,0 +1,99 @@
+"""
+Runs the classical part of a QUA program on the host, for the tests.
+
+The helpers of OPXBOX_LIB emit QUA and have a host-side `emulate`. Running
+the emitted statements here checks that both do the same. Only what the helpers
+use is supported: scalar and array variables, assign, if/elif/else, for/while,
+the binary operations and the cast functions. `measure` assigns the value of
+`measure(element, pulse)` to its demod target, IO1/IO2 read `io`, pulses and
+alignment are skipped.
+
+    run = QuaInterpreter(prog, measure=lambda element, pulse: 0.1)
+    run()               # runs the program, again for every further call
+    run[scanner.mask]   # the value of a QUA variable
+"""
+import operator
+
+OPERATIONS = {
+    'ADD': operator.add, 'SUB': operator.sub, 'MULT': operator.mul, 'DIV': operator.truediv,
+    'AND': operator.and_, 'OR': operator.or_, 'XOR': operator.xor,
+    'LT': operator.lt, 'LET': operator.le, 'GT': operator.gt, 'GET': operator.ge, 'EQ': operator.eq,
+    'SHL': operator.lshift, 'SHR': operator.rshift,
+}
+CASTS = {'to_int': int, 'to_bool': bool, 'to_fixed': float, 'mul_fixed_by_int': operator.mul,
+         'mul_int_by_fixed': lambda a, b: int(a * b)}
+TYPES = {0: int, 1: bool, 2: float}  # INT, BOOL, REAL
+
+
+def _literal(literal):
+    kind = TYPES[literal.type]
+    return literal.value == 'True' if kind is bool else kind(literal.value)
+
+
+class QuaInterpreter:
+    def __init__(self, program, measure=None, io=None):
+        self.script = program.qua_program.script
+        self.measure = measure
+        self.io = io or {1: 0, 2: 0}
+        self.values = {}
+        self.types = {}
+        for variable in self.script.variables:
+            kind = TYPES[variable.type]
+            self.types[variable.name] = kind
+            values = [_literal(v) if v.value else kind(0) for v in variable.value] or [kind(0)] * variable.size
+            self.values[variable.name] = values if variable.dim else values[0]
+
+    def __getitem__(self, variable):
+        return self.values[str(variable)]
+
+    def __call__(self):
+        self.block(self.script.body)
+        return self
+
+    def block(self, block):
+        for statement in block.statements:
+            kind = statement.WhichOneof('statement_oneof')
+            getattr(self, '_' + kind, lambda s: None)(getattr(statement, kind))
+
+    def _assign(self, s):
+        value = self.evaluate(s.expression)
+        if not s.target.HasField('arrayCell'):
+            name = s.target.variable.name
+            self.values[name] = self.types[name](value)
+        else:
+            cell = s.target.arrayCell
+            name = cell.arrayVar.name
+            self.values[name][self.evaluate(cell.index)] = self.types[name](value)
+
+    def _if(self, s):
+        for branch in [s, *s.elseifs]:
+            if self.evaluate(branch.condition):
+                return self.block(branch.body)
+        self.block(getattr(s, 'else'))
+
+    def _for(self, s):
+        self.block(s.init)
+        while self.evaluate(s.condition):
+            self.block(s.body)
+            self.block(s.update)
+
+    def _measure(self, s):
+        for process in s.measureProcesses:
+            target = process.analog.demodIntegration.target.scalarProcess.variable.name
+            self.values[target] = float(self.measure(s.qe.name, s.pulse.name))
+
+    def evaluate(self, e):
+        kind = e.WhichOneof('expression_oneof')
+        e = getattr(e, kind)
+        if kind == 'literal':
+            return _literal(e)
+        if kind == 'variable':
+            return self.io[e.ioNumber] if e.ioNumber else self.values[e.name]
+        if kind == 'arrayCell':
+            return self.values[e.arrayVar.name][self.evaluate(e.index)]
+        if kind == 'binaryOperation':
+            op = e.DESCRIPTOR.fields_by_name['op'].enum_type.values_by_number[e.op].name
+            return OPERATIONS[op](self.evaluate(e.left), self.evaluate(e.right))
+        if kind == 'libFunction':
+            return CASTS[e.functionName](*[self.evaluate(a.scalar) for a in e.arguments])
+        raise NotImplementedError(f'QUA expression {kind}')
@@ -0,0 +1,27 @@
+import pytest
+
+from OPXBOX_LIB.benchmarks import BENCHMARKS, append_history, last_run, load_history, run, time_call
+
+
+def test_all_parts_are_benchmarked():
+    assert set(BENCHMARKS) == {'resample_trace', 'get_word_pulse', 'configuration', 'program', 'scope_render'}
+    assert 'pong' in BENCHMARKS['program'][1]
+
+
+def test_time_call_times_one_call():
+    assert 0 < time_call(lambda: sum(range(1000)), repeat=1, target=0.01) < 0.01
+
+
+def test_run_and_history(tmp_path):
+    results = run(['resample_trace'], repeat=1)
+    assert set(results['resample_trace']) == {'100', '1000', '16500', '100000'}
+    path = str(tmp_path / 'history.jsonl')
+    append_history({'machine': 'a', 'results': {'x': {'1': 1.0}}}, path)
+    append_history({'machine': 'b', 'results': {'x': {'1': 2.0}}}, path)
+    append_history({'machine': 'a', 'results': results}, path)
+    history = load_history(path)
+    assert len(history) == 3
+    assert last_run(history, 'a') == results
+    assert last_run(history, 'c') == {}
+    with pytest.raises(ValueError):
+        run(['nothing'])
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from OPXBOX_LIB.calibration import IDLE, LevelHistogram, build_decoder, fit_thresholds, main
+
+LEVELS = {'A': -3.05, 'B': -1.37, 'Down': 0.0, 'Up': -0.45, 'Right': 0.335, 'Left': 0.245, IDLE: 0.485}
+
+
+def histograms(noise=0.01, samples=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    result = {}
+    for name, level in LEVELS.items():
+        result[name] = LevelHistogram()
+        for chunk in np.array_split(level + rng.normal(0, noise, samples), 4):
+            result[name].add(chunk)
+    return result
+
+
+def test_histogram_is_filled_incrementally():
+    h = LevelHistogram(low=0, high=1, bins=10)
+    h.add([0.05, 0.15])
+    h.add([0.15, 2.0, -1.0])
+    assert h.counts.tolist() == [2, 2, 0, 0, 0, 0, 0, 0, 0, 1]
+    assert h.range(0) == pytest.approx((0.05, 0.95))
+
+
+def test_thresholds_are_in_the_middle_of_the_gaps():
+    names, thresholds, margins = fit_thresholds({'B': (1.0, 2.0), 'A': (-1.0, 0.0), 'C': (2.5, 3.0)})
+    assert names == ['A', 'B', 'C']
+    assert thresholds.tolist() == [0.5, 2.25]
+    assert margins.tolist() == [0.5, 0.25]
+
+
+def test_overlapping_levels_are_rejected():
+    with pytest.raises(ValueError):
+        fit_thresholds({'A': (0.0, 1.0), 'B': (0.5, 2.0)})
+
+
+def test_decoder_classifies_new_samples():
+    decoder, ranges = build_decoder(histograms())
+    rng = np.random.default_rng(1)
+    for name, level in LEVELS.items():
+        expected = -1 if name == IDLE else decoder.buttons.index(name)
+        assert (decoder.classify(level + rng.normal(0, 0.01, 1000)) == expected).all()
+
+
+def test_profile_from_samples(tmp_path):
+    samples = str(tmp_path / 'samples.npz')
+    np.savez(samples, **{name: h.counts for name, h in histograms().items()})
+    profile = str(tmp_path / 'profile.json')
+    main(['--from-samples', samples, '--output', profile])
+    from OPXBOX_LIB.controller import ControllerDecoder, DriftTracker
+
+    decoder = ControllerDecoder.from_profile(profile)
+    assert decoder.levels[IDLE][0] < LEVELS[IDLE] < decoder.levels[IDLE][1]
+    assert DriftTracker(decoder).idle_level == pytest.approx(LEVELS[IDLE], abs=0.01)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from OPXBOX_LIB.config_size import config_size, main
+
+CONFIGURATION = {
+    'elements': {
+        'screen': {'operations': {'a': 'a_pulse', 'b': 'b_pulse'}},
+        'marker': {'operations': {'on': 'marker_pulse'}},
+    },
+    'pulses': {
+        'a_pulse': {'length': 100, 'waveforms': {'I': 'a_x', 'Q': 'a_y'}},
+        'b_pulse': {'length': 100, 'waveforms': {'I': 'b_x', 'Q': 'a_y'}},
+        'marker_pulse': {'length': 100, 'waveforms': {'single': 'marker_wf'}},
+    },
+    'waveforms': {
+        'a_x': {'type': 'arbitrary', 'samples': np.linspace(0, 0.1, 100)},
+        'a_y': {'type': 'arbitrary', 'samples': [0.0] * 100},
+        'b_x': {'type': 'arbitrary', 'samples': list(np.linspace(0, 0.1, 100))},
+        'marker_wf': {'type': 'constant', 'sample': 0.2},
+    },
+}
+
+
+def test_samples_by_waveform_and_element():
+    size = config_size(CONFIGURATION)
+    assert size.waveforms == {'a_x': 100, 'a_y': 100, 'b_x': 100, 'marker_wf': 0}
+    assert size.samples == 300
+    # a_y is played by both pulses but stored once
+    assert size.elements['screen'] == ['a_x', 'a_y', 'b_x']
+    assert size.element_samples('screen') == 300
+    assert size.element_samples('marker') == 0
+
+
+def test_duplicate_waveforms():
+    size = config_size(CONFIGURATION)
+    assert size.duplicates == [['a_x', 'b_x']]
+    assert size.duplicate_samples == 100
+    assert 'duplicate: a_x, b_x' in size.report()
+
+
+def test_serialized_size_and_budget():
+    size = config_size(CONFIGURATION, upload_rate=1e3)
+    # the arbitrary waveforms are sent as doubles
+    assert 3 * 100 * 8 < size.waveform_bytes < 3 * 100 * 8 + 100
+    assert size.upload_time == pytest.approx(size.serialized_bytes / 1e3)
+    assert size.over_budget(max_samples=300) == []
+    assert size.over_budget(max_samples=299, max_upload=10) == ['samples 300 > 299']
+
+
+def test_fails_when_a_game_is_over_budget(capsys):
+    assert main(['pong']) == 0
+    assert main(['pong', '--max-samples', '10']) == 1
+    assert 'OVER BUDGET' in capsys.readouterr().out
@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+
+from OPXBOX_LIB import connection
+from OPXBOX_LIB.connection import LazyQM, config_hash, connection_settings
+
+
+def test_config_hash_ignores_key_order_and_array_type():
+    a = {'waveforms': {'x': {'samples': np.linspace(0, 1, 5)}, 'y': {'sample': 0.2}}, 'version': 1}
+    b = {'version': 1, 'waveforms': {'y': {'sample': 0.2}, 'x': {'samples': np.linspace(0, 1, 5).tolist()}}}
+    assert config_hash(a) == config_hash(b)
+    b['waveforms']['y']['sample'] = 0.3
+    assert config_hash(a) != config_hash(b)
+
+
+def test_connection_settings_precedence(tmp_path, monkeypatch):
+    path = tmp_path / 'opxbox.json'
+    path.write_text(json.dumps({'host': '10.0.0.2', 'port': 80}))
+    monkeypatch.setenv('OPXBOX_CONFIG', str(path))
+    monkeypatch.delenv('OPXBOX_HOST', raising=False)
+    monkeypatch.delenv('OPXBOX_PORT', raising=False)
+    assert connection_settings('10.0.0.1', 9510)['host'] == '10.0.0.2'
+    monkeypatch.setenv('OPXBOX_PORT', '9600')
+    assert connection_settings('10.0.0.1', 9510)['port'] == 9600
+
+
+def test_lazy_qm_does_not_connect_until_used(monkeypatch):
+    opened = []
+
+    class Manager:
+        def open_qm(self, configuration):
+            opened.append(configuration)
+            return self
+
+        def execute(self, program):
+            return program
+
+    monkeypatch.setattr(connection, 'get_qmm', lambda **settings: Manager())
+    monkeypatch.setattr(connection, '_open_qms', {})
+    qm = LazyQM({'version': 1}, host='10.0.0.1')
+    assert opened == [] and not qm.is_open
+    assert qm.execute('game') == 'game'
+    LazyQM({'version': 1}, host='10.0.0.1').execute('game')
+    assert opened == [{'version': 1}]
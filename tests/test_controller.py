@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from OPXBOX_LIB.controller import ControllerDecoder, DriftTracker, ShortWindowReader
+from OPXBOX_LIB.controller_sim import simulate, simulate_drift
+
+RANGES = {'A': (-3.2, -3.0), 'B': (-1.5, -1.2), 'Down': (-0.1, 0.1), 'Up': (-0.5, -0.4)}
+
+
+def test_classify_matches_the_ranges():
+    decoder = ControllerDecoder.from_ranges(RANGES)
+    levels = np.array([-3.1, -1.3, 0.0, -0.45, 0.5, -2.0, -4.0])
+    assert decoder.classify(levels).tolist() == [0, 1, 2, 3, -1, -1, -1]
+
+
+def test_profile_round_trip(tmp_path):
+    decoder = ControllerDecoder.from_ranges(RANGES)
+    path = str(tmp_path / 'profile.json')
+    decoder.to_profile(path)
+    loaded = ControllerDecoder.from_profile(path)
+    assert (loaded.thresholds, loaded.labels, loaded.buttons) == (decoder.thresholds, decoder.labels, decoder.buttons)
+
+
+def test_invalid_tables_are_rejected():
+    with pytest.raises(ValueError):
+        ControllerDecoder([0.2, 0.1], [-1, 0, -1], ['A'])
+    with pytest.raises(ValueError):
+        ControllerDecoder([0.1, 0.2], [-1, 0], ['A'])
+    with pytest.raises(ValueError):
+        ControllerDecoder.from_ranges({'A': (0.0, 0.2), 'B': (0.1, 0.3)})
+
+
+def test_default_profile_steps():
+    decoder = ControllerDecoder.from_profile()
+    assert 2 ** decoder.steps >= len(decoder.thresholds) + 1
+
+
+def test_decode_builds_a_program():
+    pytest.importorskip('qm')
+    from qm.qua import declare, fixed, program
+
+    decoder = ControllerDecoder.from_ranges(RANGES)
+    with program() as prog:
+        act = declare(int, value=[0] * len(RANGES))
+        I = declare(fixed)
+        decoder.declare()
+        decoder.decode_flags(I, act)
+    assert len(prog.qua_program.script.body.statements) > decoder.steps
+
+
+def test_short_read_stops_early_when_unambiguous():
+    decoder = ControllerDecoder.from_ranges(RANGES)
+    reader = ShortWindowReader(decoder, window=10000, full_window=500000, max_windows=4, margin=0.05)
+    windows = np.array([[-3.1] * 4, [-3.01, -3.1, -3.1, -3.1], [-3.01] * 4])
+    buttons, used = reader.emulate(windows)
+    assert buttons.tolist() == [0, 0, 0]
+    assert used.tolist() == [1, 2, 4]
+
+
+def test_short_read_window_has_to_divide_the_full_window():
+    with pytest.raises(ValueError):
+        ShortWindowReader(ControllerDecoder.from_ranges(RANGES), window=3000, full_window=500000)
+
+
+def test_simulation_is_reproducible_and_improves_with_longer_windows():
+    decoder = ControllerDecoder.from_profile()
+    short = simulate(decoder, 1000, reads=2000)
+    assert short == simulate(decoder, 1000, reads=2000)
+    assert simulate(decoder, 20000, reads=2000)['error_rate'] < short['error_rate']
+
+
+def test_drift_tracker_follows_the_idle_level():
+    decoder = ControllerDecoder.from_profile()
+    tracker = DriftTracker(decoder, alpha=0.05)
+    levels = tracker.idle_level + np.linspace(0, 0.04, 2000)
+    buttons, offsets = tracker.emulate(levels)
+    assert (buttons == -1).all()
+    assert offsets[-1] == pytest.approx(0.04, abs=0.005)
+
+
+def test_drift_tracker_needs_an_idle_region():
+    decoder = ControllerDecoder.from_ranges(RANGES)
+    with pytest.raises(ValueError):
+        DriftTracker(decoder)
+    with pytest.raises(ValueError):
+        DriftTracker(decoder, idle_level=-3.1)
+
+
+def test_drift_tracking_keeps_decoding_a_drifting_session():
+    result = simulate_drift(ControllerDecoder.from_profile(), 0.05, frames=5000)
+    assert result['fixed_end'] > 0.01
+    assert result['tracked'] == 0
+
+
+def test_tracked_read_subtracts_and_clips_the_offset():
+    pytest.importorskip('qm')
+    from qm.qua import declare, fixed, program
+
+    from qua_interpreter import QuaInterpreter
+
+    decoder = ControllerDecoder.from_profile()
+    reader = ShortWindowReader(decoder, window=10000, full_window=500000)
+    tracker = DriftTracker(decoder)
+    with program() as prog:
+        I = declare(fixed)
+        reader.declare()
+        tracker.declare()
+        reader.read(I, 'measure_user_input_short', 'user_input_element', offset=tracker.offset)
+        tracker.update(I)
+
+    idle = tracker.idle_level
+    # (offset, level): a small drift, one far above the idle level and one below it at -max_offset
+    for offset, level in [(0.02, idle + 0.03), (0.04, idle + 3.0), (-0.05, 0.4 - 0.05), (0.01, -3.1)]:
+        run = QuaInterpreter(prog, measure=lambda element, pulse: level / reader.scale)
+        run.values[str(tracker.offset)] = offset
+        run()
+        buttons, offsets = tracker.emulate([level], offset)
+        assert run[I] == pytest.approx(level - offset)
+        assert run[decoder.button] == buttons[0]
+        assert run[tracker.offset] == pytest.approx(offsets[0])
+        assert abs(run[tracker.offset]) <= tracker.max_offset
+    assert offsets[0] == 0.01  # a press does not move the offset
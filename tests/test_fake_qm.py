@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from qm.qua import *
+
+from OPXBOX_LIB import connection
+from OPXBOX_LIB.connection import LazyQM
+from OPXBOX_LIB.fake_qm import FakeQuantumMachinesManager, stream_names
+from OPXBOX_LIB.telemetry import StreamHistory
+
+
+def build_debug():
+    with program() as debug:
+        I = declare(fixed)
+        I_st = declare_output_stream()
+        with infinite_loop_():
+            save(I, I_st)
+        with stream_processing():
+            I_st.save_all('I')
+    return debug
+
+
+@pytest.fixture
+def qmm():
+    manager = FakeQuantumMachinesManager(results={'I': np.arange(100.0)})
+    previous = connection.set_manager_factory(lambda **settings: manager)
+    yield manager
+    connection.set_manager_factory(previous)
+
+
+def test_stream_names():
+    assert stream_names(build_debug()) == ['I']
+
+
+def test_lazy_qm_opens_the_fake_and_records_io(qmm):
+    qm = LazyQM({'version': 1}, host='10.0.0.1')
+    qm.set_io1_value(3)
+    qm.set_io_values(io2_value=5)
+    machine = qmm.machines[0]
+    assert machine.configuration == {'version': 1}
+    assert [(io, v) for _, io, v in machine.io_writes] == [('io1', 3), ('io2', 5)]
+    assert qm.get_io2_value()['int_value'] == 5
+
+
+def test_fake_job_serves_the_results(qmm):
+    qm = LazyQM({'version': 1})
+    prog = build_debug()
+    job = qm.execute(prog)
+    assert qmm.machines[0].executed[-1].program is prog
+    res = job.result_handles
+    res.wait_for_all_values(timeout=1)
+    assert not res.is_processing()
+    assert res.I.fetch_all()['value'].tolist() == list(range(100))
+    history = StreamHistory(res.get('I'), 10)
+    assert history.poll() == 100 and history.values.tolist() == list(range(90, 100))
+
+
+def test_values_arrive_at_the_rate_until_halted():
+    qmm = FakeQuantumMachinesManager(results={'I': lambda n: np.ones(n)}, rate=1e4)
+    qm = qmm.open_qm({'version': 1})
+    job = qm.queue.add_compiled(qm.compile(build_debug())).wait_for_execution()
+    handle = job.result_handles.get('I')
+    handle.wait_for_values(50, timeout=1)
+    assert job.is_running()
+    job.halt()
+    count = handle.count_so_far()
+    assert count >= 50 and handle.count_so_far() == count
+    assert handle.fetch(slice(0, 10), flat_struct=True).tolist() == [1.0] * 10
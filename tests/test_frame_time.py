@@ -0,0 +1,70 @@
+import pytest
+from qm.qua import align, declare, else_, for_, if_, infinite_loop_, play, program, wait, while_
+
+from OPXBOX_LIB.frame_time import CLOCK, estimate_frame_time
+
+CONFIGURATION = {
+    'elements': {
+        'screen': {'operations': {'short': 'short_pulse', 'long': 'long_pulse'}},
+        'marker': {'operations': {'short': 'short_pulse'}},
+    },
+    'pulses': {'short_pulse': {'length': 100}, 'long_pulse': {'length': 10000}},
+}
+
+
+def test_pulses_and_waits_add_up():
+    with program() as prog:
+        with infinite_loop_():
+            play('long', 'screen')
+            play('long', 'screen')
+            align()
+            wait(1000)
+
+    estimate = estimate_frame_time(prog, CONFIGURATION)
+    # the classical statements only take a few cycles
+    assert estimate.best == estimate.worst == pytest.approx(20000 + 1000 * CLOCK, abs=100)
+
+
+def test_elements_play_in_parallel_until_aligned():
+    with program() as prog:
+        with infinite_loop_():
+            play('long', 'screen')
+            play('short', 'marker')
+            align()
+
+    assert estimate_frame_time(prog, CONFIGURATION).worst == pytest.approx(10000, abs=100)
+
+
+def test_branches_and_loops_give_best_and_worst_paths():
+    with program() as prog:
+        i = declare(int)
+        slow = declare(bool, value=False)
+        cont = declare(bool, value=True)
+        with while_(cont):
+            with for_(i, 0, i < 3, i + 1):
+                with if_(slow):
+                    play('long', 'screen')
+                with else_():
+                    play('short', 'screen')
+            align()
+
+    estimate = estimate_frame_time(prog, CONFIGURATION, budget=15000)
+    assert estimate.best == pytest.approx(300, abs=200)
+    assert estimate.worst == pytest.approx(30000, abs=200)
+    assert sum(p.count for p in estimate.paths) == 8
+    # two or three long pulses are over the budget
+    over = estimate.over_budget()
+    assert sum(p.count for p in over) == 4
+    assert sum(truth for _, truth in over[0].choices) == 3
+    assert 'exceed the budget' in estimate.report()
+
+
+def test_the_frame_loop_is_the_innermost_drawing_loop():
+    with program() as prog:
+        running = declare(bool, value=True)
+        with infinite_loop_():
+            with while_(running):
+                play('short', 'screen')
+                wait(250)
+
+    assert estimate_frame_time(prog, CONFIGURATION).worst == pytest.approx(100 + 250 * CLOCK, abs=100)
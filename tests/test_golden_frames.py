@@ -0,0 +1,46 @@
+import copy
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from OPXBOX_LIB.golden import GOLDEN_DIR, SCENES, images, matches, read_golden, render_sprite  # noqa: E402
+from OPXBOX_LIB.launcher import GAMES, load_game_module  # noqa: E402
+
+
+@pytest.mark.parametrize('game', sorted(SCENES))
+def test_drawings_match_the_golden_images(game):
+    rendered = images(game)
+    stored = {os.path.splitext(f)[0] for f in os.listdir(os.path.join(GOLDEN_DIR, game))}
+    assert set(rendered) == stored
+    changed = [name for name, image in rendered.items() if not matches(image, read_golden(game, name))]
+    assert not changed, f'{game}: {changed} changed, see python -m OPXBOX_LIB.golden --diff'
+
+
+def _with_samples(configuration, operation, change):
+    configuration = copy.deepcopy(configuration)
+    pulse = configuration['pulses'][configuration['elements']['screen']['operations'][operation]]
+    waveforms = [configuration['waveforms'][pulse['waveforms'][port]] for port in ['I', 'Q']]
+    x, y = change(np.array(waveforms[0]['samples']), np.array(waveforms[1]['samples']))
+    waveforms[0]['samples'], waveforms[1]['samples'] = list(x), list(y)
+    return configuration
+
+
+def test_the_tolerance_is_perceptual():
+    configuration = load_game_module(GAMES['flappy'][0]).configuration
+    golden = render_sprite(configuration, 'bird')
+
+    def resample(x, y):
+        # the same path, with the samples spread a little differently along it
+        t = np.linspace(0, len(x) - 1, len(x)) ** 1.05 / (len(x) - 1) ** 0.05
+        return np.interp(t, np.arange(len(x)), x), np.interp(t, np.arange(len(y)), y)
+
+    assert matches(render_sprite(_with_samples(configuration, 'bird', resample), 'bird'), golden)
+    # half a pixel of the bird's image
+    assert matches(render_sprite(_with_samples(configuration, 'bird', lambda x, y: (x + 0.0003, y)), 'bird'), golden)
+    assert not matches(render_sprite(_with_samples(configuration, 'bird', lambda x, y: (1.15 * x, 1.15 * y)),
+                                     'bird'), golden)
+    assert not matches(render_sprite(_with_samples(configuration, 'bird', lambda x, y: (x, y[::-1])), 'bird'),
+                       golden)
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from OPXBOX_LIB.image_converter import cached_drawing, convert_all, drawing_key, find_images, main
+
+
+@pytest.fixture
+def gallery(tmp_path):
+    for k in range(3):
+        img = np.zeros((120, 120), np.uint8)
+        cv2.circle(img, (60, 60), 20 + 10 * k, 255, 2)
+        cv2.rectangle(img, (5, 5), (30, 30), 255, 2)
+        cv2.imwrite(str(tmp_path / f'{k}.png'), img)
+    return tmp_path
+
+
+def test_defaults_and_parameters_in_the_key(gallery):
+    path = str(gallery / '0.png')
+    assert drawing_key(path, 1000) == drawing_key(path, 1000, size=0.1)
+    assert drawing_key(path, 1000) != drawing_key(path, 1000, size=0.2)
+    assert drawing_key(path, 1000) != drawing_key(str(gallery / '1.png'), 1000)
+
+
+def test_pool_conversion_is_cached(gallery, tmp_path):
+    cache = str(tmp_path / 'cache')
+    paths = find_images(str(gallery))
+    first = convert_all(paths, 2000, cache, workers=2)
+    assert [converted for _, _, converted, _, error in first] == [True] * 3
+    second = convert_all(paths, 2000, cache, workers=1)
+    assert [converted for _, _, converted, _, _ in second] == [False] * 3
+    trace, marker = cached_drawing(paths[0], 2000, cache)
+    assert trace.shape == (2, 2000)
+    assert sum(n for _, n in marker) == 2000
+
+
+def test_cli_reports_unreadable_images(gallery, tmp_path):
+    (gallery / 'broken.png').write_text('not an image')
+    assert main([str(gallery), '--cache-dir', str(tmp_path / 'cache'), '--samples', '1000', '--workers', '1']) == 1
+    assert len(os.listdir(tmp_path / 'cache')) == 3
@@ -0,0 +1,51 @@
+import pytest
+
+from OPXBOX_LIB.inputs import InputConditioner
+
+
+def test_holding_gives_one_press_and_one_release():
+    out = InputConditioner(['flap'], debounce=1).emulate([0, 1, 1, 1, 0, 0])
+    assert out['pressed'][:, 0].tolist() == [0, 1, 0, 0, 0, 0]
+    assert out['released'][:, 0].tolist() == [0, 0, 0, 0, 1, 0]
+    assert out['hold'][:, 0].tolist() == [0, 1, 2, 3, 0, 0]
+
+
+def test_debounce_ignores_single_frame_glitches():
+    out = InputConditioner(['A', 'B'], debounce=2).emulate([[1, 0], [0, 1], [1, 1], [1, 1], [0, 1]])
+    assert out['pressed'][:, 0].tolist() == [0, 0, 0, 1, 0]
+    assert out['pressed'][:, 1].tolist() == [0, 0, 1, 0, 0]
+    assert out['state'][:, 1].tolist() == [0, 0, 1, 1, 1]
+
+
+def test_debounce_has_to_be_positive():
+    with pytest.raises(ValueError):
+        InputConditioner(['A'], debounce=0)
+
+
+def test_update_does_what_emulate_does():
+    pytest.importorskip('qm')
+    from qm.qua import IO2, assign, declare, program
+
+    from qua_interpreter import QuaInterpreter
+
+    inputs = InputConditioner(['flap', 'quit', 'A'], debounce=2)
+    with program() as prog:
+        act = declare(int)
+        flags = declare(int, value=[0])
+        inputs.declare()
+        assign(act, IO2)
+        inputs.from_codes(act, [5, 10])
+        inputs.from_flags(flags, first=2)
+        inputs.update()
+
+    codes = [0, 5, 5, 5, 0, 10, 5, 5, 0, 0, 10, 10, 10, 0]
+    flags_of_frames = [0, 0, 1, 1, 1, 0, 1, 1, 0, 0, 1, 0, 0, 1]
+    expected = inputs.emulate([[code == 5, code == 10, f] for code, f in zip(codes, flags_of_frames)])
+    run = QuaInterpreter(prog)
+    for k, (code, f) in enumerate(zip(codes, flags_of_frames)):
+        run.io[2] = code
+        run.values[str(flags)] = [f]
+        run()
+        for key in ['state', 'pressed', 'released', 'hold']:
+            assert [int(v) for v in run[getattr(inputs, key)]] == expected[key][k].tolist(), (k, key)
+    assert expected['pressed'].sum() > 0 and expected['released'].sum() > 0
@@ -0,0 +1,50 @@
+import re
+
+import numpy as np
+import pytest
+
+from OPXBOX_LIB.launcher import Launcher, merge_configurations
+
+
+def test_merge_configurations_unions_operations():
+    a = {'elements': {'screen': {'intermediate_frequency': 0, 'operations': {'bird': 'bird'}}},
+         'waveforms': {'bird_x': {'type': 'arbitrary', 'samples': np.zeros(3)}}}
+    b = {'elements': {'screen': {'intermediate_frequency': 0, 'operations': {'face': 'face_pulse'}}},
+         'waveforms': {'bird_x': {'type': 'arbitrary', 'samples': [0.0, 0.0, 0.0]}}}
+    merged = merge_configurations([a, b])
+    assert merged['elements']['screen']['operations'] == {'bird': 'bird', 'face': 'face_pulse'}
+    assert set(merged['waveforms']) == {'bird_x'}
+
+
+def test_merge_configurations_rejects_conflicts():
+    a = {'waveforms': {'ray_x': {'type': 'arbitrary', 'samples': [0.0, 1.0]}}}
+    b = {'waveforms': {'ray_x': {'type': 'arbitrary', 'samples': [0.0, 2.0]}}}
+    with pytest.raises(ValueError, match='/waveforms/ray_x/samples'):
+        merge_configurations([a, b])
+
+
+def _played(prog):
+    text = str(prog.qua_program.script)
+    return set(re.findall(r'namedPulse \{\s*name: "(\w+)"', text))
+
+
+def test_pong_and_asteroids_share_a_configuration():
+    from OPXBOX_LIB import connection
+    from OPXBOX_LIB.fake_qm import FakeQuantumMachinesManager
+
+    previous = connection.set_manager_factory(lambda **settings: FakeQuantumMachinesManager())
+    try:
+        launcher = Launcher(['pong', 'asteroids'])
+    finally:
+        connection.set_manager_factory(previous)
+    configuration = launcher.configuration
+    # both define ray_x (and so the pulse ray and the operation ray) differently
+    assert {'pong_ray_x', 'asteroids_ray_x', 'border_x'} <= set(configuration['waveforms'])
+    assert 'ray_x' not in configuration['waveforms']
+    assert configuration['pulses']['pong_ray']['waveforms']['I'] == 'pong_ray_x'
+    operations = configuration['elements']['screen']['operations']
+    assert operations['asteroids_ray'] == 'asteroids_ray' and operations['border'] == 'border'
+    assert 'pong_ray' in _played(launcher.programs['pong']) and 'ray' not in _played(launcher.programs['pong'])
+    assert 'asteroids_ray' in _played(launcher.programs['asteroids'])
+    # the game's own program is unchanged
+    assert 'ray' in _played(launcher.modules['pong'].game)
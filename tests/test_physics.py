@@ -0,0 +1,68 @@
+import types
+
+import numpy as np
+import pytest
+
+from OPXBOX_LIB.physics import AsteroidsPhysics, FlappyPhysics, PongPhysics, random_inputs, to_fixed
+
+
+def test_to_fixed_truncates_and_wraps():
+    assert to_fixed(0.5) == 0.5
+    assert to_fixed(0.1) == pytest.approx(0.1, abs=2 ** -28) and to_fixed(0.1) <= 0.1
+    assert to_fixed(8.0) == -8.0
+    assert to_fixed(-8.5) == 7.5
+
+
+def test_flappy_bird_falls_and_flaps():
+    flappy = FlappyPhysics(2, params={'GRAVITY': 1.0})
+    for k in range(100):
+        flappy.step(flap=np.array([False, k == 50]))
+    y, vy = flappy.state['bird_y'], flappy.state['bird_vy']
+    # dt is 0 in the first frame, then 0.01: 99 frames of falling
+    assert vy[0] == pytest.approx(-0.99)
+    assert y[0] == pytest.approx(-0.01 * 0.01 * sum(range(1, 100)))
+    assert y[1] > y[0] and vy[1] > vy[0]
+
+
+def test_games_are_independent():
+    inputs = random_inputs('pong', 4, 300, rate=0.3, seed=1)
+    together = PongPhysics(4).run(inputs, keys=['ball_x', 'p1_y', 'p2_y'])
+    for g in range(4):
+        alone = PongPhysics(1).run({k: v[:, g:g + 1] for k, v in inputs.items()}, keys=['p1_y', 'p2_y'])
+        assert np.array_equal(alone['p1_y'][:, 0], together['p1_y'][:, g])
+        assert np.array_equal(alone['p2_y'][:, 0], together['p2_y'][:, g])
+
+
+def test_asteroids_rays_hit_and_age():
+    asteroids = AsteroidsPhysics(1, params={'N_asteroids': 1})
+    s = asteroids.state
+    s['asteroids_x'][:], s['asteroids_y'][:], s['asteroids_a'][:] = 0.1, 0.0, 0.25
+    asteroids.step(move=np.array([0]), act=np.array([5]))
+    assert s['rays_active'].sum() == 1
+    for _ in range(10):
+        asteroids.step(move=np.array([0]), act=np.array([0]))
+    assert not s['asteroids_active'].any() and not s['rays_active'].any()
+    # a ray that hits nothing dies after max_ray_age
+    asteroids = AsteroidsPhysics(1, params={'N_asteroids': 1, 'max_ray_age': 0.1})
+    asteroids.state['asteroids_y'][:] = 0.2
+    asteroids.step(move=np.array([0]), act=np.array([5]))
+    lived = 0
+    while asteroids.state['rays_active'].any():
+        asteroids.step(move=np.array([0]), act=np.array([0]))
+        lived += 1
+    assert lived == pytest.approx(11, abs=1)
+
+
+def test_fixed_point_time_wraps_but_dt_does_not():
+    flappy = FlappyPhysics(1, fixed=True)
+    for _ in range(810):
+        flappy.step(flap=np.array([False]))
+    assert flappy.state['t'][0] < 0 and flappy.wraps > 0
+    assert flappy.state['dt'][0] == pytest.approx(0.01, abs=1e-6)
+
+
+def test_parameters_from_a_game():
+    game = types.SimpleNamespace(GRAVITY=1, FIELD_SIZE=0.5, other=3)
+    flappy = FlappyPhysics.from_game(game, n=3, params={'N_PILLARS': 2})
+    assert flappy.params['GRAVITY'] == 1 and flappy.params['FIELD_SIZE'] == 0.5
+    assert flappy.state['pillars_x'].shape == (3, 2) and 'other' not in flappy.params
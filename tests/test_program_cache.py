@@ -0,0 +1,57 @@
+import os
+import types
+
+import pytest
+
+pytest.importorskip('qm')
+from qm.qua import assign, declare, fixed, program
+
+from OPXBOX_LIB.program_cache import ProgramCache
+
+
+def build_counter(n=3):
+    with program() as prog:
+        x = declare(fixed, 0)
+        for i in range(n):
+            assign(x, x + 0.1)
+    return prog
+
+
+def test_second_get_is_a_hit_with_the_same_program(tmp_path):
+    cache = ProgramCache(str(tmp_path), enabled=True)
+    config = {'version': 1}
+    built = cache.get(build_counter, config)
+    loaded = cache.get(build_counter, config)
+    assert loaded.qua_program == built.qua_program
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_params_and_config_are_part_of_the_key(tmp_path):
+    cache = ProgramCache(str(tmp_path), enabled=True)
+    cache.get(build_counter, {'version': 1})
+    cache.get(build_counter, {'version': 1}, {'n': 4})
+    cache.get(build_counter, {'version': 2})
+    assert cache.stats()['misses'] == 3
+    cache.clear()
+    cache.get(build_counter, {'version': 1})
+    assert cache.stats()['misses'] == 4
+
+
+def test_the_library_modules_a_builder_uses_are_part_of_the_key():
+    from OPXBOX_LIB import program_size
+    from OPXBOX_LIB.program_cache import library_files
+
+    assert library_files(types.FunctionType(build_counter.__code__, {})) == []
+    # program_size uses range_analysis
+    build = types.FunctionType(build_counter.__code__, {'program_size': program_size})
+    assert [os.path.basename(f) for f in library_files(build)] == ['program_size.py', 'range_analysis.py']
+
+
+def test_an_edited_file_is_hashed_again(tmp_path):
+    from OPXBOX_LIB.program_cache import _file_hash
+
+    path = tmp_path / 'profile.json'
+    path.write_text('{"a": 1}')
+    before = _file_hash(str(path))
+    path.write_text('{"a": 22}')
+    assert _file_hash(str(path)) != before
@@ -0,0 +1,45 @@
+import types
+
+from qm.qua import assign, declare, fixed, if_, program
+
+from OPXBOX_LIB.program_size import program_size, scaled_sizes
+
+
+def clip(x):
+    with if_(x > 1.0):
+        assign(x, 1.0)
+
+
+def build(n):
+    with program() as prog:
+        xs = declare(fixed, value=[0.0] * n)
+        for i in range(n):
+            assign(xs[i], xs[i] + 0.5)
+            clip(xs[i])
+    return prog
+
+
+def test_unrolled_loops_and_helpers_are_counted_per_line():
+    size = program_size(build(3))
+    # per copy: the assign, the if_ and the assign in the if_
+    assert size.statements == 9
+    by_function = {name: counts for (_, _, name), counts in size.functions.items()}
+    assert by_function['clip'][0] == 6
+    assert by_function['build'][0] == 3
+    repeated = {size.code[key]: n for key, (n, _) in size.lines.items()}
+    assert repeated['assign(xs[i], xs[i] + 0.5)'] == 3
+    clip_function = next(f for f in size.functions if f[2] == 'clip')
+    assert size.repeats(clip_function) == 3
+    assert size.variable_words == 3
+    # assign(xs[i], xs[i] + 0.5): the statement, the addition and two array cells
+    assert size.lines[next(k for k in size.lines if size.code[k].startswith('assign(xs[i]'))][1] == 3 * 4
+    assert 'most repeated line x3' in size.report()
+
+
+def test_sizes_grow_with_the_scaled_constant():
+    module = types.ModuleType('game')
+    module.N = 2
+    module.build_prog = lambda: build(module.N)
+    sizes = scaled_sizes(module, 'prog', 'N', [2, 4, 8])
+    assert [s.statements for _, s in sizes] == [6, 12, 24]
+    assert module.N == 2
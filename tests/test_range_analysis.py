@@ -0,0 +1,76 @@
+from qm.qua import assign, declare, else_, fixed, for_, if_, infinite_loop_, program
+
+from OPXBOX_LIB.range_analysis import analyze
+
+
+def _lines(analysis):
+    return [code.strip() for _, _, code, *_ in analysis.overflow_list()]
+
+
+def test_a_clock_overflows_unless_assumed():
+    with program() as prog:
+        t = declare(fixed, value=0)
+        with infinite_loop_():
+            assign(t, t + 0.01)
+
+    analysis = analyze(prog)
+    assert any('assign(t, t + 0.01)' in line for line in _lines(analysis))
+    assert analysis.names.get(analysis.overflow_list()[0][3].strip('()').split()[0]) is None
+    assert 't' in analysis.names.values()
+    assert analyze(prog, assume={'t': (0, 7.9)}).overflow_list() == []
+
+
+def test_a_clip_makes_a_later_check_redundant():
+    with program() as prog:
+        x = declare(fixed, value=0)
+        with infinite_loop_():
+            assign(x, x + 0.1)
+            with if_(x > 1.0):
+                assign(x, 1.0)
+            with if_(x > 2.0):
+                assign(x, 2.0)
+
+    analysis = analyze(prog)
+    checks = analysis.redundant_checks()
+    assert len(checks) == 1
+    assert 'x > 2.0' in checks[0][2] and checks[0][4] == 'never true'
+    assert analysis.overflow_list() == []
+    low, high = analysis.ranges[[k for k, v in analysis.names.items() if v == 'x'][0]]
+    assert low == 0 and 1.0 <= high <= 1.1 + 1e-9
+
+
+def test_a_bounded_loop_does_not_overflow():
+    with program() as prog:
+        i = declare(int)
+        x = declare(fixed, value=0)
+        with for_(i, 0, i < 10, i + 1):
+            assign(x, x + 0.5)
+        with if_(i > 10):
+            assign(x, 0)
+        with else_():
+            assign(x, 1)
+
+    analysis = analyze(prog)
+    assert not any('i + 1' in line for line in _lines(analysis))
+    assert [c[4] for c in analysis.redundant_checks()] == ['never true']
+    assert 'overflows:' in analysis.report()
+
+
+def test_a_non_boolean_condition_is_not_redundant():
+    with program() as prog:
+        x = declare(fixed, value=0.5)
+        with infinite_loop_():
+            assign(x, x * 0.5)
+            with if_(x):
+                assign(x, 0.25)
+
+    assert analyze(prog).redundant_checks() == []
+
+
+def test_the_report_names_the_file_of_a_line():
+    with program() as prog:
+        t = declare(fixed, value=0)
+        with infinite_loop_():
+            assign(t, t + 0.01)
+
+    assert '  test_range_analysis.py:' in analyze(prog).report()
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from qm.qua import IO1, IO2, assign, declare, infinite_loop_, program
+
+from OPXBOX_LIB.fake_qm import FakeQuantumMachinesManager
+from OPXBOX_LIB.recording import EVENT, InputRecorder, InputTable, read_recording, replay, write_recording
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def qm():
+    return FakeQuantumMachinesManager().open_qm({})
+
+
+def test_recording_round_trip(tmp_path):
+    events = np.array([(0, 1, 3), (250000, 2, 5), (4000000, 1, -1)], dtype=EVENT)
+    path = tmp_path / 'session.rec'
+    write_recording(path, events)
+
+    assert path.stat().st_size == 6 + 3 * 9
+    assert (read_recording(path) == events).all()
+    path.write_bytes(b'not a recording')
+    with pytest.raises(ValueError):
+        read_recording(path)
+
+
+def test_recorder_passes_the_writes_on(qm):
+    clock = Clock()
+    recorder = InputRecorder(qm, clock)
+    recorder.start()
+    clock.now = 0.5
+    recorder.set_io1_value(3)
+    clock.now = 1.25
+    recorder.set_io_values(io2_value=5)
+
+    assert [(io, value) for _, io, value in qm.io_writes] == [('io1', 3), ('io2', 5)]
+    assert recorder.events.tolist() == [(500000, 1, 3), (1250000, 2, 5)]
+    # everything else is the quantum machine's
+    assert recorder.io_values == {'io1': 3, 'io2': 5}
+
+
+def test_replay_writes_at_the_recorded_times(qm):
+    events = np.array([(0, 1, 3), (100000, 2, 5), (300000, 1, 0)], dtype=EVENT)
+    clock = Clock()
+    writes = []
+    qm.set_io1_value = lambda value: writes.append((clock.now, 1, value))
+    qm.set_io2_value = lambda value: writes.append((clock.now, 2, value))
+
+    assert replay(events, qm, speed=2, clock=clock, sleep=clock.sleep) == 0
+    assert writes == [(0.0, 1, 3), (0.05, 2, 5), (0.15, 1, 0)]
+
+
+def test_input_table_applies_the_writes_in_their_frame():
+    events = np.array([(5000, 1, 3), (45000, 2, 5), (47000, 2, 0), (61000, 1, 0)], dtype=EVENT)
+    table = InputTable(events, frame_time=0.02)
+
+    # the release of the tap moves to the next frame
+    assert table.frames.tolist() == [0, 2, 3, 3, 2 ** 31 - 1]
+    io1, io2 = table.emulate(5)
+    assert io1.tolist() == [3, 3, 3, 0, 0]
+    # a press and release in the same frame still press for a frame
+    assert io2.tolist() == [0, 0, 5, 0, 0]
+
+
+def test_input_table_replaces_the_io_reads():
+    table = InputTable(np.array([(0, 1, 3), (30000, 2, 5)], dtype=EVENT), frame_time=0.02)
+    with program() as prog:
+        move = declare(int)
+        act = declare(int)
+        table.declare()
+        with infinite_loop_():
+            table.read(move, act)
+
+    with program() as live:
+        move = declare(int)
+        act = declare(int)
+        with infinite_loop_():
+            assign(move, IO1)
+            assign(act, IO2)
+
+    assert len(prog.qua_program.script.variables) == len(live.qua_program.script.variables) + 7
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from OPXBOX_LIB.launcher import merge_configurations
+from OPXBOX_LIB.scanner import DEMOD_SCALE, ButtonScanner, benchmark, simulate
+
+PORTS = [('con1', 5, 1), ('con1', 5, 2), ('con1', 5, 3)]
+
+
+def make_scanner(**kwargs):
+    return ButtonScanner(['A', 'B', 'Up'], PORTS, ('con1', 5, 8), ('con1', 5, 1), **kwargs)
+
+
+def test_pack_and_unpack():
+    scanner = make_scanner()
+    assert scanner.pack([[1, 0, 1], [0, 1, 0]]).tolist() == [5, 2]
+    assert scanner.unpack_mask(5) == ['A', 'Up']
+
+
+def test_invalid_scanners_are_rejected():
+    with pytest.raises(ValueError):
+        ButtonScanner(['A'], PORTS, None, None)
+    with pytest.raises(ValueError):
+        make_scanner(window=10)
+
+
+def test_configuration_merges_with_a_game():
+    scanner = make_scanner(settle=0)
+    merged = merge_configurations([{'version': 1, 'elements': {'screen': {}}}, scanner.configuration()])
+    assert set(merged['elements']) == {'screen', 'scan_A', 'scan_B', 'scan_Up'}
+    assert merged['integration_weights']['scan_weights']['cosine'] == [(1.0, 1000)]
+
+
+def test_simulated_scans_get_better_with_longer_windows():
+    pressed = np.random.default_rng(1).random((5000, 3)) < 0.5
+    assert (simulate(make_scanner(window=2000), pressed) == make_scanner().pack(pressed)).all()
+    rows = benchmark([40, 2000], scans=5000)
+    assert rows[0]['scans_per_second'] > rows[1]['scans_per_second']
+    assert rows[0]['error_rate'] > rows[1]['error_rate']
+
+
+def test_scan_packs_the_measured_buttons():
+    pytest.importorskip('qm')
+    from qm.qua import declare, program
+
+    from qua_interpreter import QuaInterpreter
+
+    scanner = make_scanner()
+    with program() as prog:
+        act = declare(int, value=[0, 0, 0])
+        scanner.declare()
+        scanner.scan()
+        scanner.unpack(act)
+
+    # the demodulated level of an input at 1.5 and 0.5 times the threshold
+    level = scanner.threshold * scanner.window * DEMOD_SCALE
+    for pressed in [[0, 0, 0], [1, 0, 1], [0, 1, 0], [1, 1, 1]]:
+        levels = {element: level * (1.5 if p else 0.5) for element, p in zip(scanner.elements, pressed)}
+        run = QuaInterpreter(prog, measure=lambda element, pulse: levels[element])()
+        assert run[scanner.mask] == scanner.pack(pressed)
+        assert run[act] == pressed
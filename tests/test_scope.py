@@ -0,0 +1,70 @@
+import types
+
+import numpy as np
+import pytest
+
+from OPXBOX_LIB.scope import ScopeEmulator, emulate_qua, pulse_samples, sprite_events
+
+
+def configuration():
+    line = np.linspace(-0.1, 0.1, 100)
+    return {
+        'elements': {'screen': {'operations': {'line': 'line_pulse', 'dash': 'dash_pulse'}}},
+        'pulses': {
+            'line_pulse': {'length': 100, 'waveforms': {'I': 'line_x', 'Q': 'zero'}},
+            'dash_pulse': {'length': 100, 'waveforms': {'I': 'line_x', 'Q': 'zero'}, 'digital_marker': 'dash'},
+        },
+        'waveforms': {
+            'line_x': {'type': 'arbitrary', 'samples': line.tolist()},
+            'zero': {'type': 'constant', 'sample': 0.0},
+        },
+        'digital_waveforms': {'dash': {'samples': [(1, 50), (0, 0)]}},
+    }
+
+
+def test_pulse_samples_and_marker():
+    samples, mask = pulse_samples(configuration(), 'screen', 'dash')
+    assert samples.shape == (2, 100)
+    assert mask[:50].all() and not mask[50:].any()
+
+
+def test_scope_draws_rotated_and_blanked_pulses():
+    scope = ScopeEmulator(configuration(), resolution=101, span=0.5, persistence=0.5)
+    scope.play('line')
+    image = scope.frame()
+    # a horizontal line through the center, 20 px long
+    assert np.flatnonzero(image.any(axis=1)).tolist() == [50]
+    assert np.count_nonzero(image) == pytest.approx(21, abs=1)
+    # rotated by 90 degrees it is vertical, the old image fades
+    scope.play('line', (0, -1, 1, 0))
+    image = scope.frame()
+    assert image[40:61, 50].all()
+    assert image[50, 40] < image[40, 50]
+    # only the first half of the dash is drawn
+    scope = ScopeEmulator(configuration(), resolution=101, span=0.5)
+    scope.set_dc_offset('Q', 0.2)
+    scope.play('dash')
+    image = scope.frame()
+    assert np.flatnonzero(image.any(axis=0)).max() <= 50
+    assert np.flatnonzero(image.any(axis=1)).tolist() == [30]
+
+
+def test_game_draw_functions_run_on_the_scope():
+    game = types.ModuleType('game')
+    exec("def draw(x, y, a):\n"
+         "    set_dc_offset('screen', 'I', x)\n"
+         "    set_dc_offset('screen', 'Q', y)\n"
+         "    play('line' * amp(Math.cos2pi(a), -Math.sin2pi(a), Math.sin2pi(a), Math.cos2pi(a)), 'screen')\n"
+         "    align()\n", game.__dict__)
+    scope = ScopeEmulator(configuration(), resolution=101, span=0.5)
+    with emulate_qua(game, scope):
+        game.draw(0.0, 0.0, 0.25)
+    assert 'play' not in game.__dict__
+    expected = ScopeEmulator(configuration(), resolution=101, span=0.5)
+    frames = list(expected.render([('play', 'line', (0, -1, 1, 0)), ('frame',)]))
+    assert np.array_equal(scope.frame(), frames[0])
+
+
+def test_sprite_events_render_one_image_per_frame():
+    frames = list(ScopeEmulator(configuration()).render(sprite_events(configuration(), frames=3)))
+    assert len(frames) == 3 and all(f.shape == (400, 400) for f in frames)
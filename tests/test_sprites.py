@@ -0,0 +1,36 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+
+SPRITE_MODULES = ['Examples/sprites.py', 'pong/sprites.py', 'flappy_bird/sprites_new.py', 'OPXBOX_LIB/sprites.py']
+
+
+def load_sprites(path):
+    spec = importlib.util.spec_from_file_location(path.replace('/', '_')[:-3], os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=SPRITE_MODULES)
+def sprites(request):
+    return load_sprites(request.param)
+
+
+@pytest.mark.parametrize("x, y, exp", [
+    ([0, 0], [0, 0], 0),
+    ([0, 0], [1, 1], 0),
+    ([0, 1], [0, 0], 1),
+    ([0, 0], [1, 0], 1),
+    ([0, 0], [0, 1], 1),
+    ([0, 1], [0, 1], np.sqrt(2)),
+    ([1, 0], [1, 0], np.sqrt(2)),
+])
+def test_distances(sprites, x, y, exp):
+    res = sprites.calc_distances(x, y)
+    assert res.shape == (1,)
+    assert res[0] == pytest.approx(exp)
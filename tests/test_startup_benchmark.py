@@ -0,0 +1,7 @@
+from OPXBOX_LIB.startup_benchmark import compare
+
+
+def test_compare_reports_only_real_regressions():
+    baseline = {'flappy': {'import': 1.0, 'config': 0.001}, 'pong': {'import': 0.5}}
+    results = {'flappy': {'import': 1.5, 'config': 0.005}, 'pong': {'import': 0.55}, 'mario': {'import': 9.0}}
+    assert compare(results, baseline, tolerance=0.2) == [('flappy', 'import', 1.5, 1.0)]
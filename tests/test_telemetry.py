@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from OPXBOX_LIB.telemetry import LivePlotter, StreamHistory, minmax_downsample
+
+
+def test_minmax_downsample_short_input_is_unchanged():
+    y = np.array([3., 1., 2.])
+    idx, values = minmax_downsample(y, 10)
+    assert list(idx) == [0, 1, 2]
+    assert list(values) == [3., 1., 2.]
+
+
+@pytest.mark.parametrize("length", [1000, 1001, 12345])
+def test_minmax_downsample_keeps_spikes(length):
+    y = np.zeros(length)
+    y[length // 3] = 5
+    y[length // 2] = -7
+    idx, values = minmax_downsample(y, 50)
+    assert len(values) <= 100
+    assert values.max() == 5
+    assert values.min() == -7
+    assert np.all(np.diff(idx) >= 0)
+
+
+class FakeHandle:
+    def __init__(self):
+        self.data = []
+
+    def count_so_far(self):
+        return len(self.data)
+
+    def fetch(self, item, flat_struct=False):
+        return np.array(self.data[item])
+
+
+def test_stream_history_only_keeps_the_tail():
+    handle = FakeHandle()
+    history = StreamHistory(handle, 5)
+    handle.data += [1, 2, 3]
+    assert history.poll() == 3
+    handle.data += [4, 5, 6, 7]
+    assert history.poll() == 4
+    assert list(history.values) == [3, 4, 5, 6, 7]
+    assert history.poll() == 0
+
+
+def test_live_plotter_recovers_its_points_after_a_slow_frame():
+    class Handles:
+        def get(self, name):
+            return FakeHandle()
+
+    plotter = LivePlotter(Handles(), ['I'], max_points=1000, refresh_rate=10, budget=0.5)
+    plotter.adapt(0.2)
+    assert plotter.max_points == 500
+    # within the budget, but doubling could exceed it
+    plotter.adapt(0.03)
+    assert plotter.max_points == 500
+    plotter.adapt(0.001)
+    plotter.adapt(0.001)
+    assert plotter.max_points == 1000
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from OPXBOX_LIB.vector_image import (allocate_samples, arc_length, build_drawing, jump_distance, order_contours,
+                                     resample_polyline)
+
+
+def square(x, y, side=1.0):
+    return np.array([[x, y], [x + side, y], [x + side, y + side], [x, y + side], [x, y]])
+
+
+def test_samples_are_shared_by_length():
+    samples = allocate_samples([1.0, 2.0, 1.0], 100)
+    assert samples.sum() == 100
+    assert samples[1] == 49 and sorted(samples[[0, 2]]) == [25, 26]
+    with pytest.raises(ValueError):
+        allocate_samples([1.0] * 10, 10)
+
+
+def test_resampled_polyline_has_constant_speed():
+    points = resample_polyline(square(0, 0), 41)
+    steps = np.hypot(*np.diff(points, axis=0).T)
+    assert steps == pytest.approx(np.full(40, 0.1))
+
+
+def test_ordering_shortens_the_jumps():
+    contours = [square(10, 0), square(0, 10), square(1.5, 0), square(10, 10)]
+    ordered = order_contours(contours)
+    assert len(ordered) == 4
+    assert jump_distance(ordered) < jump_distance(contours)
+    # closed contours stay closed and keep their length
+    assert sorted(arc_length(c) for c in ordered) == pytest.approx([4.0] * 4)
+
+
+def test_drawing_blanks_the_jumps():
+    contours = order_contours([square(0, 0), square(3, 0, 2)])
+    trace, marker = build_drawing(contours, 1000, size=0.1, jump_samples=10)
+    assert trace.shape == (2, 1000)
+    assert np.abs(trace).max() == pytest.approx(0.1)
+    assert [v for v, _ in marker] == [1, 0, 1, 0]
+    assert sum(n for _, n in marker) == 1000
+    # the second square is twice as long, so it gets twice the samples
+    assert marker[2][1] == pytest.approx(2 * marker[0][1], abs=2)
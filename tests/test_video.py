@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from OPXBOX_LIB.video import ContourTracker, benchmark, load_frames, synthetic_clip, video_drawings, write_drawings
+
+
+def square(x, y, side):
+    return np.array([[x, y], [x + side, y], [x + side, y + side], [x, y + side], [x, y]], dtype=float)
+
+
+def test_tracker_keeps_the_order_and_start_of_moving_contours():
+    tracker = ContourTracker(1000, jump_samples=10, smoothing=0.5)
+    first, _ = tracker.update([square(0, 0, 10), square(50, 50, 20)])
+    second, samples = tracker.update([square(52, 51, 20), square(1, 1, 10)])
+    # the same contours in the same order, starting at the corner they started at before
+    assert second[0][0].tolist() == (first[0][0] + [1, 1]).tolist()
+    assert second[1][0].tolist() == (first[1][0] + [2, 1]).tolist()
+    assert samples.sum() + 20 == 1000
+
+
+def test_smoothing_keeps_the_samples_stable():
+    tracker = ContourTracker(1000, jump_samples=10, smoothing=0.1)
+    tracker.update([square(0, 0, 10), square(50, 50, 10)])
+    _, samples = tracker.update([square(0, 0, 10), square(50, 50, 30)])
+    # without smoothing the second square would get 3/4 of the samples
+    assert samples[1] < 0.6 * samples.sum()
+
+
+def test_frames_stream_through_files(tmp_path):
+    drawings = video_drawings(synthetic_clip(5, 120), 1000)
+    assert write_drawings(drawings, str(tmp_path)) == 5
+    frames = list(load_frames(str(tmp_path)))
+    assert len(frames) == 5
+    assert all(trace.shape == (2, 1000) and sum(n for _, n in marker) == 1000 for trace, marker in frames)
+
+
+def test_blank_frames_are_blanked():
+    (trace, marker), = video_drawings([np.zeros((50, 50), np.uint8)], 500)
+    assert marker == [(0, 500)] and not trace.any()
+
+
+def test_benchmark_reports_the_speed():
+    result = benchmark(frames=10, size=120, budget=1000)
+    assert result['frames'] == 10 and result['fps'] > 0
+
+
+@pytest.fixture
+def animation(tmp_path, monkeypatch):
+    from OPXBOX_LIB.launcher import GAMES, load_game_module
+
+    module = load_game_module(GAMES['animation'][0])
+    monkeypatch.setattr(module, 'ANIMATION_DIR', str(tmp_path))
+    return module
+
+
+def test_animation_plays_the_start_of_a_long_clip(animation, tmp_path):
+    write_drawings(((np.zeros((2, 100)), [(1, 100)]) for _ in range(5)), str(tmp_path))
+    assert len(animation.load_animation(max_frames=3)) == 3
+
+
+def test_animation_checks_the_frames(animation, tmp_path, monkeypatch):
+    write_drawings([(np.zeros((2, 102)), [(1, 102)])], str(tmp_path))
+    with pytest.raises(ValueError, match='multiple of 4'):
+        animation.load_animation()
+    write_drawings([(np.zeros((2, 100)), [(1, 100)])], str(tmp_path))
+    monkeypatch.setattr(animation, 'SAMPLE_BUDGET', 150)
+    with pytest.raises(ValueError, match='SAMPLE_BUDGET'):
+        animation.build_configuration()
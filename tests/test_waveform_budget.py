@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from OPXBOX_LIB.waveform_budget import build_planned_drawing, footprint, hausdorff, solve_budget, uniform_plan
+
+
+def square(x, y, side=1.0):
+    return np.array([[x, y], [x + side, y], [x + side, y + side], [x, y + side], [x, y]], dtype=float)
+
+
+def circle(x, y, r, n=200):
+    t = np.linspace(0, 2 * np.pi, n)
+    return np.stack([x + r * np.cos(t), y + r * np.sin(t)], axis=1)
+
+
+def test_hausdorff_distance():
+    assert hausdorff(square(0, 0), square(0, 0)) == pytest.approx(0, abs=1e-9)
+    assert hausdorff(square(0, 0), square(0.5, 0)) == pytest.approx(0.5)
+    # a polyline cutting the corner misses it by half the diagonal of the cut
+    assert hausdorff(square(0, 0, 2), np.array([[0, 0], [2, 0], [0, 2], [0, 0]])) == pytest.approx(np.sqrt(2))
+
+
+def test_solver_beats_sharing_by_length():
+    # a long square needs only its corners, the small circle needs many samples
+    contours = [square(0, 0, 100), circle(150, 50, 5)]
+    plan = solve_budget(contours, 101, jump_samples=4)
+    uniform = uniform_plan(contours, 101, jump_samples=4)
+    # padded to a multiple of 4 samples, both stay within the budget
+    assert footprint(plan)['pulse_samples'] <= 101 and footprint(uniform)['pulse_samples'] <= 101
+    assert max(plan['error']) < max(uniform['error'])
+
+
+def test_max_error_saves_samples():
+    contours = [square(0, 0, 100), circle(150, 50, 20)]
+    best = solve_budget(contours, 1000)
+    cheap = solve_budget(contours, 1000, max_error=1.0)
+    assert max(cheap['error']) <= 1.0
+    assert cheap['length'] < best['length']
+    with pytest.raises(ValueError):
+        solve_budget(contours, 20)
+
+
+def test_planned_drawing():
+    plan = solve_budget([square(0, 0, 10), circle(30, 5, 5)], 203, jump_samples=8)
+    trace, marker = build_planned_drawing(plan)
+    assert trace.shape[1] % 4 == 0 and trace.shape[1] >= plan['length']
+    assert sum(n for _, n in marker) == trace.shape[1]
+    f = footprint(plan)
+    # the waveforms are padded to a multiple of 4 samples
+    assert f['pulse_samples'] == trace.shape[1] and f['pulse_samples'] % 4 == 0
+    assert f['waveform_samples'] == 2 * trace.shape[1]
+    assert f['pulse_samples'] <= 203
+    assert f['drawn_samples'] == plan['length'] - 16